@@ -1,3 +1,14 @@
 """EmotionDetection package."""
-from .emotion_detection import emotion_detector
+import sys
+from pathlib import Path
 
+# Make the repository-level watson_client package importable
+_REPO_ROOT = str(Path(__file__).resolve().parents[2])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from .emotion_detection import (  # noqa: E402
+    emotion_detector,
+    emotion_detector_async,
+    emotion_detector_batch
+)
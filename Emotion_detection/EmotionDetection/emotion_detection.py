@@ -1,31 +1,71 @@
 """
 Emotion Detection module using Watson NLP library.
+
+EMOTION_ENGINE selects where predictions come from:
+- remote: Watson only
+- local: the in-process lexicon scorer only (see lexicon.py)
+- auto (default): Watson, falling back to the lexicon scorer when the call
+  fails, the endpoint's circuit breaker is open or the request deadline
+  has passed
+
+Results record which engine produced them in 'engine' ('watson' or 'local').
 """
-import requests
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import watson_client
 
-def emotion_detector(text_to_analyse):
+from . import lexicon
+
+logger = logging.getLogger(__name__)
+
+ENGINE = os.getenv('EMOTION_ENGINE', 'auto').lower()
+
+# Maximum concurrent Watson calls made by emotion_detector_batch
+BATCH_MAX_WORKERS = int(os.getenv('EMOTION_BATCH_WORKERS', '8'))
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+EMOTION_URL = os.getenv('EMOTION_API_URL',
+                        'https://sn-watson-emotion.labs.skills.network'
+                        '/v1/watson.runtime.nlp.v1/NlpService/EmotionPredict')
+
+MODEL_ID = "emotion_aggregated-workflow_lang_en_stock"
+
+HEADERS = {
+    "grpc-metadata-mm-model-id": MODEL_ID
+}
+
+
+def _cached_result(text_to_analyse):
+    """Get a cached result for the text, or None."""
+    cache = watson_client.get_cache()
+    return cache.get(MODEL_ID, text_to_analyse) if cache is not None else None
+
+
+def _cache_result(text_to_analyse, result):
+    """Cache a result; blank-input (all None) results are negative-cached."""
+    cache = watson_client.get_cache()
+    if cache is not None:
+        cache.set(MODEL_ID, text_to_analyse, result, negative=result['dominant_emotion'] is None)
+
+
+def _parse_response(response):
     """
-    Analyze text and return emotion scores using Watson NLP.
+    Turn a Watson EmotionPredict response into the result dictionary.
 
     Args:
-        text_to_analyse: The text string to analyze
+        response: requests.Response or httpx.Response
 
     Returns:
         Dictionary with emotion scores and dominant emotion.
         Returns None values if input is blank (status 400).
     """
-    url = ('https://sn-watson-emotion.labs.skills.network'
-           '/v1/watson.runtime.nlp.v1/NlpService/EmotionPredict')
-
-    headers = {
-        "grpc-metadata-mm-model-id": "emotion_aggregated-workflow_lang_en_stock"
-    }
-
-    input_json = {"raw_document": {"text": text_to_analyse}}
-
-    response = requests.post(url, json=input_json, headers=headers, timeout=10)
-
     if response.status_code == 400:
         return {
             'anger': None,
@@ -35,6 +75,7 @@ def emotion_detector(text_to_analyse):
             'sadness': None,
             'dominant_emotion': None
         }
+    response.raise_for_status()
 
     formatted_response = response.json()
     emotions = formatted_response['emotionPredictions'][0]['emotion']
@@ -60,5 +101,129 @@ def emotion_detector(text_to_analyse):
         'fear': fear_score,
         'joy': joy_score,
         'sadness': sadness_score,
-        'dominant_emotion': dominant_emotion
+        'dominant_emotion': dominant_emotion,
+        'engine': 'watson'
     }
+
+
+def _remote_emotion(text_to_analyse):
+    """Call Watson EmotionPredict and parse the response."""
+    input_json = {"raw_document": {"text": text_to_analyse}}
+    response = watson_client.call('emotion', EMOTION_URL, json=input_json, headers=HEADERS, timeout=10)
+    return _parse_response(response)
+
+
+def _local_results(texts):
+    """Score texts with the lexicon engine, marking the results as local."""
+    return [dict(result, engine='local') for result in lexicon.score_texts(texts)]
+
+
+def _fallback(text_to_analyse, error):
+    """Score locally after a failed remote call, or re-raise in remote-only mode."""
+    if ENGINE == 'remote':
+        raise error
+    logger.warning('Watson emotion call failed (%s); using the local engine', error)
+    return _local_results([text_to_analyse])[0]
+
+
+def emotion_detector(text_to_analyse):
+    """
+    Analyze text and return emotion scores using Watson NLP
+    (or the local engine, depending on EMOTION_ENGINE).
+
+    Args:
+        text_to_analyse: The text string to analyze
+
+    Returns:
+        Dictionary with emotion scores, dominant emotion and the engine
+        that produced them. Returns None values if input is blank (status 400).
+    """
+    if ENGINE == 'local':
+        return _local_results([text_to_analyse])[0]
+
+    cached = _cached_result(text_to_analyse)
+    if cached is not None:
+        return cached
+
+    try:
+        result = _remote_emotion(text_to_analyse)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return _fallback(text_to_analyse, error)
+    _cache_result(text_to_analyse, result)
+    return result
+
+
+async def emotion_detector_async(text_to_analyse):
+    """
+    Async variant of emotion_detector using the shared async connection pool.
+
+    Args:
+        text_to_analyse: The text string to analyze
+
+    Returns:
+        Same dictionary as emotion_detector.
+    """
+    if ENGINE == 'local':
+        return _local_results([text_to_analyse])[0]
+
+    cached = _cached_result(text_to_analyse)
+    if cached is not None:
+        return cached
+
+    input_json = {"raw_document": {"text": text_to_analyse}}
+    try:
+        response = await watson_client.call_async(
+            'emotion', EMOTION_URL, json=input_json, headers=HEADERS, timeout=10
+        )
+        result = _parse_response(response)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return _fallback(text_to_analyse, error)
+    _cache_result(text_to_analyse, result)
+    return result
+
+
+def _get_batch_executor():
+    """Get the shared thread pool that bounds batch parallelism."""
+    global _batch_executor  # pylint: disable=global-statement
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=BATCH_MAX_WORKERS,
+                thread_name_prefix='emotion-batch'
+            )
+    return _batch_executor
+
+
+def _detect_or_error(text_to_analyse):
+    """Run emotion_detector, returning failures as an error dict."""
+    try:
+        return emotion_detector(text_to_analyse)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return {'error': str(error)}
+
+
+def emotion_detector_batch(texts):
+    """
+    Analyze many texts concurrently using Watson NLP.
+
+    Calls fan out over a shared pool of BATCH_MAX_WORKERS threads, so
+    concurrent batches together never exceed that many upstream calls.
+    With EMOTION_ENGINE=local the whole batch is scored in-process at once.
+
+    Args:
+        texts: List of text strings to analyze
+
+    Returns:
+        List of results in input order. Each item is the dictionary
+        emotion_detector would return, or {'error': message} if that
+        item failed.
+    """
+    if ENGINE == 'local':
+        return _local_results(texts)
+    executor = _get_batch_executor()
+    # Each item runs in a copy of the caller's context so the request deadline applies
+    futures = [
+        executor.submit(contextvars.copy_context().run, _detect_or_error, text)
+        for text in texts
+    ]
+    return [future.result() for future in futures]
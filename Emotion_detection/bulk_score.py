@@ -0,0 +1,13 @@
+"""
+Command-line bulk scoring of JSONL/CSV files with emotion_detector.
+
+Example:
+    python bulk_score.py reviews.jsonl -o emotions.jsonl --checkpoint emotions.ckpt
+"""
+import sys
+
+from EmotionDetection.emotion_detection import emotion_detector
+from watson_client import bulk
+
+if __name__ == '__main__':
+    sys.exit(bulk.main(emotion_detector, 'emotion'))
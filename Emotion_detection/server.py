@@ -1,25 +1,36 @@
 """
 Flask server for Emotion Detection application.
 """
+import os
+
 from flask import Flask, render_template, request, jsonify
-from EmotionDetection.emotion_detection import emotion_detector
+from EmotionDetection.emotion_detection import emotion_detector, emotion_detector_batch
+import watson_client
+from watson_client import metrics
 
 app = Flask("Emotion Detector")
+watson_client.install_request_deadlines(app)
+metrics.init_app(app)
 
+# Maximum number of texts accepted by /emotionDetector/batch
+BATCH_MAX_ITEMS = int(os.getenv('EMOTION_BATCH_MAX_ITEMS', '1000'))
 
-@app.route("/emotionDetector")
-def emotion_detector_route():
-    """Analyze text and return emotion detection results."""
-    text_to_analyze = request.args.get('textToAnalyze')
-    response = emotion_detector(text_to_analyze)
+
+def format_emotion_response(response):
+    """Format an emotion_detector result for the JSON API."""
+    if 'error' in response:
+        return {
+            'error': True,
+            'message': response['error']
+        }
 
     if response['dominant_emotion'] is None:
-        return jsonify({
+        return {
             'error': True,
             'message': 'Invalid text! Please try again.'
-        })
+        }
 
-    return jsonify({
+    return {
         'error': False,
         'emotions': {
             'anger': response['anger'],
@@ -28,10 +39,55 @@ def emotion_detector_route():
             'joy': response['joy'],
             'sadness': response['sadness']
         },
-        'dominant_emotion': response['dominant_emotion']
+        'dominant_emotion': response['dominant_emotion'],
+        'engine': response.get('engine', 'watson')
+    }
+
+
+@app.route("/emotionDetector")
+def emotion_detector_route():
+    """Analyze text and return emotion detection results."""
+    text_to_analyze = request.args.get('textToAnalyze')
+    response = emotion_detector(text_to_analyze)
+    return jsonify(format_emotion_response(response))
+
+
+@app.route("/emotionDetector/batch", methods=["POST"])
+def emotion_detector_batch_route():
+    """Analyze a JSON array of texts and return results in the same order."""
+    texts = request.get_json(silent=True)
+
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({
+            'error': True,
+            'message': 'Expected a JSON array of strings.'
+        }), 400
+
+    if len(texts) > BATCH_MAX_ITEMS:
+        return jsonify({
+            'error': True,
+            'message': f'Too many texts (maximum {BATCH_MAX_ITEMS}).'
+        }), 413
+
+    responses = emotion_detector_batch(texts)
+    return jsonify({
+        'error': False,
+        'results': [format_emotion_response(response) for response in responses]
     })
 
 
+@app.route("/cacheStats")
+def cache_stats_route():
+    """Report result cache hit rates for monitoring."""
+    return jsonify(watson_client.cache_stats())
+
+
+@app.route("/upstreamStats")
+def upstream_stats_route():
+    """Report circuit breaker state, rolling latency/error rate and hedging counts."""
+    return jsonify(watson_client.breaker_stats())
+
+
 @app.route("/")
 def render_index_page():
     """Render the index page."""
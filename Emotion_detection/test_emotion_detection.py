@@ -1,35 +1,109 @@
 """Unit tests for the Emotion Detection application."""
 import unittest
-from EmotionDetection.emotion_detection import emotion_detector
+from unittest import mock
+
+import requests
+
+from EmotionDetection import emotion_detection, lexicon
+from EmotionDetection.emotion_detection import emotion_detector, emotion_detector_batch
 
 
 class TestEmotionDetector(unittest.TestCase):
-    """Test cases for the emotion_detector function."""
+    """Test cases for the emotion_detector function (against Watson, without the local fallback)."""
+
+    def setUp(self):
+        patcher = mock.patch.object(emotion_detection, 'ENGINE', 'remote')
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_emotion_joy(self):
         """Test joy detection."""
         result = emotion_detector("I am glad this happened")
         self.assertEqual(result['dominant_emotion'], 'joy')
+        self.assertEqual(result['engine'], 'watson')
 
     def test_emotion_anger(self):
         """Test anger detection."""
         result = emotion_detector("I am really mad about this")
         self.assertEqual(result['dominant_emotion'], 'anger')
+        self.assertEqual(result['engine'], 'watson')
 
     def test_emotion_disgust(self):
         """Test disgust detection."""
         result = emotion_detector("I feel disgusted just hearing about this")
         self.assertEqual(result['dominant_emotion'], 'disgust')
+        self.assertEqual(result['engine'], 'watson')
 
     def test_emotion_sadness(self):
         """Test sadness detection."""
         result = emotion_detector("I am so sad about this")
         self.assertEqual(result['dominant_emotion'], 'sadness')
+        self.assertEqual(result['engine'], 'watson')
 
     def test_emotion_fear(self):
         """Test fear detection."""
         result = emotion_detector("I am really afraid that this will happen")
         self.assertEqual(result['dominant_emotion'], 'fear')
+        self.assertEqual(result['engine'], 'watson')
+
+
+class TestEmotionDetectorBatch(unittest.TestCase):
+    """Test cases for the emotion_detector_batch function."""
+
+    def test_batch_preserves_order_and_isolates_errors(self):
+        """Test that results keep input order and a failure only affects its item."""
+        def fake_detector(text):
+            if text == 'boom':
+                raise ValueError('upstream failed')
+            return {'dominant_emotion': text}
+
+        with mock.patch('EmotionDetection.emotion_detection.emotion_detector', fake_detector):
+            results = emotion_detector_batch(['joy', 'boom', 'fear', 'anger'])
+
+        self.assertEqual(results[0], {'dominant_emotion': 'joy'})
+        self.assertEqual(results[1], {'error': 'upstream failed'})
+        self.assertEqual(results[2], {'dominant_emotion': 'fear'})
+        self.assertEqual(results[3], {'dominant_emotion': 'anger'})
+
+
+class TestLexiconEngine(unittest.TestCase):
+    """Test cases for the local lexicon engine."""
+
+    def test_dominant_emotions(self):
+        """Test that a batch is scored with the expected dominant emotions."""
+        results = lexicon.score_texts([
+            "I am glad this happened",
+            "I am really mad about this",
+            "I feel disgusted just hearing about this",
+            "I am so sad about this",
+            "I am really afraid that this will happen"
+        ])
+        self.assertEqual([result['dominant_emotion'] for result in results],
+                         ['joy', 'anger', 'disgust', 'sadness', 'fear'])
+
+    def test_negated_joy_and_blank_text(self):
+        """Test that negated joy reads as sadness and blank text gets None values."""
+        self.assertEqual(lexicon.score_text("I don't feel happy")['dominant_emotion'], 'sadness')
+        self.assertIsNone(lexicon.score_text('   ')['dominant_emotion'])
+
+    def test_fallback_when_remote_fails(self):
+        """Test that emotion_detector falls back to the lexicon when Watson is unreachable."""
+        text = "I am so sad about this"
+        with mock.patch.object(emotion_detection, 'ENGINE', 'auto'), \
+                mock.patch('watson_client.call', side_effect=requests.ConnectionError('down')) as call, \
+                mock.patch('EmotionDetection.emotion_detection._cached_result', return_value=None):
+            result = emotion_detector(text)
+        call.assert_called_once()
+        self.assertEqual(result.pop('engine'), 'local')
+        self.assertEqual(result, lexicon.score_text(text))
+
+    def test_remote_failure_raises_in_remote_mode(self):
+        """Test that EMOTION_ENGINE=remote reports Watson failures instead of falling back."""
+        with mock.patch.object(emotion_detection, 'ENGINE', 'remote'), \
+                mock.patch('watson_client.call', side_effect=requests.ConnectionError('down')), \
+                mock.patch('EmotionDetection.emotion_detection._cached_result', return_value=None):
+            with self.assertRaises(requests.ConnectionError):
+                emotion_detector("I am so sad about this")
 
 
 if __name__ == '__main__':
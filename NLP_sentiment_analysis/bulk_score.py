@@ -0,0 +1,21 @@
+"""
+Command-line bulk scoring of JSONL/CSV files with sentiment_analyzer_batch.
+
+Example:
+    python bulk_score.py reviews.csv -o sentiments.jsonl --checkpoint sentiments.ckpt --batch-size 32
+"""
+import sys
+
+from dotenv import load_dotenv
+
+from practice_project.SentimentAnalysis.sentiment_analysis import (
+    sentiment_analyzer,
+    sentiment_analyzer_batch
+)
+from watson_client import bulk
+
+# Load environment variables from .env file
+load_dotenv()
+
+if __name__ == '__main__':
+    sys.exit(bulk.main(sentiment_analyzer, 'sentiment', score_batch=sentiment_analyzer_batch))
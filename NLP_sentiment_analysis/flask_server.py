@@ -5,18 +5,54 @@ analysis to be executed over the Flask channel and deployed on
 localhost:5000.
 """
 
+import hashlib
 import json
+import os
 
 from dotenv import load_dotenv
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, make_response, render_template, request
 
+from practice_project.SentimentAnalysis import backends
 from practice_project.SentimentAnalysis.sentiment_analysis import sentiment_analyzer
+import watson_client
+from watson_client import metrics
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Initiate the Flask app
 app = Flask(__name__)
+watson_client.install_request_deadlines(app)
+metrics.init_app(app)
+
+# Map sentiment labels (without Watson's SENT_ prefix) to Bootstrap color classes
+SENTIMENT_COLORS = {
+    'POSITIVE': 'success',
+    'NEGATIVE': 'danger',
+    'NEUTRAL': 'secondary'
+}
+
+# Result fragment template, compiled once and rendered without a request context
+RESULT_TEMPLATE = app.jinja_env.get_template('sentiment_result.html')
+
+# Seconds clients may reuse a result before revalidating it with its ETag
+HTTP_MAX_AGE = int(os.getenv('SENTIMENT_HTTP_MAX_AGE', '3600'))
+
+
+def _render_sentiment_html(label, score):
+    """Render the result card for a label and score."""
+    color_class = SENTIMENT_COLORS.get(label.upper().removeprefix('SENT_'), 'info')
+    if score <= 1:
+        confidence_percent = round(score * 100, 2)
+    else:
+        confidence_percent = round(score, 2)
+    return RESULT_TEMPLATE.render(
+        label=label,
+        score=score,
+        color_class=color_class,
+        confidence_percent=confidence_percent,
+        raw={'label': label, 'score': score}
+    )
 
 
 def format_sentiment_response(response_dict):
@@ -31,65 +67,48 @@ def format_sentiment_response(response_dict):
     """
     # Check for error first
     if 'error' in response_dict:
-        return f"""
-        <div class="alert alert-danger" role="alert">
-            <strong>Error:</strong> {response_dict['error']}
-        </div>
-        """
+        return RESULT_TEMPLATE.render(error=response_dict['error'])
 
     # Extract sentiment label and score from the response dictionary
     sentiment_label = response_dict.get('label')
     confidence_score = response_dict.get('score')
 
     # If we have sentiment info, format it for display
-    if sentiment_label and confidence_score is not None:
-        # Map sentiment labels to Bootstrap color classes
-        sentiment_colors = {
-            'positive': 'success',
-            'negative': 'danger',
-            'neutral': 'secondary',
-            'POSITIVE': 'success',
-            'NEGATIVE': 'danger',
-            'NEUTRAL': 'secondary'
-        }
-
-        color_class = sentiment_colors.get(sentiment_label.upper(), 'info')
-        if confidence_score <= 1:
-            confidence_percent = round(confidence_score * 100, 2)
-        else:
-            confidence_percent = round(confidence_score, 2)
-        return f"""
-        <div class="card border-{color_class} mb-3">
-            <div class="card-header bg-{color_class} text-white">
-                <h4 class="mb-0">Sentiment: {sentiment_label.upper()}</h4>
-            </div>
-            <div class="card-body">
-                <h5 class="card-title">Confidence Score</h5>
-                <div class="progress mb-3" style="height: 30px;">
-                    <div class="progress-bar bg-{color_class}" role="progressbar" 
-                         style="width: {confidence_percent}%" 
-                         aria-valuenow="{confidence_percent}" 
-                         aria-valuemin="0" 
-                         aria-valuemax="100">
-                        {confidence_percent}%
-                    </div>
-                </div>
-                <p class="card-text"><small class="text-muted">Raw score: {confidence_score}</small></p>
-            </div>
-        </div>
-        <details class="mt-3">
-            <summary style="cursor: pointer; color: #6c757d;">View Raw Response</summary>
-            <pre class="mt-2" style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; overflow-x: auto;">{json.dumps(response_dict, indent=2)}</pre>
-        </details>
-        """
+    if sentiment_label and confidence_score is not None and set(response_dict) == {'label', 'score'}:
+        return _render_sentiment_html(sentiment_label, confidence_score)
 
     # Fallback: show formatted response
-    return f"""
-    <div class="alert alert-info" role="alert">
-        <strong>Response received:</strong>
-    </div>
-    <pre style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; overflow-x: auto;">{json.dumps(response_dict, indent=2)}</pre>
+    return RESULT_TEMPLATE.render(raw=response_dict)
+
+
+def _wants_json():
+    """Check whether the client asked for JSON (?format=json or the Accept header)."""
+    if request.args.get('format') == 'json':
+        return True
+    best = request.accept_mimetypes.best_match(['text/html', 'application/json'])
+    return best == 'application/json'
+
+
+def _result_etag(text_to_analyze, as_json):
+    """
+    ETag for the result of analyzing a text: a hash of the representation,
+    the model and the input. None if the backend is misconfigured.
     """
+    try:
+        model_id = backends.get_backend().model_id
+    except ValueError:
+        return None
+    key = '\0'.join(('json' if as_json else 'html', str(model_id), text_to_analyze))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def _cacheable(response, etag):
+    """Mark a response as cacheable by the client under an ETag."""
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = HTTP_MAX_AGE
+    response.vary.add('Accept')
+    return response
 
 
 @app.route("/sentimentAnalyzer")
@@ -98,30 +117,65 @@ def sent_analyzer():
     This code receives the text from the HTML interface and
     runs sentiment analysis over it using sentiment_analyzer()
     function. The output returned shows the label and its confidence
-    score for the provided text.
+    score for the provided text, as HTML or, for clients that ask
+    for it, JSON.
     """
     # Retrieve the text to analyze from the request arguments
     text_to_analyze = request.args.get('textToAnalyze')
+    as_json = _wants_json()
 
     if not text_to_analyze:
+        if as_json:
+            return jsonify({"error": "No text provided"}), 400
         return json.dumps({"error": "No text provided"})
 
-    # Pass the text to the sentiment_analyzer function and store the response
+    # Results for a text don't change, so a client holding this ETag is up to date
+    etag = _result_etag(text_to_analyze, as_json)
+    if etag is not None and request.if_none_match.contains(etag):
+        return _cacheable(Response(status=304), etag)
+
+    # Pass the text to the sentiment analyzer and store the response
     response = sentiment_analyzer(text_to_analyze)
 
+    # Extract the label from the response
+    label = response.get('label')
+
+    if as_json:
+        if 'error' in response:
+            return jsonify({"error": response['error']}), 503
+        if label is None:
+            return jsonify({"error": "Invalid input! Try again."}), 422
+        result = jsonify({"label": label, "score": response['score']})
+        return _cacheable(result, etag) if etag is not None else result
+
     # Check if the response contains an error
     if 'error' in response:
         return format_sentiment_response(response)
 
-    # Extract the label from the response
-    label = response.get('label')
-
     # Check if the label is None, indicating an error or invalid input
     if label is None:
         return "Invalid input! Try again."
 
     # Format and return the response with sentiment information
-    return format_sentiment_response(response)
+    result = make_response(format_sentiment_response(response))
+    return _cacheable(result, etag) if etag is not None else result
+
+
+@app.route("/cacheStats")
+def cache_stats():
+    """
+    This function reports the result cache hit rates for monitoring
+    """
+    return jsonify(watson_client.cache_stats())
+
+
+@app.route("/upstreamStats")
+def upstream_stats():
+    """
+    This function reports circuit breaker state, rolling latency and
+    error rate, and hedging counts for the Watson endpoint
+    """
+    return jsonify(watson_client.breaker_stats())
 
 
 @app.route("/")
@@ -1,2 +1,9 @@
-from . import sentiment_analysis
+import sys
+from pathlib import Path
 
+# Make the repository-level watson_client package importable
+_REPO_ROOT = str(Path(__file__).resolve().parents[3])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from . import sentiment_analysis  # noqa: E402
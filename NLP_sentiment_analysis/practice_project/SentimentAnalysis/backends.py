@@ -0,0 +1,158 @@
+"""
+Sentiment Analysis Backends
+Pluggable inference backends for sentiment_analyzer. The backend is chosen
+with the SENTIMENT_BACKEND environment variable:
+
+- ``watson`` (default): the remote Watson NLP BERT model
+- ``local``: a transformers text-classification model run on the CPU
+
+Every backend returns the same ``{'label', 'score'}`` dictionaries, with
+labels in Watson's ``SENT_POSITIVE`` / ``SENT_NEGATIVE`` / ``SENT_NEUTRAL`` form.
+"""
+
+import asyncio
+import os
+import threading
+
+SENTIMENT_BACKEND = os.getenv('SENTIMENT_BACKEND', 'watson').lower()
+LOCAL_MODEL = os.getenv('SENTIMENT_LOCAL_MODEL', 'cardiffnlp/twitter-roberta-base-sentiment-latest')
+# Torch intra-op threads for the local model (0 keeps torch's default)
+LOCAL_THREADS = int(os.getenv('SENTIMENT_LOCAL_THREADS', '0'))
+LOCAL_BATCH_SIZE = int(os.getenv('SENTIMENT_LOCAL_BATCH_SIZE', '32'))
+
+
+class SentimentBackend:
+    """
+    Interface implemented by sentiment backends.
+
+    Subclasses implement analyze(); analyze_batch() and analyze_async()
+    fall back to calling it per text and in a worker thread respectively.
+    """
+
+    name = None
+    model_id = None
+
+    def analyze(self, text_to_analyse):
+        """Analyze one text, returning {'label', 'score'} or {'error'}."""
+        raise NotImplementedError
+
+    def analyze_batch(self, texts):
+        """Analyze several texts, returning one result per text in order."""
+        return [self.analyze(text) for text in texts]
+
+    async def analyze_async(self, text_to_analyse):
+        """Analyze one text without blocking the event loop."""
+        return await asyncio.to_thread(self.analyze, text_to_analyse)
+
+
+# Model labels and their Watson form. Three-class models without named
+# labels number them negative, neutral, positive (as cardiffnlp's do).
+WATSON_LABELS = {
+    'NEGATIVE': 'SENT_NEGATIVE',
+    'NEUTRAL': 'SENT_NEUTRAL',
+    'POSITIVE': 'SENT_POSITIVE',
+    'LABEL_0': 'SENT_NEGATIVE',
+    'LABEL_1': 'SENT_NEUTRAL',
+    'LABEL_2': 'SENT_POSITIVE',
+}
+
+
+def _watson_label(label):
+    """
+    Map a model label such as 'positive' or 'LABEL_2' to Watson's SENT_* form.
+
+    Raises:
+        ValueError: If the label is not a known sentiment label
+    """
+    label = label.upper()
+    if label.startswith('SENT_'):
+        return label
+    if label not in WATSON_LABELS:
+        raise ValueError(f"Unknown sentiment label '{label}' from model")
+    return WATSON_LABELS[label]
+
+
+class LocalSentimentBackend(SentimentBackend):
+    """
+    CPU sentiment classifier using a Hugging Face transformers pipeline.
+
+    The model is loaded on first use. Texts are classified in batches of
+    SENTIMENT_LOCAL_BATCH_SIZE, and calls are serialized because the
+    pipeline's tokenizer is not safe to share between threads.
+    """
+
+    name = 'local'
+
+    def __init__(self, model_id=LOCAL_MODEL, threads=LOCAL_THREADS, batch_size=LOCAL_BATCH_SIZE,
+                 classifier=None):
+        self.model_id = model_id
+        self.threads = threads
+        self.batch_size = batch_size
+        self._classifier = classifier
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Load the pipeline (caller holds _lock)."""
+        if self._classifier is None:
+            # Imported lazily so the Watson backend works without torch installed
+            import torch  # pylint: disable=import-outside-toplevel
+            from transformers import pipeline  # pylint: disable=import-outside-toplevel
+
+            if self.threads > 0:
+                torch.set_num_threads(self.threads)
+            self._classifier = pipeline('text-classification', model=self.model_id, device=-1)
+        return self._classifier
+
+    def analyze(self, text_to_analyse):
+        return self.analyze_batch([text_to_analyse])[0]
+
+    def analyze_batch(self, texts):
+        # Match Watson, which rejects empty documents as invalid input
+        results = [{'label': None, 'score': None} for _ in texts]
+        indexes = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indexes:
+            return results
+
+        try:
+            with self._lock:
+                predictions = self._load()(
+                    [texts[i] for i in indexes],
+                    batch_size=self.batch_size,
+                    truncation=True
+                )
+            labels = [_watson_label(prediction['label']) for prediction in predictions]
+        except Exception as e:  # pylint: disable=broad-except
+            return [{'error': f"Failed to analyze sentiment: {str(e)}"} for _ in texts]
+
+        for i, label, prediction in zip(indexes, labels, predictions):
+            results[i] = {'label': label, 'score': float(prediction['score'])}
+        return results
+
+
+_BACKENDS = {'local': LocalSentimentBackend}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_backend(name, factory):
+    """Register a backend class (or zero-argument factory) under a SENTIMENT_BACKEND name."""
+    _BACKENDS[name] = factory
+
+
+def get_backend(name=None):
+    """
+    Get the shared instance of a backend.
+
+    Args:
+        name: Backend name; defaults to SENTIMENT_BACKEND
+
+    Raises:
+        ValueError: If no backend is registered under the name
+    """
+    name = (name or SENTIMENT_BACKEND).lower()
+    with _instances_lock:
+        if name not in _instances:
+            if name not in _BACKENDS:
+                raise ValueError(f"Unknown SENTIMENT_BACKEND '{name}'. Choose from: {', '.join(sorted(_BACKENDS))}")
+            _instances[name] = _BACKENDS[name]()
+        return _instances[name]
@@ -1,27 +1,42 @@
 """
 Sentiment Analysis Module
-This module provides functionality to analyze sentiment of text using Watson NLP API.
+This module provides functionality to analyze sentiment of text using Watson NLP API,
+or a local model when SENTIMENT_BACKEND=local (see backends.py).
 """
 
 import requests
+import httpx
 import json
 import os
 
+import watson_client
 
-def sentiment_analyzer(text_to_analyse):
+from . import backends
+
+MODEL_ID = "sentiment_aggregated-bert-workflow_lang_multi_stock"
+# Watson answers invalid input (e.g. blank text) with a 500, which is not an outage
+INVALID_INPUT_STATUSES = (500,)
+
+
+def _cached_result(text_to_analyse):
+    """Get a cached result for the text, or None."""
+    cache = watson_client.get_cache()
+    return cache.get(MODEL_ID, text_to_analyse) if cache is not None else None
+
+
+def _cache_result(text_to_analyse, result):
+    """Cache a result; invalid-input (label None) results are negative-cached."""
+    cache = watson_client.get_cache()
+    if cache is not None:
+        cache.set(MODEL_ID, text_to_analyse, result, negative=result['label'] is None)
+
+
+def _build_request(text_to_analyse):
     """
-    Analyzes the sentiment of the given text using Watson NLP API.
-    
-    Args:
-        text_to_analyse (str): The text to analyze for sentiment
-        
+    Build the Watson SentimentPredict request for the given text.
+
     Returns:
-        dict: Dictionary containing sentiment label and score, or error message
-        
-    Example:
-        >>> result = sentiment_analyzer("I am happy today")
-        >>> print(result)
-        {'label': 'POSITIVE', 'score': 0.95}
+        tuple: (url, payload, headers), or an error dict if no API key is configured
     """
     # Get API credentials from environment variables
     api_key = os.getenv('WATSON_API_KEY')
@@ -37,39 +52,162 @@ def sentiment_analyzer(text_to_analyse):
 
     # Headers with API key authentication and model ID
     headers = {
-        "grpc-metadata-mm-model-id": "sentiment_aggregated-bert-workflow_lang_multi_stock",
+        "grpc-metadata-mm-model-id": MODEL_ID,
         "Authorization": f"Bearer {api_key}"
     }
+    return api_url, myobj, headers
+
+
+def _parse_response(response):
+    """
+    Extract the label and score from a requests or httpx response.
+
+    Raises:
+        The client's HTTP error for status codes other than 200 and 500
+    """
+    # Parse the response from the API
+    formatted_response = json.loads(response.text)
+    
+    # If the response status code is 200, extract the label and score from the response
+    if response.status_code == 200:
+        label = formatted_response['documentSentiment']['label']
+        score = formatted_response['documentSentiment']['score']
+    # If the response status code is 500, set label and score to None
+    elif response.status_code == 500:
+        label = None
+        score = None
+    else:
+        # For other error status codes, raise an exception
+        response.raise_for_status()
+        label = None
+        score = None
+    
+    # Return the label and score in a dictionary
+    return {'label': label, 'score': score}
+
+
+def _watson_sentiment(text_to_analyse):
+    """Analyze the sentiment of the text with the Watson NLP API."""
+    request = _build_request(text_to_analyse)
+    if isinstance(request, dict):
+        return request
+    api_url, myobj, headers = request
+
+    cached = _cached_result(text_to_analyse)
+    if cached is not None:
+        return cached
 
     try:
         # Sending a POST request to the sentiment analysis API
-        response = requests.post(api_url, json=myobj, headers=headers, timeout=30)
-        
-        # Parse the response from the API
-        formatted_response = json.loads(response.text)
-        
-        # If the response status code is 200, extract the label and score from the response
-        if response.status_code == 200:
-            label = formatted_response['documentSentiment']['label']
-            score = formatted_response['documentSentiment']['score']
-        # If the response status code is 500, set label and score to None
-        elif response.status_code == 500:
-            label = None
-            score = None
-        else:
-            # For other error status codes, raise an exception
-            response.raise_for_status()
-            label = None
-            score = None
-        
-        # Return the label and score in a dictionary
-        return {'label': label, 'score': score}
-    except requests.exceptions.RequestException as e:
+        response = watson_client.call('sentiment', api_url, json=myobj, headers=headers, timeout=30,
+                                      ok_statuses=INVALID_INPUT_STATUSES)
+        result = _parse_response(response)
+        _cache_result(text_to_analyse, result)
+        return result
+    except (requests.exceptions.RequestException, watson_client.CircuitOpenError,
+            watson_client.DeadlineExceeded) as e:
         return {'error': f"Failed to analyze sentiment: {str(e)}"}
     except (KeyError, json.JSONDecodeError) as e:
         return {'error': f"Failed to parse response: {str(e)}"}
 
 
+async def _watson_sentiment_async(text_to_analyse):
+    """Analyze the sentiment of the text with the Watson NLP API over the shared async pool."""
+    request = _build_request(text_to_analyse)
+    if isinstance(request, dict):
+        return request
+    api_url, myobj, headers = request
+
+    cached = _cached_result(text_to_analyse)
+    if cached is not None:
+        return cached
+
+    try:
+        response = await watson_client.call_async('sentiment', api_url, json=myobj, headers=headers, timeout=30,
+                                                  ok_statuses=INVALID_INPUT_STATUSES)
+        result = _parse_response(response)
+        _cache_result(text_to_analyse, result)
+        return result
+    except (httpx.HTTPError, watson_client.CircuitOpenError, watson_client.DeadlineExceeded) as e:
+        return {'error': f"Failed to analyze sentiment: {str(e)}"}
+    except (KeyError, json.JSONDecodeError) as e:
+        return {'error': f"Failed to parse response: {str(e)}"}
+
+
+
+class WatsonSentimentBackend(backends.SentimentBackend):
+    """Backend calling the remote Watson NLP BERT model."""
+
+    name = 'watson'
+    model_id = MODEL_ID
+
+    def analyze(self, text_to_analyse):
+        return _watson_sentiment(text_to_analyse)
+
+    async def analyze_async(self, text_to_analyse):
+        return await _watson_sentiment_async(text_to_analyse)
+
+
+backends.register_backend('watson', WatsonSentimentBackend)
+
+
+def sentiment_analyzer(text_to_analyse):
+    """
+    Analyzes the sentiment of the given text using the backend selected by
+    SENTIMENT_BACKEND (Watson NLP API by default).
+    
+    Args:
+        text_to_analyse (str): The text to analyze for sentiment
+        
+    Returns:
+        dict: Dictionary containing sentiment label and score, or error message
+        
+    Example:
+        >>> result = sentiment_analyzer("I am happy today")
+        >>> print(result)
+        {'label': 'POSITIVE', 'score': 0.95}
+    """
+    try:
+        backend = backends.get_backend()
+    except ValueError as e:
+        return {'error': str(e)}
+    return backend.analyze(text_to_analyse)
+
+
+async def sentiment_analyzer_async(text_to_analyse):
+    """
+    Async variant of sentiment_analyzer; the Watson backend uses the shared async connection pool.
+    
+    Args:
+        text_to_analyse (str): The text to analyze for sentiment
+        
+    Returns:
+        dict: Same result as sentiment_analyzer
+    """
+    try:
+        backend = backends.get_backend()
+    except ValueError as e:
+        return {'error': str(e)}
+    return await backend.analyze_async(text_to_analyse)
+
+
+def sentiment_analyzer_batch(texts):
+    """
+    Analyzes several texts in one call; the local backend classifies them in batches.
+    
+    Args:
+        texts (list[str]): The texts to analyze
+        
+    Returns:
+        list[dict]: One sentiment_analyzer result per text, in order
+    """
+    try:
+        backend = backends.get_backend()
+    except ValueError as e:
+        return [{'error': str(e)} for _ in texts]
+    return backend.analyze_batch(texts)
+
+
 if __name__ == "__main__":
     # Example usage
     test_texts = [
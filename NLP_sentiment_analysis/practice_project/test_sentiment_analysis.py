@@ -1,6 +1,7 @@
 import unittest
 import os
 from practice_project.SentimentAnalysis.sentiment_analysis import sentiment_analyzer
+from practice_project.SentimentAnalysis import backends
 
 
 class TestSentimentAnalyzer(unittest.TestCase):
@@ -52,6 +53,7 @@ class TestSentimentAnalyzer(unittest.TestCase):
         # Should handle empty string gracefully
         self.assertIsInstance(result, dict)
     
+    @unittest.skipIf(backends.SENTIMENT_BACKEND == 'local', "The local backend needs no API key.")
     def test_sentiment_analyzer_no_api_key(self):
         """Test case when API key is not set."""
         # Temporarily remove API key
@@ -67,5 +69,43 @@ class TestSentimentAnalyzer(unittest.TestCase):
             os.environ['WATSON_API_KEY'] = original_key
 
 
+class TestLocalSentimentBackend(unittest.TestCase):
+    """Test cases for the local backend, using a stand-in classifier."""
+    
+    def setUp(self):
+        """Set up a backend whose classifier records the batches it receives."""
+        self.batches = []
+        
+        def classifier(texts, batch_size, truncation):
+            self.batches.append(list(texts))
+            return [{'label': 'positive' if 'love' in text else 'negative', 'score': 0.9} for text in texts]
+        
+        self.backend = backends.LocalSentimentBackend(classifier=classifier)
+    
+    def test_labels_use_watson_form(self):
+        """Test that model labels are mapped to Watson's SENT_* labels."""
+        self.assertEqual(self.backend.analyze('I love this project'), {'label': 'SENT_POSITIVE', 'score': 0.9})
+        self.assertEqual(self.backend.analyze('I hate this project')['label'], 'SENT_NEGATIVE')
+    
+    def test_numbered_labels_are_mapped(self):
+        """Test that LABEL_0/1/2 map to negative, neutral and positive, and unknown labels are errors."""
+        self.assertEqual(backends._watson_label('LABEL_0'), 'SENT_NEGATIVE')
+        self.assertEqual(backends._watson_label('LABEL_1'), 'SENT_NEUTRAL')
+        self.assertEqual(backends._watson_label('label_2'), 'SENT_POSITIVE')
+        self.assertEqual(backends._watson_label('Neutral'), 'SENT_NEUTRAL')
+        
+        backend = backends.LocalSentimentBackend(
+            classifier=lambda texts, batch_size, truncation: [{'label': 'LABEL_7', 'score': 0.5} for _ in texts]
+        )
+        self.assertIn('error', backend.analyze('I love it'))
+    
+    def test_batch_skips_empty_texts(self):
+        """Test that a batch is classified in one call and empty texts get None results."""
+        results = self.backend.analyze_batch(['I love it', '  ', 'I hate it'])
+        self.assertEqual(self.batches, [['I love it', 'I hate it']])
+        self.assertEqual(results[1], {'label': None, 'score': None})
+        self.assertEqual([r['label'] for r in results], ['SENT_POSITIVE', None, 'SENT_NEGATIVE'])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -15,6 +15,32 @@ class Config:
     llm_model_id = os.getenv("LLM_MODEL_ID", "tiiuae/falcon-7b-instruct")
     embedding_model_id = os.getenv("EMBEDDING_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2")
     
+    # Embedding engine (EMBEDDING_THREADS=0 keeps torch's default intra-op thread count)
+    embedding_max_batch_size = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+    embedding_max_wait_ms = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+    embedding_threads = int(os.getenv("EMBEDDING_THREADS", "0"))
+    
+    # Model backend: "hub" (HuggingFace Hub LLM), "local" (llama.cpp on a
+    # local GGUF model) or "fake" (fixed-latency stand-ins for load tests;
+    # see app/services/fakes.py)
+    llm_backend = os.getenv("LLM_BACKEND", "hub").lower()
+    local_llm_model_path = os.getenv("LOCAL_LLM_MODEL_PATH", "")
+    local_llm_context = int(os.getenv("LOCAL_LLM_CONTEXT", "4096"))
+    local_llm_batch_size = int(os.getenv("LOCAL_LLM_BATCH_SIZE", "512"))
+    local_llm_threads = int(os.getenv("LOCAL_LLM_THREADS", "0"))
+    local_llm_prefix_cache_mb = int(os.getenv("LOCAL_LLM_PREFIX_CACHE_MB", "256"))
+    
+    # LLM request queue: generations running at once (0 = unbounded; the
+    # local backend always runs one), callers allowed to wait, and how long
+    llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+    llm_queue_size = int(os.getenv("LLM_QUEUE_SIZE", "8"))
+    llm_queue_timeout = float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))
+    fake_llm_tokens = int(os.getenv("FAKE_LLM_TOKENS", "50"))
+    fake_llm_token_ms = float(os.getenv("FAKE_LLM_TOKEN_MS", "20"))
+    fake_llm_first_token_ms = float(os.getenv("FAKE_LLM_FIRST_TOKEN_MS", "100"))
+    fake_embedding_batch_ms = float(os.getenv("FAKE_EMBEDDING_BATCH_MS", "5"))
+    fake_embedding_text_ms = float(os.getenv("FAKE_EMBEDDING_TEXT_MS", "0.5"))
+    
     # LLM parameters
     llm_temperature = float(os.getenv("LLM_TEMPERATURE", "0.1"))
     llm_max_new_tokens = int(os.getenv("LLM_MAX_NEW_TOKENS", "600"))
@@ -23,6 +49,43 @@ class Config:
     chunk_size = int(os.getenv("CHUNK_SIZE", "1024"))
     chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "64"))
     retriever_k = int(os.getenv("RETRIEVER_K", "6"))
+    retriever_mode = os.getenv("RETRIEVER_MODE", "hybrid").lower()  # "vector" or "hybrid"
+    rrf_k = int(os.getenv("RRF_K", "60"))
+    
+    # Vector search: "chroma" (Chroma's own index) or "ivf" (int8 IVF index in
+    # memory-mapped files under VECTOR_INDEX_DIR, reranked at full precision;
+    # IVF_LISTS=0 picks about sqrt(chunks) lists)
+    vector_index = os.getenv("VECTOR_INDEX", "chroma").lower()
+    vector_index_dir = os.getenv("VECTOR_INDEX_DIR", "vector_index")
+    ivf_lists = int(os.getenv("IVF_LISTS", "0"))
+    ivf_probes = int(os.getenv("IVF_PROBES", "8"))
+    ivf_rerank = int(os.getenv("IVF_RERANK", "64"))
+    
+    # Contextual compression: send the LLM only the retrieved sentences that
+    # best match the question, packed into an approximate token budget
+    context_compression = os.getenv("CONTEXT_COMPRESSION", "true").lower() == "true"
+    context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "768"))
+    
+    # Ingestion pipeline
+    ingest_workers = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+    ingest_pages_per_task = int(os.getenv("INGEST_PAGES_PER_TASK", "8"))
+    embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+    ingest_concurrency = int(os.getenv("INGEST_CONCURRENCY", "2"))
+    ingest_queue_size = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+    
+    # Sessions (per-client chat history and document scope)
+    session_max = int(os.getenv("SESSION_MAX", "1000"))
+    session_ttl = int(os.getenv("SESSION_TTL", "3600"))
+    session_history_tokens = int(os.getenv("SESSION_HISTORY_TOKENS", "1024"))
+    
+    # Query caches (question embeddings and full answers)
+    query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    query_cache_ttl = int(os.getenv("QUERY_CACHE_TTL", "3600"))
+    answer_cache_size = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    answer_cache_ttl = int(os.getenv("ANSWER_CACHE_TTL", "600"))
+    
+    # Model warm-up: "eager" (before serving), "background" (while serving) or "lazy" (first request)
+    warmup_mode = os.getenv("WARMUP_MODE", "background").lower()
     
     # Flask
     flask_debug = os.getenv("FLASK_DEBUG", "false").lower() == "true"
@@ -31,6 +94,14 @@ class Config:
     
     # Paths
     upload_folder = os.getenv("UPLOAD_FOLDER", "uploads")
+    
+    # Vector store persistence (empty CHROMA_PERSIST_DIR keeps the index in memory)
+    chroma_persist_dir = os.getenv("CHROMA_PERSIST_DIR", "chroma_data")
+    chroma_collection = os.getenv("CHROMA_COLLECTION", "tech_docs")
+    
+    # Embedding cache (content-addressed by model id + chunk text)
+    embedding_cache_dir = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+    embedding_cache_max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
 
 
 config = Config()
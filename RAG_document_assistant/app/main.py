@@ -1,13 +1,16 @@
 """Flask application for RAG for Tech Docs."""
 
+import json
 import logging
+import tempfile
+import threading
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
 from app.config import config
-from app.services import rag
+from app.services import jobs, metrics, rag
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +23,7 @@ app = Flask(
     static_folder="../static"
 )
 CORS(app)
+metrics.init_app(app)
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max upload
 
 # Log warning if API token not set
@@ -27,6 +31,28 @@ if not config.huggingface_api_token:
     logger.warning("HUGGINGFACE_API_TOKEN not set. LLM calls will fail.")
 
 
+def warm_up():
+    """Load models and reopen the persisted index so previously uploaded documents stay queryable."""
+    try:
+        restored_chunks = rag.warm_up()
+        if restored_chunks:
+            logger.info(f"Restored {restored_chunks} chunks from {config.chroma_persist_dir}")
+        logger.info("Warm-up complete")
+    except Exception as e:
+        logger.error(f"Error during warm-up: {e}")
+
+
+if config.warmup_mode == "eager":
+    warm_up()
+elif config.warmup_mode == "background":
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def _session_id():
+    """Get the client's session id (sent by the frontend in X-Session-Id)."""
+    return request.headers.get("X-Session-Id") or "default"
+
+
 @app.route("/")
 def index():
     """Serve the main page."""
@@ -35,8 +61,18 @@ def index():
 
 @app.route("/health")
 def health():
-    """Health check endpoint."""
-    return jsonify({"status": "healthy"})
+    """Liveness check: the server is up, whether or not models are loaded."""
+    return jsonify({"status": "healthy", "ready": rag.is_ready()})
+
+
+@app.route("/health/ready")
+def health_ready():
+    """Readiness check: 503 until models are loaded and the index is restored."""
+    if rag.is_ready():
+        return jsonify({"status": "ready"})
+    if rag.warm_up_error:
+        return jsonify({"status": "failed", "error": rag.warm_up_error}), 503
+    return jsonify({"status": "warming_up", "mode": config.warmup_mode}), 503
 
 
 @app.route("/process-message", methods=["POST"])
@@ -52,8 +88,8 @@ def process_message():
         return jsonify({"error": "Message cannot be empty"}), 400
     
     try:
-        result = rag.query(user_message)
-        return jsonify({"botResponse": result["answer"]})
+        result = rag.query(user_message, session_id=_session_id())
+        return jsonify({"botResponse": result["answer"], "context": result["context"]})
     except RuntimeError as e:
         return jsonify({"botResponse": str(e)})
     except Exception as e:
@@ -61,9 +97,52 @@ def process_message():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/process-message/stream", methods=["POST"])
+def process_message_stream():
+    """Process a user message, streaming the AI response as Server-Sent Events."""
+    data = request.get_json()
+    
+    if not data or "userMessage" not in data:
+        return jsonify({"error": "Missing userMessage"}), 400
+    
+    user_message = data["userMessage"].strip()
+    if not user_message:
+        return jsonify({"error": "Message cannot be empty"}), 400
+    
+    session_id = _session_id()
+    
+    def generate():
+        try:
+            for event, payload in rag.stream_query(user_message, session_id=session_id):
+                if event == "done":
+                    logger.info(f"Streamed answer: ttft={payload['ttft_ms']}ms total={payload['total_ms']}ms")
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except RuntimeError as e:
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            yield f"event: error\ndata: {json.dumps({'message': f'Error: {str(e)}'})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _document_message(result):
+    """Build the chat message for a processed document."""
+    if result["status"] == "duplicate":
+        return f"'{result['document']}' is already indexed ({result['chunks']} chunks). You can ask questions about it!"
+    if result["status"] == "updated":
+        return (f"Updated '{result['document']}' ({result['pages']} pages, {result['chunks']} chunks: "
+                f"{result['chunks_added']} new, {result['chunks_removed']} removed). You can now ask questions!")
+    return f"Processed '{result['document']}' ({result['pages']} pages, {result['chunks']} chunks). You can now ask questions!"
+
+
 @app.route("/process-document", methods=["POST"])
 def process_document():
-    """Upload and process a PDF document."""
+    """Upload a PDF document and queue it for processing."""
     if "file" not in request.files:
         return jsonify({"botResponse": "No file uploaded."}), 400
     
@@ -75,35 +154,78 @@ def process_document():
     if not file.filename.lower().endswith(".pdf"):
         return jsonify({"botResponse": "Only PDF files are supported."}), 400
     
+    file_path = None
     try:
-        # Save file
+        # Save file under a name of its own, so a second upload of the same
+        # document can't overwrite it while a job is still reading it
         filename = secure_filename(file.filename)
         upload_path = Path(config.upload_folder)
         upload_path.mkdir(exist_ok=True)
-        file_path = upload_path / filename
-        file.save(str(file_path))
+        with tempfile.NamedTemporaryFile(dir=upload_path, suffix=".pdf", delete=False) as upload:
+            file_path = upload.name
+            file.save(upload)
         
-        # Process document
-        result = rag.process_document(str(file_path))
+        # Process document in the background (the job deletes the file when done)
+        job_id = jobs.submit(file_path, filename, session_id=_session_id())
         
         return jsonify({
-            "botResponse": f"Processed '{result['document']}' ({result['pages']} pages, {result['chunks']} chunks). You can now ask questions!"
-        })
+            "jobId": job_id,
+            "status": "queued",
+            "botResponse": f"Processing '{filename}'..."
+        }), 202
+    except RuntimeError as e:
+        if file_path is not None:
+            Path(file_path).unlink(missing_ok=True)
+        return jsonify({"botResponse": str(e)}), 503
     except Exception as e:
         logger.error(f"Error processing document: {e}")
+        if file_path is not None:
+            Path(file_path).unlink(missing_ok=True)
         return jsonify({"botResponse": f"Error: {str(e)}"}), 500
 
 
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Get progress of a document processing job."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    
+    if job["status"] == "done":
+        job["botResponse"] = _document_message(job["result"])
+    elif job["status"] == "failed":
+        job["botResponse"] = f"Error: {job['error']}"
+    return jsonify(job)
+
+
+@app.route("/documents/<name>", methods=["DELETE"])
+def delete_document(name):
+    """Remove a document from the index (upload it again to re-index it)."""
+    # A queued or running job would index the document again right after it was deleted
+    if jobs.is_active(name):
+        return jsonify({"error": "Document is being processed; delete it once its job has finished"}), 409
+    try:
+        result = rag.delete_document(name)
+    except KeyError:
+        return jsonify({"error": "Unknown document"}), 404
+    except Exception as e:
+        logger.error(f"Error deleting document: {e}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify(result)
+
+
 @app.route("/status")
 def status():
     """Get RAG service status."""
-    return jsonify(rag.get_status())
+    status = rag.get_status(session_id=_session_id())
+    status["jobs"] = jobs.get_summary()
+    return jsonify(status)
 
 
 @app.route("/clear-history", methods=["POST"])
 def clear_history():
     """Clear chat history."""
-    rag.clear_history()
+    rag.clear_history(session_id=_session_id())
     return jsonify({"status": "cleared"})
 
 
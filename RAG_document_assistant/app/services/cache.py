@@ -0,0 +1,78 @@
+"""In-process LRU/TTL caches for query embeddings and answers."""
+
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text):
+    """Normalize a question for use as a cache key."""
+    return " ".join(text.lower().split())
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl_seconds."""
+
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Get a cached value, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """Embeddings wrapper caching embed_query results by normalized text."""
+
+    def __init__(self, embeddings, cache):
+        self._embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        return self._embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = normalize_text(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self._embeddings.embed_query(text)
+            self.cache.set(key, vector)
+        return vector
@@ -0,0 +1,154 @@
+"""Contextual compression: pack the most query-relevant sentences of retrieved chunks into a token budget."""
+
+import re
+
+import numpy as np
+
+from app.services.lexical import tokenize
+from app.services.sessions import estimate_tokens
+
+# Sentence ends, or blank lines between paragraphs and list items
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+# Longer spans (tables, text extracted without punctuation) are cut at whitespace
+MAX_SPAN_CHARS = 400
+
+# Weight of the share of question terms a sentence contains, added to its
+# cosine similarity so exact identifiers (error codes, API names) rank well
+LEXICAL_WEIGHT = 0.3
+
+# Shortest overlap between adjacent chunks worth stripping; shorter matches
+# are more likely coincidence than CHUNK_OVERLAP
+MIN_OVERLAP_CHARS = 20
+
+
+def split_sentences(text):
+    """Split text into sentence-sized spans of at most MAX_SPAN_CHARS."""
+    spans = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > MAX_SPAN_CHARS:
+            cut = sentence.rfind(" ", 0, MAX_SPAN_CHARS)
+            cut = cut if cut > 0 else MAX_SPAN_CHARS
+            spans.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            spans.append(sentence)
+    return spans
+
+
+def _overlap(left, right, limit):
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`,
+    at least MIN_OVERLAP_CHARS long and ending on a word boundary of `right`.
+    """
+    for size in range(min(limit, len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+        at_boundary = size == len(right) or not (right[size - 1].isalnum() and right[size].isalnum())
+        if at_boundary and left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _strip_overlap(doc, neighbours, limit):
+    """
+    Remove the text that adjacent chunks of the same page already contain
+    (CHUNK_OVERLAP). Chunks are adjacent when their page offsets overlap;
+    chunks stored without an offset are left whole.
+    """
+    text = doc.page_content
+    start = doc.metadata.get("start_index")
+    if start is None:
+        return text
+    head, tail = 0, len(text)
+    for neighbour in neighbours:
+        neighbour_start = neighbour.metadata.get("start_index")
+        if neighbour_start is None or neighbour.metadata.get("page") != doc.metadata.get("page"):
+            continue
+        if neighbour_start < start < neighbour_start + len(neighbour.page_content):
+            head = max(head, _overlap(neighbour.page_content, text, limit))
+        elif start < neighbour_start < start + len(text):
+            tail = min(tail, len(text) - _overlap(text, neighbour.page_content, limit))
+    return text[head:tail]
+
+
+def compress(question, documents, embeddings, token_budget, max_overlap, query_embeddings=None):
+    """
+    Keep the sentences of the retrieved chunks that best match the question.
+
+    Chunks are split into sentences; overlap with adjacent chunks of the
+    same document and repeated sentences are dropped. The rest are scored by
+    cosine similarity to the question embedding plus the share of question
+    terms they contain, then packed best-first into the token budget. The
+    kept sentences are returned in their original order, grouped by chunk.
+
+    Args:
+        question: User's question
+        documents: Retrieved chunk Documents, best first
+        embeddings: Embeddings used to score sentences against the question
+            (uncached: sentences are rarely embedded twice)
+        token_budget: Maximum estimated tokens of context to keep
+        max_overlap: Longest overlap between chunks to look for, in characters
+        query_embeddings: Embeddings for the question, e.g. a cached one
+            (defaults to `embeddings`)
+
+    Returns:
+        (list of Documents with compressed page_content, stats dict with
+        "tokens_in", "tokens_out" and "tokens_saved")
+    """
+    from langchain_core.documents import Document
+
+    tokens_in = sum(estimate_tokens(doc.page_content) for doc in documents)
+
+    # (chunk position, sentence position, text) for every distinct sentence
+    candidates = []
+    seen = set()
+    kept_texts = {}
+    for position, doc in enumerate(documents):
+        document_name = doc.metadata.get("document")
+        neighbours = kept_texts.setdefault(document_name, [])
+        text = _strip_overlap(doc, neighbours, max_overlap)
+        neighbours.append(doc)
+        for index, sentence in enumerate(split_sentences(text)):
+            key = " ".join(sentence.lower().split())
+            if key not in seen:
+                seen.add(key)
+                candidates.append((position, index, sentence))
+
+    if not candidates:
+        return [], {"tokens_in": tokens_in, "tokens_out": 0, "tokens_saved": tokens_in}
+
+    question_vector = np.asarray((query_embeddings or embeddings).embed_query(question), dtype=np.float32)
+    sentence_vectors = np.asarray(
+        embeddings.embed_documents([sentence for _, _, sentence in candidates]), dtype=np.float32
+    )
+    norms = np.linalg.norm(sentence_vectors, axis=1) * np.linalg.norm(question_vector)
+    similarities = (sentence_vectors @ question_vector) / np.maximum(norms, 1e-12)
+
+    question_terms = set(tokenize(question))
+    if question_terms:
+        matched = np.array([
+            len(question_terms & set(tokenize(sentence))) / len(question_terms) for _, _, sentence in candidates
+        ])
+    else:
+        matched = np.zeros(len(candidates))
+    scores = similarities + LEXICAL_WEIGHT * matched
+    ranked = [candidates[i] for i in np.argsort(-scores, kind="stable")]
+
+    # Greedy packing; the best sentence is always kept
+    selected = []
+    tokens_out = 0
+    for position, index, sentence in ranked:
+        tokens = estimate_tokens(sentence)
+        if selected and tokens_out + tokens > token_budget:
+            continue
+        selected.append((position, index, sentence))
+        tokens_out += tokens
+
+    grouped = {}
+    for position, index, sentence in sorted(selected):
+        grouped.setdefault(position, []).append(sentence)
+    compressed = [
+        Document(page_content=" ".join(sentences), metadata=documents[position].metadata)
+        for position, sentences in grouped.items()
+    ]
+    return compressed, {"tokens_in": tokens_in, "tokens_out": tokens_out, "tokens_saved": tokens_in - tokens_out}
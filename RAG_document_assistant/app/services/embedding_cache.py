@@ -0,0 +1,98 @@
+"""Size-bounded, file-backed byte store for caching chunk embeddings."""
+
+import os
+import threading
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from langchain_core.stores import BaseStore
+
+
+class BoundedFileStore(BaseStore[str, bytes]):
+    """
+    Byte store keeping one file per key, evicting least recently used
+    entries once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, root_path, max_bytes):
+        self.root_path = Path(root_path)
+        self.root_path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self.root_path.iterdir() if p.is_file())
+
+    def _path(self, key):
+        """Map a cache key to a file path (keys may contain '/')."""
+        return self.root_path / quote(key, safe="")
+
+    def mget(self, keys):
+        values = []
+        for key in keys:
+            path = self._path(key)
+            try:
+                value = path.read_bytes()
+            except FileNotFoundError:
+                value = None
+            values.append(value)
+            if value is not None:
+                # Touch on read so eviction is least-recently-used; the file
+                # may have been evicted since it was read
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass
+        return values
+
+    def mset(self, key_value_pairs):
+        with self._lock:
+            for key, value in key_value_pairs:
+                path = self._path(key)
+                try:
+                    self._size -= path.stat().st_size
+                except FileNotFoundError:
+                    pass
+                tmp_path = path.with_name(path.name + ".tmp")
+                tmp_path.write_bytes(value)
+                os.replace(tmp_path, path)
+                self._size += len(value)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def mdelete(self, keys):
+        with self._lock:
+            for key in keys:
+                path = self._path(key)
+                try:
+                    self._size -= path.stat().st_size
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def yield_keys(self, prefix=None):
+        for path in self.root_path.iterdir():
+            if path.suffix == ".tmp":
+                continue
+            key = unquote(path.name)
+            if prefix is None or key.startswith(prefix):
+                yield key
+
+    def _evict(self):
+        """Delete the oldest entries until the store is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for path in self.root_path.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+                self._size -= size
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,116 @@
+"""Embedding service that coalesces concurrent calls into micro-batches."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model so that concurrent embed_query and
+    embed_documents calls share forward passes.
+
+    Calls are queued and a single worker thread drains the queue, waiting
+    at most max_wait_ms for more work before encoding up to
+    max_batch_size texts at once. Larger max_wait_ms trades per-call
+    latency for throughput.
+    """
+
+    def __init__(self, embeddings, max_batch_size=32, max_wait_ms=5):
+        self._embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._worker = threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._submit("document", list(texts))
+
+    def embed_query(self, text):
+        return self._submit("query", [text])[0]
+
+    def stats(self):
+        """Get batching counters."""
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "texts": self._texts,
+                "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "queued": self._queue.qsize()
+            }
+
+    def _submit(self, kind, texts):
+        future = Future()
+        self._queue.put((kind, texts, future))
+        return future.result()
+
+    def _collect(self):
+        """Block for one request, then gather more until the batch is full or max_wait expires."""
+        requests = [self._queue.get()]
+        size = len(requests[0][1])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[1])
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            for kind in ("query", "document"):
+                group = [r for r in requests if r[0] == kind]
+                if group:
+                    self._process(kind, group)
+
+    def _process(self, kind, group):
+        """Encode all texts of one kind and hand each caller its slice."""
+        texts = [text for _, request_texts, _ in group for text in request_texts]
+        try:
+            vectors = []
+            for start in range(0, len(texts), self.max_batch_size):
+                batch = texts[start:start + self.max_batch_size]
+                vectors.extend(self._encode(kind, batch))
+                with self._stats_lock:
+                    self._batches += 1
+                    self._texts += len(batch)
+        except Exception as e:
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for _, request_texts, future in group:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def _encode(self, kind, texts):
+        if kind == "document":
+            return self._embeddings.embed_documents(texts)
+
+        # Instructor-style models only expose single-query encoding, so
+        # batch queries through the underlying client with the query instruction
+        instruction = getattr(self._embeddings, "query_instruction", None)
+        client = getattr(self._embeddings, "client", None)
+        if instruction is not None and client is not None:
+            encode_kwargs = getattr(self._embeddings, "encode_kwargs", {}) or {}
+            vectors = client.encode([[instruction, text] for text in texts], **encode_kwargs)
+            return vectors.tolist()
+        return [self._embeddings.embed_query(text) for text in texts]
@@ -0,0 +1,69 @@
+"""Fake LLM and embeddings with fixed latencies, for load tests and benchmarks (LLM_BACKEND=fake)."""
+
+import hashlib
+import math
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors: cheap and deterministic, yet texts sharing
+    words land near each other, so retrieval still behaves sensibly.
+    """
+
+    def __init__(self, size=384, batch_latency_ms=5.0, text_latency_ms=0.5):
+        self.size = size
+        self.batch_latency = batch_latency_ms / 1000
+        self.text_latency = text_latency_ms / 1000
+
+    def _embed(self, text):
+        vector = [0.0] * self.size
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.size
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        time.sleep(self.batch_latency + self.text_latency * len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeLLM(LLM):
+    """LLM that "generates" a fixed number of tokens at a fixed rate."""
+
+    tokens: int = 50
+    token_latency_ms: float = 20.0
+    first_token_latency_ms: float = 100.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _tokens(self, prompt):
+        words = re.findall(r"\w+", prompt) or ["answer"]
+        return [f"{words[i % len(words)]} " for i in range(self.tokens)]
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        time.sleep((self.first_token_latency_ms + self.token_latency_ms * self.tokens) / 1000)
+        return "".join(self._tokens(prompt))
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[GenerationChunk]:
+        time.sleep(self.first_token_latency_ms / 1000)
+        for token in self._tokens(prompt):
+            time.sleep(self.token_latency_ms / 1000)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,131 @@
+"""Streaming, page-parallel PDF ingestion."""
+
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.config import config
+from app.services import metrics
+
+# Worker pool, created on first use
+_executor = None
+
+
+def _get_executor():
+    """Get the shared process pool used for page extraction."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=config.ingest_workers)
+    return _executor
+
+
+def _extract_pages(document_path, start, stop, chunk_size, chunk_overlap):
+    """
+    Extract and split a range of pages (runs in a worker process).
+
+    Args:
+        document_path: Path to the PDF file
+        start: First page index (inclusive)
+        stop: Last page index (exclusive)
+        chunk_size: Splitter chunk size
+        chunk_overlap: Splitter chunk overlap
+
+    Returns:
+        (list of (page index, chunk start offset in the page, chunk text)
+        tuples, seconds spent loading page text, seconds spent splitting)
+    """
+    started = time.perf_counter()
+    reader = PdfReader(document_path)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True
+    )
+    chunks = []
+    load_seconds = split_seconds = 0.0
+    for page in range(start, stop):
+        text = reader.pages[page].extract_text() or ""
+        split_started = time.perf_counter()
+        load_seconds += split_started - started
+        for piece in text_splitter.create_documents([text]):
+            chunks.append((page, piece.metadata["start_index"], piece.page_content))
+        started = time.perf_counter()
+        split_seconds += started - split_started
+    return chunks, load_seconds, split_seconds
+
+
+def count_pages(document_path):
+    """Return the number of pages in a PDF without extracting any text."""
+    return len(PdfReader(document_path).pages)
+
+
+def iter_chunk_batches(document_path, batch_size=None):
+    """
+    Stream a PDF as batches of chunks, splitting pages in parallel.
+
+    Page ranges are handed to the worker pool a few at a time, so only a
+    bounded number of pages and chunks are in memory whatever the size of
+    the document. Chunks come out in page order.
+
+    Args:
+        document_path: Path to the PDF file
+        batch_size: Chunks per batch (defaults to config.embed_batch_size)
+
+    Yields:
+        (pages parsed so far, list of chunk Documents) tuples
+    """
+    batch_size = batch_size or config.embed_batch_size
+    total_pages = count_pages(document_path)
+    page_ranges = (
+        (start, min(start + config.ingest_pages_per_task, total_pages))
+        for start in range(0, total_pages, config.ingest_pages_per_task)
+    )
+
+    if config.ingest_workers > 1:
+        executor = _get_executor()
+        max_in_flight = config.ingest_workers * 2
+
+        def extracted():
+            in_flight = deque()
+            for start, stop in page_ranges:
+                in_flight.append((stop, executor.submit(
+                    _extract_pages, document_path, start, stop,
+                    config.chunk_size, config.chunk_overlap
+                )))
+                if len(in_flight) >= max_in_flight:
+                    stop, future = in_flight.popleft()
+                    yield stop, future.result()
+            while in_flight:
+                stop, future = in_flight.popleft()
+                yield stop, future.result()
+    else:
+        def extracted():
+            for start, stop in page_ranges:
+                yield stop, _extract_pages(
+                    document_path, start, stop,
+                    config.chunk_size, config.chunk_overlap
+                )
+
+    batch = []
+    pages_parsed = 0
+    pages_reported = None
+    for pages_parsed, (chunks, load_seconds, split_seconds) in extracted():
+        # Worker CPU time per page range (stages overlap across workers)
+        metrics.observe("ingest", "load", load_seconds)
+        metrics.observe("ingest", "split", split_seconds)
+        for page, start_index, text in chunks:
+            batch.append(Document(
+                page_content=text,
+                metadata={"source": document_path, "page": page, "start_index": start_index}
+            ))
+            if len(batch) >= batch_size:
+                yield pages_parsed, batch
+                pages_reported = pages_parsed
+                batch = []
+    # Flush the tail, and always report the final page count
+    if batch or pages_reported != pages_parsed:
+        yield pages_parsed, batch
@@ -0,0 +1,132 @@
+"""Background document ingestion jobs with progress tracking."""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.config import config
+from app.services import rag
+
+# Finished jobs kept around for polling
+MAX_FINISHED_JOBS = 100
+
+_lock = threading.Lock()
+_jobs = OrderedDict()
+_executor = ThreadPoolExecutor(
+    max_workers=config.ingest_concurrency,
+    thread_name_prefix="ingest"
+)
+
+
+def _snapshot(job):
+    """Copy a job record, adding throughput figures."""
+    snapshot = dict(job)
+    started = job["started_at"]
+    if started is not None:
+        elapsed = (job["finished_at"] or time.time()) - started
+        snapshot["elapsed_seconds"] = round(elapsed, 3)
+        if elapsed > 0:
+            snapshot["pages_per_second"] = round(job["pages_parsed"] / elapsed, 2)
+            snapshot["chunks_per_second"] = round(job["chunks_embedded"] / elapsed, 2)
+    return snapshot
+
+
+def _prune():
+    """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS (caller holds _lock)."""
+    finished = [job_id for job_id, job in _jobs.items() if job["status"] in ("done", "failed")]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job_id]
+
+
+def _run(job_id, document_path, document_name, session_id):
+    """Process a document, recording progress on the job, then delete its file."""
+    job = _jobs[job_id]
+    with _lock:
+        job["status"] = "running"
+        job["started_at"] = time.time()
+
+    def progress(pages_parsed, chunks_embedded):
+        with _lock:
+            job["pages_parsed"] = pages_parsed
+            job["chunks_embedded"] = chunks_embedded
+
+    try:
+        result = rag.process_document(
+            document_path, progress=progress, session_id=session_id, document_name=document_name
+        )
+        outcome = {"status": "done", "result": result}
+    except Exception as e:
+        outcome = {"status": "failed", "error": str(e)}
+    # The upload is only needed by this job; it is gone before the job reports finishing
+    Path(document_path).unlink(missing_ok=True)
+    with _lock:
+        job.update(outcome)
+        job["finished_at"] = time.time()
+        _prune()
+
+
+def submit(document_path, document_name, session_id=None):
+    """
+    Queue a document for background processing.
+
+    Args:
+        document_path: Path to the saved PDF file, which the job deletes
+            once it has finished with it
+        document_name: Name the document is indexed under and shown to the user
+        session_id: Session the document is added to once processed
+
+    Returns:
+        The new job's id
+
+    Raises:
+        RuntimeError: If the ingestion queue is full
+    """
+    with _lock:
+        pending = sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+        if pending >= config.ingest_queue_size:
+            raise RuntimeError("Too many documents are being processed. Please try again shortly.")
+
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            "id": job_id,
+            "document": document_name,
+            "status": "queued",
+            "pages_parsed": 0,
+            "chunks_embedded": 0,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+
+    _executor.submit(_run, job_id, document_path, document_name, session_id)
+    return job_id
+
+
+def get_job(job_id):
+    """Get a snapshot of a job, or None if it is unknown."""
+    with _lock:
+        job = _jobs.get(job_id)
+        return _snapshot(job) if job is not None else None
+
+
+def is_active(document_name):
+    """Whether a job for the document is queued or running."""
+    with _lock:
+        return any(job["document"] == document_name and job["status"] in ("queued", "running")
+                   for job in _jobs.values())
+
+
+def get_summary():
+    """Get queued and in-flight jobs."""
+    with _lock:
+        active = [_snapshot(job) for job in _jobs.values() if job["status"] in ("queued", "running")]
+    return {
+        "queued": sum(1 for job in active if job["status"] == "queued"),
+        "running": sum(1 for job in active if job["status"] == "running"),
+        "active": active
+    }
@@ -0,0 +1,122 @@
+"""Incrementally maintained BM25 inverted index and rank fusion."""
+
+import math
+import re
+import threading
+from collections import Counter
+
+# Words plus dotted/dashed identifiers such as error codes and API names
+# (e.g. "ERR-4012", "os.path.join"); compound tokens are also indexed by part
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-:/]\w+)*")
+
+
+def tokenize(text):
+    """Lowercase and split text into index terms."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = re.split(r"[.\-:/]", token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+    return terms
+
+
+class InvertedIndex:
+    """
+    BM25 index over chunks, updated as chunks are added or removed.
+
+    Postings map each term to {chunk id: term frequency}; document
+    lengths and the chunk -> document name mapping are kept alongside so
+    scoring and per-session scoping need no access to the chunk text.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._chunk_terms = {}
+        self._lengths = {}
+        self._documents = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, chunk_id, text, document):
+        """Index a chunk (re-indexing it if already present)."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            if chunk_id in self._lengths:
+                self._remove(chunk_id)
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[chunk_id] = frequency
+            self._chunk_terms[chunk_id] = tuple(terms)
+            length = sum(terms.values())
+            self._lengths[chunk_id] = length
+            self._documents[chunk_id] = document
+            self._total_length += length
+
+    def remove(self, chunk_ids):
+        """Drop chunks from the index."""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                if chunk_id in self._lengths:
+                    self._remove(chunk_id)
+
+    def _remove(self, chunk_id):
+        for term in self._chunk_terms.pop(chunk_id):
+            postings = self._postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id)
+        del self._documents[chunk_id]
+
+    def search(self, query, k, scope=()):
+        """
+        Rank chunks against a query with BM25.
+
+        Args:
+            query: Query text
+            k: Number of results
+            scope: Document names to restrict results to (empty for all)
+
+        Returns:
+            list of (chunk id, score), best first
+        """
+        with self._lock:
+            count = len(self._lengths)
+            if count == 0:
+                return []
+            average_length = self._total_length / count
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    if scope and self._documents[chunk_id] not in scope:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores.most_common(k)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse ranked lists of ids with reciprocal rank fusion.
+
+    Args:
+        rankings: Iterable of id lists, best first
+        k: RRF damping constant
+
+    Returns:
+        list of ids, best first
+    """
+    scores = Counter()
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] += 1 / (k + rank + 1)
+    return [item for item, _ in scores.most_common()]
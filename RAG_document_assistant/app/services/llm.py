@@ -1,29 +1,91 @@
-"""LLM and embeddings initialization using HuggingFace."""
+"""LLM and embeddings initialization: HuggingFace Hub, local llama.cpp or fake (LLM_BACKEND).
+
+torch and the LangChain model integrations are imported inside
+init_models() so that importing this module (and starting the web
+server) stays fast.
+"""
 
 import os
-import torch
-from langchain_community.llms import HuggingFaceHub
-from langchain_community.embeddings import HuggingFaceInstructEmbeddings
+import threading
 from app.config import config
+from app.services.cache import TTLCache
 
-# Determine device (GPU if available, otherwise CPU)
-DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
+# Device (GPU if available, otherwise CPU), determined in init_models()
+DEVICE = None
 
 # These will be initialized when init_models() is called
 llm = None
+llm_queue = None
 embeddings = None
+embedding_engine = None
+
+# Set once init_models() has finished
+ready = threading.Event()
+_init_lock = threading.Lock()
+
+# Question embeddings, keyed by normalized question text
+query_embedding_cache = TTLCache(config.query_cache_size, config.query_cache_ttl)
 
 
 def init_models():
-    """Initialize the LLM and embeddings models."""
-    global llm, embeddings
+    """Initialize the LLM and embeddings models (only the first call does any work)."""
+    with _init_lock:
+        if ready.is_set():
+            return
+        _load_models()
+        ready.set()
+    
+    print(f"Models initialized (device: {DEVICE})")
+
+
+def embedding_namespace():
+    """Name of the embedding model, keying stored embeddings so a model change never reuses them."""
+    return config.embedding_model_id if config.llm_backend != "fake" else "fake"
+
+
+def _load_fake_models():
+    """Build the fixed-latency fake LLM and embeddings (LLM_BACKEND=fake)."""
+    from app.services.fakes import FakeEmbeddings, FakeLLM
+    
+    fake_llm = FakeLLM(
+        tokens=config.fake_llm_tokens,
+        token_latency_ms=config.fake_llm_token_ms,
+        first_token_latency_ms=config.fake_llm_first_token_ms
+    )
+    fake_embeddings = FakeEmbeddings(
+        batch_latency_ms=config.fake_embedding_batch_ms,
+        text_latency_ms=config.fake_embedding_text_ms
+    )
+    return "cpu", fake_llm, fake_embeddings
+
+
+def _load_instruct_embeddings():
+    """Import torch and build the sentence-transformers embeddings; returns (device, embeddings)."""
+    import torch
+    from langchain_community.embeddings import HuggingFaceInstructEmbeddings
+    
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    
+    # Limit intra-op threads so the embedding engine doesn't oversubscribe the CPU
+    if config.embedding_threads > 0:
+        torch.set_num_threads(config.embedding_threads)
+    
+    return device, HuggingFaceInstructEmbeddings(
+        model_name=config.embedding_model_id,
+        model_kwargs={"device": device}
+    )
+
+
+def _load_hub_models():
+    """Build the HuggingFace Hub LLM and local embeddings (LLM_BACKEND=hub)."""
+    from langchain_community.llms import HuggingFaceHub
     
     # Set HuggingFace API token
     if config.huggingface_api_token:
         os.environ["HUGGINGFACEHUB_API_TOKEN"] = config.huggingface_api_token
     
     # Initialize LLM
-    llm = HuggingFaceHub(
+    hub_llm = HuggingFaceHub(
         repo_id=config.llm_model_id,
         model_kwargs={
             "temperature": config.llm_temperature,
@@ -32,10 +94,82 @@ def init_models():
         }
     )
     
-    # Initialize embeddings
-    embeddings = HuggingFaceInstructEmbeddings(
-        model_name=config.embedding_model_id,
-        model_kwargs={"device": DEVICE}
+    device, hub_embeddings = _load_instruct_embeddings()
+    return device, hub_llm, hub_embeddings
+
+
+def _load_local_models():
+    """
+    Build a llama.cpp LLM from a local GGUF model and local embeddings (LLM_BACKEND=local).
+    
+    Every question is sent with the same "stuff" prompt template, so its
+    fixed leading instructions are evaluated once and their KV state is
+    reused from the prompt-prefix cache on later questions.
+    """
+    from langchain_community.llms import LlamaCpp
+    
+    if not config.local_llm_model_path or not os.path.isfile(config.local_llm_model_path):
+        raise RuntimeError("LLM_BACKEND=local needs LOCAL_LLM_MODEL_PATH set to a GGUF model file.")
+    
+    local_llm = LlamaCpp(
+        model_path=config.local_llm_model_path,
+        n_ctx=config.local_llm_context,
+        n_batch=config.local_llm_batch_size,
+        n_threads=config.local_llm_threads or None,
+        max_tokens=config.llm_max_new_tokens,
+        temperature=config.llm_temperature,
+        streaming=True,
+        verbose=False
     )
+    if config.local_llm_prefix_cache_mb > 0:
+        from llama_cpp import LlamaRAMCache
+        
+        local_llm.client.set_cache(LlamaRAMCache(capacity_bytes=config.local_llm_prefix_cache_mb * 1024 * 1024))
     
-    print(f"Models initialized (device: {DEVICE})")
+    device, local_embeddings = _load_instruct_embeddings()
+    return device, local_llm, local_embeddings
+
+
+def _load_models():
+    """Build the LLM and embeddings for the configured backend."""
+    global llm, llm_queue, embeddings, embedding_engine, DEVICE
+    
+    from langchain.embeddings import CacheBackedEmbeddings
+    from app.services.cache import QueryCachedEmbeddings
+    from app.services.embedding_cache import BoundedFileStore
+    from app.services.embedding_engine import BatchingEmbeddings
+    from app.services.llm_queue import QueuedLLM
+    
+    if config.llm_backend == "fake":
+        DEVICE, base_llm, base_embeddings = _load_fake_models()
+    elif config.llm_backend == "local":
+        DEVICE, base_llm, base_embeddings = _load_local_models()
+    else:
+        DEVICE, base_llm, base_embeddings = _load_hub_models()
+    
+    # Bound concurrent generations; a llama.cpp model runs one at a time
+    max_concurrency = config.llm_max_concurrency
+    if config.llm_backend == "local":
+        max_concurrency = 1
+    if max_concurrency > 0:
+        llm_queue = QueuedLLM(base_llm, max_concurrency, config.llm_queue_size, config.llm_queue_timeout)
+        llm = llm_queue
+    else:
+        llm = base_llm
+    
+    # Initialize embeddings: micro-batched across concurrent callers,
+    # cached on disk by (model id, chunk text hash) and cached in memory
+    # by question text
+    embedding_engine = BatchingEmbeddings(
+        base_embeddings,
+        max_batch_size=config.embedding_max_batch_size,
+        max_wait_ms=config.embedding_max_wait_ms
+    )
+    embeddings = QueryCachedEmbeddings(
+        CacheBackedEmbeddings.from_bytes_store(
+            embedding_engine,
+            BoundedFileStore(config.embedding_cache_dir, config.embedding_cache_max_mb * 1024 * 1024),
+            namespace=embedding_namespace()
+        ),
+        query_embedding_cache
+    )
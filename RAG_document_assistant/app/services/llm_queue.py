@@ -0,0 +1,80 @@
+"""Bounded scheduling of LLM calls, so concurrent questions queue instead of competing for the CPU."""
+
+import threading
+from contextlib import contextmanager
+
+BUSY_MESSAGE = "The assistant is busy answering other questions. Please try again shortly."
+
+
+class QueuedLLM:
+    """
+    Wraps an LLM so that at most max_concurrency calls run at once.
+
+    Up to max_queued further calls wait (at most `timeout` seconds) for a
+    slot; calls beyond that are rejected with a RuntimeError straight away,
+    which the routes report like any other unavailable-service error.
+    A streamed answer holds its slot until the stream is exhausted or
+    closed.
+    """
+
+    def __init__(self, llm, max_concurrency=1, max_queued=8, timeout=60.0):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._slots = threading.Semaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def invoke(self, prompt, **kwargs):
+        with self._slot():
+            return self.llm.invoke(prompt, **kwargs)
+
+    def stream(self, prompt, **kwargs):
+        with self._slot():
+            yield from self.llm.stream(prompt, **kwargs)
+
+    def stats(self):
+        """Get queue counters."""
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": self._waiting,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    @contextmanager
+    def _slot(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queued:
+                    self._rejected += 1
+                    raise RuntimeError(BUSY_MESSAGE)
+                self._waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self._rejected += 1
+                raise RuntimeError(BUSY_MESSAGE)
+
+        with self._lock:
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+            self._slots.release()
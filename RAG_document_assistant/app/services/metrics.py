@@ -0,0 +1,151 @@
+"""Prometheus metrics: per-route latency, per-stage timers and cache/queue gauges."""
+
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, ProcessCollector, generate_latest
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# The app's own registry: metric names such as http_request_duration_seconds are also used
+# by the Watson apps, and the default registry allows each name once per process
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route (to response headers)",
+    ["method", "route"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"], registry=REGISTRY
+)
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens", "Estimated context tokens per query, as retrieved and as sent to the LLM",
+    ["kind"], buckets=(64, 128, 256, 512, 768, 1024, 1536, 2048, 4096), registry=REGISTRY
+)
+CONTEXT_TOKENS_SAVED = Counter(
+    "rag_context_tokens_saved", "Estimated context tokens removed by contextual compression",
+    registry=REGISTRY
+)
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each stage of document processing and queries",
+    ["operation", "stage"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+
+
+def observe(operation, stage, seconds):
+    """Record time spent in a stage."""
+    STAGE_LATENCY.labels(operation, stage).observe(seconds)
+
+
+def observe_context(stats):
+    """Record the context size before and after compression for one query."""
+    CONTEXT_TOKENS.labels("retrieved").observe(stats["tokens_in"])
+    CONTEXT_TOKENS.labels("packed").observe(stats["tokens_out"])
+    CONTEXT_TOKENS_SAVED.inc(stats["tokens_saved"])
+
+
+@contextmanager
+def timed(operation, stage):
+    """Time a block as one stage of an operation ("ingest" or "query")."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(operation, stage).observe(time.perf_counter() - started)
+
+
+def timed_iter(iterable, operation, stage):
+    """Yield from an iterable, recording the time spent waiting for each item."""
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            STAGE_LATENCY.labels(operation, stage).observe(time.perf_counter() - started)
+        yield item
+
+
+class _StatsCollector:
+    """Reads cache, queue and index figures from the services at scrape time."""
+
+    def collect(self):
+        from app.services import jobs, llm, rag
+
+        lookups = CounterMetricFamily("rag_cache_lookups", "Cache lookups by cache and outcome",
+                                      labels=["cache", "outcome"])
+        entries = GaugeMetricFamily("rag_cache_entries", "Entries per cache", labels=["cache"])
+        for name, cache in (("answer", rag.answer_cache), ("query_embedding", llm.query_embedding_cache)):
+            stats = cache.stats()
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            entries.add_metric([name], stats["size"])
+        yield lookups
+        yield entries
+
+        summary = jobs.get_summary()
+        ingest_jobs = GaugeMetricFamily("rag_ingest_jobs", "Document jobs by state", labels=["state"])
+        ingest_jobs.add_metric(["queued"], summary["queued"])
+        ingest_jobs.add_metric(["running"], summary["running"])
+        yield ingest_jobs
+
+        if llm.embedding_engine is not None:
+            stats = llm.embedding_engine.stats()
+            yield CounterMetricFamily("rag_embedding_batches", "Encoder batches run",
+                                      value=stats["batches"])
+            yield CounterMetricFamily("rag_embedding_texts", "Texts embedded", value=stats["texts"])
+            yield GaugeMetricFamily("rag_embedding_queue_depth", "Embedding calls waiting for a batch",
+                                    value=stats["queued"])
+
+        if llm.llm_queue is not None:
+            stats = llm.llm_queue.stats()
+            yield GaugeMetricFamily("rag_llm_running", "LLM generations in progress", value=stats["running"])
+            yield GaugeMetricFamily("rag_llm_queue_depth", "LLM calls waiting for a slot", value=stats["queued"])
+            yield CounterMetricFamily("rag_llm_rejected", "LLM calls rejected because the queue was full",
+                                      value=stats["rejected"])
+
+        yield GaugeMetricFamily("rag_sessions", "Active chat sessions", value=len(rag.sessions))
+        yield GaugeMetricFamily("rag_lexical_index_chunks", "Chunks in the BM25 index",
+                                value=len(rag.lexical_index))
+        if rag.ivf_index is not None:
+            yield GaugeMetricFamily("rag_vector_index_chunks", "Chunks in the quantized vector index",
+                                    value=len(rag.ivf_index))
+        yield GaugeMetricFamily("rag_ready", "1 once models are loaded and the index restored",
+                                value=int(rag.is_ready()))
+
+
+_collector = None
+
+
+def init_app(app):
+    """Record latency and status per route and serve /metrics."""
+    global _collector
+    if _collector is None:
+        _collector = _StatsCollector()
+        REGISTRY.register(_collector)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        """Serve metrics in the Prometheus text format."""
+        return Response(generate_latest(REGISTRY), mimetype=CONTENT_TYPE_LATEST)
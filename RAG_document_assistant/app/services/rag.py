@@ -1,116 +1,702 @@
 """RAG pipeline for document processing and question answering."""
 
+import hashlib
 import os
+import threading
+import time
 from pathlib import Path
-from langchain.chains import RetrievalQA
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
 
 from app.config import config
 from app.services import llm as llm_service
+from app.services import compression, metrics
+from app.services.cache import TTLCache, normalize_text
+from app.services.lexical import InvertedIndex, reciprocal_rank_fusion
+from app.services.sessions import SessionStore
 
-# Global state
-qa_chain = None
-chat_history = []
+# Shared index: one vector store for all sessions, scoped per session
+# through the "document" chunk metadata
 vector_store = None
 loaded_documents = []
 
+# BM25 index over the same chunks, for hybrid retrieval
+lexical_index = InvertedIndex()
 
-def process_document(document_path):
+# Quantized ANN index over the same chunks, searched instead of Chroma
+# when VECTOR_INDEX=ivf
+ivf_index = None
+if config.vector_index == "ivf":
+    from app.services.vector_index import QuantizedIVFIndex
+    
+    ivf_index = QuantizedIVFIndex(
+        config.vector_index_dir or None, config.ivf_lists, config.ivf_probes, config.ivf_rerank,
+        fingerprint=llm_service.embedding_namespace()
+    )
+
+# Chat history and document scope per client session
+sessions = SessionStore(config.session_max, config.session_ttl, config.session_history_tokens)
+
+# Answers keyed by (question, index version, model params); bumping
+# index_version whenever chunks are added invalidates them
+answer_cache = TTLCache(config.answer_cache_size, config.answer_cache_ttl)
+index_version = 0
+
+# Stored chunks read per request when reopening a persisted index
+LOAD_PAGE_SIZE = 5000
+
+# Guards the global state above when documents are processed concurrently
+_state_lock = threading.Lock()
+
+# One lock per document name, so uploading and deleting the same document
+# never interleave
+_document_locks = {}
+
+# Warm-up state (see warm_up())
+_warm_up_lock = threading.Lock()
+_warmed_up = False
+warm_up_error = None
+
+
+def _open_vector_store():
+    """Open the Chroma vector store, persisted on disk when configured."""
+    from langchain_community.vectorstores import Chroma
+    
+    return Chroma(
+        collection_name=config.chroma_collection,
+        embedding_function=llm_service.embeddings,
+        persist_directory=config.chroma_persist_dir or None
+    )
+
+
+def _hash_text(text):
+    """Content hash used to address chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _chunk_id(document_name, chunk_hash):
+    """Vector store id of a chunk within a document."""
+    return _hash_text(f"{document_name}\0{chunk_hash}")
+
+
+def _hash_file(path):
+    """Content hash of a whole document, used to skip identical re-uploads."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _build_retriever(scope):
+    """
+    Build an MMR retriever over the shared vector store.
+    
+    Args:
+        scope: Document names to restrict retrieval to (empty for all)
+    """
+    search_kwargs = {"k": config.retriever_k, "lambda_mult": 0.25}
+    if scope:
+        search_kwargs["filter"] = {"document": {"$in": list(scope)}}
+    return vector_store.as_retriever(search_type="mmr", search_kwargs=search_kwargs)
+
+
+def _ivf_search(question, scope, fetch_k=20):
+    """
+    MMR search through the quantized index: the fetch_k nearest chunks,
+    reranked at full precision, then diversified as the Chroma retriever does.
+    """
+    import numpy as np
+    from langchain_core.documents import Document
+    from langchain_core.vectorstores.utils import maximal_marginal_relevance
+    
+    query_vector = np.asarray(llm_service.embeddings.embed_query(question), dtype=np.float32)
+    hits, vectors = ivf_index.search(query_vector, fetch_k, scope)
+    if not hits:
+        return []
+    selected = maximal_marginal_relevance(query_vector, list(vectors), lambda_mult=0.25, k=config.retriever_k)
+    chunk_ids = [hits[i][0] for i in selected]
+    
+    fetched = vector_store.get(ids=chunk_ids, include=["documents", "metadatas"])
+    documents = {
+        chunk_id: Document(page_content=text, metadata=metadata)
+        for chunk_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+    }
+    return [documents[chunk_id] for chunk_id in chunk_ids if chunk_id in documents]
+
+
+def retrieve(question, scope=(), mode=None):
+    """
+    Retrieve the chunks most relevant to a question.
+    
+    In "hybrid" mode the MMR vector results are fused with BM25 results
+    from the lexical index using reciprocal rank fusion, so exact
+    identifiers (error codes, API names) are found even when their
+    embeddings are not close to the question's.
+    
+    Args:
+        question: User's question
+        scope: Document names to restrict retrieval to (empty for all)
+        mode: "vector" or "hybrid" (defaults to config.retriever_mode)
+        
+    Returns:
+        list of chunk Documents, best first
+    """
+    mode = mode or config.retriever_mode
+    with metrics.timed("query", "vector_search"):
+        if ivf_index is not None:
+            vector_documents = _ivf_search(question, scope)
+        else:
+            vector_documents = _build_retriever(scope).invoke(question)
+    if mode != "hybrid":
+        return vector_documents
+    
+    documents = {_document_key(doc): doc for doc in vector_documents}
+    with metrics.timed("query", "lexical_search"):
+        lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(question, config.retriever_k, scope)]
+    fused_ids = reciprocal_rank_fusion([list(documents), lexical_ids], k=config.rrf_k)[:config.retriever_k]
+    
+    # Fetch lexical-only hits from the vector store
+    missing = [chunk_id for chunk_id in fused_ids if chunk_id not in documents]
+    if missing:
+        from langchain_core.documents import Document
+        
+        with metrics.timed("query", "fetch"):
+            fetched = vector_store.get(ids=missing, include=["documents", "metadatas"])
+        for chunk_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+            documents[chunk_id] = Document(page_content=text, metadata=metadata)
+    
+    # Chunks stored without a content-addressed id can be found under two keys
+    results = []
+    seen = set()
+    for chunk_id in fused_ids:
+        doc = documents.get(chunk_id)
+        content_hash = _hash_text(doc.page_content) if doc is not None else None
+        if content_hash is not None and content_hash not in seen:
+            seen.add(content_hash)
+            results.append(doc)
+    return results
+
+
+def _document_key(doc):
+    """
+    Id of a retrieved chunk, matching the lexical index's ids: the stored
+    id when the vector store returns it, else the content-addressed id
+    (hashing the text for chunks stored without a "chunk_hash").
+    """
+    if getattr(doc, "id", None):
+        return doc.id
+    chunk_hash = doc.metadata.get("chunk_hash") or _hash_text(doc.page_content)
+    return _chunk_id(_stored_document_name(doc.metadata), chunk_hash)
+
+
+def _compress(question, documents):
+    """
+    Pack the retrieved chunks into the context token budget.
+    
+    Returns:
+        (documents to prompt with, compression stats or None when disabled)
+    """
+    if not config.context_compression or not documents:
+        return documents, None
+    with metrics.timed("query", "compress"):
+        # Sentences bypass the embedding caches, which would fill with
+        # one-off sentences and evict chunk embeddings; the question
+        # embedding is already in the query cache from retrieval
+        documents, stats = compression.compress(
+            question, documents, llm_service.embedding_engine,
+            config.context_token_budget, config.chunk_overlap,
+            query_embeddings=llm_service.embeddings
+        )
+    metrics.observe_context(stats)
+    return documents, stats
+
+
+def _build_prompt(question, documents, history):
+    """Fill the "stuff" QA prompt with the retrieved chunks and recent conversation."""
+    from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+    
+    prompt = PROMPT_SELECTOR.get_prompt(llm_service.llm)
+    context = "\n\n".join(doc.page_content for doc in documents)
+    if history:
+        turns = "\n".join(f"Q: {q}\nA: {a}" for q, a in history)
+        question = f"(Earlier in this conversation:\n{turns})\n{question}"
+    return prompt.format(context=context, question=question)
+
+
+def _sources(documents):
+    """Summarize retrieved chunks for the client."""
+    return [
+        {"document": doc.metadata.get("document"), "page": doc.metadata.get("page")}
+        for doc in documents
+    ]
+
+
+def _answer_cache_key(question, scope, history):
+    return (
+        normalize_text(question),
+        scope,
+        _hash_text(repr(history)) if history else None,
+        index_version,
+        config.llm_backend,
+        config.llm_model_id if config.llm_backend != "local" else config.local_llm_model_path,
+        config.llm_temperature,
+        config.llm_max_new_tokens,
+        config.retriever_k,
+        config.retriever_mode,
+        config.context_compression,
+        config.context_token_budget
+    )
+
+
+def _document_lock(document_name):
+    """Get the lock serializing changes to one document."""
+    with _state_lock:
+        return _document_locks.setdefault(document_name, threading.Lock())
+
+
+def _iter_stored(store, include):
+    """Read every stored chunk, LOAD_PAGE_SIZE at a time so large indexes aren't held in memory at once."""
+    offset = 0
+    while True:
+        page = store.get(include=include, limit=LOAD_PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def _stored_document_name(metadata):
+    """Document a stored chunk belongs to (chunks stored before "document" was recorded have only "source")."""
+    return metadata.get("document") or Path(metadata.get("source", "")).name
+
+
+def load_index():
+    """
+    Reopen a persisted vector store, if any, and restore the document list.
+    
+    Returns:
+        Number of chunks found in the persisted index
+    """
+    global vector_store, loaded_documents
+    
+    if not config.chroma_persist_dir or not Path(config.chroma_persist_dir).is_dir():
+        return 0
+    
+    llm_service.init_models()
+    
+    store = _open_vector_store()
+    count = store._collection.count()
+    if count == 0:
+        return 0
+    
+    # Restore document names and the lexical index, a page of chunks at a time
+    names = set()
+    stored_ids = set()
+    for page in _iter_stored(store, ["documents", "metadatas"]):
+        for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            name = _stored_document_name(metadata)
+            if name:
+                names.add(name)
+            stored_ids.add(chunk_id)
+            lexical_index.add(chunk_id, text, name)
+    
+    # Reopen the persisted quantized index; rebuild it if it is missing,
+    # was built with another embedding model or is out of step with the store
+    if ivf_index is not None and not (ivf_index.load() and ivf_index.chunk_ids() == stored_ids):
+        ivf_index.clear()
+        for page in _iter_stored(store, ["metadatas", "embeddings"]):
+            vectors_by_name = {}
+            for chunk_id, metadata, vector in zip(page["ids"], page["metadatas"], page["embeddings"]):
+                ids, vectors = vectors_by_name.setdefault(_stored_document_name(metadata), ([], []))
+                ids.append(chunk_id)
+                vectors.append(vector)
+            for name, (ids, vectors) in vectors_by_name.items():
+                ivf_index.add(ids, vectors, name)
+        ivf_index.save()
+    
+    with _state_lock:
+        vector_store = store
+        loaded_documents = sorted(names)
+    
+    return count
+
+
+def warm_up():
+    """
+    Load the models and reopen the persisted index. Only the first call does
+    any work; later calls (including concurrent ones) wait for it to finish.
+    
+    Returns:
+        Number of chunks restored from the persisted index
+    """
+    global _warmed_up, warm_up_error
+    
+    with _warm_up_lock:
+        if _warmed_up:
+            return 0
+        try:
+            llm_service.init_models()
+            restored = load_index()
+            # Run one query through the embedding model so the first request doesn't pay for it
+            llm_service.embeddings.embed_query("warm up")
+        except Exception as e:
+            warm_up_error = str(e)
+            raise
+        warm_up_error = None
+        _warmed_up = True
+        return restored
+
+
+def is_ready():
+    """Whether models are loaded and the index has been restored."""
+    return _warmed_up
+
+
+def process_document(document_path, progress=None, session_id=None, document_name=None):
     """
     Process a PDF document for RAG.
     
     Args:
         document_path: Path to the PDF file
+        progress: Optional callback taking (pages_parsed, chunks_embedded)
+        session_id: Optional session to add the document to
+        document_name: Name to index the document under (defaults to the file name)
         
     Returns:
         dict with processing results
     """
-    global qa_chain, vector_store, loaded_documents
+    global vector_store
     
     # Make sure models are initialized
-    if llm_service.llm is None:
-        llm_service.init_models()
+    warm_up()
     
-    # Load PDF
-    loader = PyPDFLoader(document_path)
-    documents = loader.load()
+    with _state_lock:
+        if vector_store is None:
+            vector_store = _open_vector_store()
     
-    # Split into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=config.chunk_size,
-        chunk_overlap=config.chunk_overlap
-    )
-    chunks = text_splitter.split_documents(documents)
+    document_name = document_name or Path(document_path).name
+    with _document_lock(document_name):
+        return _process_document(document_path, document_name, progress, session_id)
+
+
+def _process_document(document_path, document_name, progress, session_id):
+    """process_document() body, run holding the document's lock."""
+    global loaded_documents, index_version
     
-    # Create/update vector store
-    if vector_store is None:
-        vector_store = Chroma.from_documents(chunks, embedding=llm_service.embeddings)
-    else:
-        vector_store.add_documents(chunks)
-    
-    # Create QA chain
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm_service.llm,
-        chain_type="stuff",
-        retriever=vector_store.as_retriever(
-            search_type="mmr",
-            search_kwargs={"k": config.retriever_k, "lambda_mult": 0.25}
-        ),
-        return_source_documents=False,
-        input_key="question"
-    )
+    started = time.perf_counter()
+    replacing = document_name in loaded_documents
+    with metrics.timed("ingest", "hash"):
+        document_hash = _hash_file(document_path)
+    session = sessions.get(session_id) if session_id is not None else None
     
-    loaded_documents.append(Path(document_path).name)
+    # Identical file already indexed: nothing to parse or embed
+    existing = vector_store.get(where={"document_hash": document_hash}, include=["metadatas"])
+    if existing["ids"]:
+        # The same file may have been indexed under another name
+        indexed_name = existing["metadatas"][0].get("document", document_name)
+        if session is not None:
+            session.add_document(indexed_name)
+        return {
+            "status": "duplicate",
+            "document": indexed_name,
+            "pages": len({m.get("page") for m in existing["metadatas"]}),
+            "chunks": len(existing["ids"])
+        }
     
+    # Chunks are stored without the file's hash, and get it only once all of
+    # them are in: a run that fails halfway must not look like an indexed copy
+    added_ids = []
+    try:
+        pages, chunk_count, seen_ids = _add_chunks(document_path, document_name, progress, added_ids)
+        with metrics.timed("ingest", "mark_complete"):
+            ids = list(seen_ids)
+            for offset in range(0, len(ids), LOAD_PAGE_SIZE):
+                page_ids = ids[offset:offset + LOAD_PAGE_SIZE]
+                vector_store._collection.update(
+                    ids=page_ids, metadatas=[{"document_hash": document_hash}] * len(page_ids)
+                )
+    except Exception:
+        # Leave no partial document behind; a previous version stays as it was
+        _remove_chunks(added_ids)
+        if added_ids:
+            if ivf_index is not None:
+                ivf_index.save()
+            with _state_lock:
+                index_version += 1
+                answer_cache.clear()
+        raise
+    chunks_added = len(added_ids)
+    
+    # A re-uploaded document: drop the chunks only the previous version had.
+    # New chunks are added first, so queries never see the document missing.
+    stale_ids = []
+    if replacing:
+        with metrics.timed("ingest", "prune"):
+            stale_ids = [chunk_id for chunk_id in _document_chunk_ids(document_name) if chunk_id not in seen_ids]
+            _remove_chunks(stale_ids)
+    
+    with _state_lock:
+        if document_name not in loaded_documents:
+            loaded_documents.append(document_name)
+        
+        # Cached answers no longer reflect the index
+        if chunks_added or stale_ids:
+            index_version += 1
+            answer_cache.clear()
+    
+    if ivf_index is not None and (chunks_added or stale_ids):
+        ivf_index.save()
+    
+    if session is not None:
+        session.add_document(document_name)
+    
+    metrics.observe("ingest", "total", time.perf_counter() - started)
     return {
-        "status": "success",
-        "document": Path(document_path).name,
-        "pages": len(documents),
-        "chunks": len(chunks)
+        "status": "updated" if replacing else "success",
+        "document": document_name,
+        "pages": pages,
+        "chunks": chunk_count,
+        "chunks_added": chunks_added,
+        "chunks_removed": len(stale_ids)
     }
 
 
-def query(question):
+def _add_chunks(document_path, document_name, progress, added_ids):
     """
-    Query the loaded documents.
+    Stream a PDF through the page-parallel splitter, embedding and storing
+    its chunks batch by batch.
     
     Args:
-        question: User's question
+        added_ids: List the ids of newly stored chunks are appended to as
+            they are stored, so the caller can remove them if a later batch fails
+    
+    Returns:
+        (pages, chunks, set of the document's chunk ids)
+    """
+    from app.services import ingest
+    
+    pages = 0
+    chunk_count = 0
+    seen_ids = set()
+    # "parse" is the wait for each batch from the page-parallel splitter
+    for pages, chunks in metrics.timed_iter(ingest.iter_chunk_batches(document_path), "ingest", "parse"):
+        chunk_count += len(chunks)
+        
+        # Address chunks by content so repeated chunks are only stored once
+        batch = {}
+        for chunk in chunks:
+            chunk_hash = _hash_text(chunk.page_content)
+            chunk_id = _chunk_id(document_name, chunk_hash)
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            chunk.metadata["document"] = document_name
+            chunk.metadata["chunk_hash"] = chunk_hash
+            batch[chunk_id] = chunk
+        
+        # Skip chunks that are already in the index
+        if batch:
+            with metrics.timed("ingest", "dedupe"):
+                indexed_ids = set(vector_store.get(ids=list(batch), include=[])["ids"])
+                # Unchanged chunks of a re-uploaded document keep their id and
+                # embedding; only their metadata (page, offset) is refreshed
+                if indexed_ids:
+                    kept_ids = list(indexed_ids)
+                    vector_store._collection.update(
+                        ids=kept_ids, metadatas=[batch[chunk_id].metadata for chunk_id in kept_ids]
+                    )
+            new_ids = [chunk_id for chunk_id in batch if chunk_id not in indexed_ids]
+            if new_ids:
+                with metrics.timed("ingest", "embed"):
+                    vector_store.add_documents([batch[chunk_id] for chunk_id in new_ids], ids=new_ids)
+                added_ids.extend(new_ids)
+                with metrics.timed("ingest", "lexical_index"):
+                    for chunk_id in new_ids:
+                        lexical_index.add(chunk_id, batch[chunk_id].page_content, document_name)
+                if ivf_index is not None:
+                    # Served from the embedding cache just filled by add_documents
+                    with metrics.timed("ingest", "ivf_index"):
+                        vectors = llm_service.embeddings.embed_documents(
+                            [batch[chunk_id].page_content for chunk_id in new_ids]
+                        )
+                        ivf_index.add(new_ids, vectors, document_name)
+        
+        if progress is not None:
+            progress(pages, chunk_count)
+    
+    return pages, chunk_count, seen_ids
+
+
+def _document_chunk_ids(document_name):
+    """Ids of every stored chunk of a document."""
+    return vector_store.get(where={"document": document_name}, include=[])["ids"]
+
+
+def _remove_chunks(chunk_ids):
+    """Delete chunks from the vector store and the lexical index."""
+    if chunk_ids:
+        vector_store.delete(ids=chunk_ids)
+        lexical_index.remove(chunk_ids)
+        if ivf_index is not None:
+            ivf_index.remove(chunk_ids)
+
+
+def delete_document(document_name):
+    """
+    Remove a document's chunks from the index and from every session's
+    scope (a session left with no documents searches all of them again,
+    like a new one).
+    
+    Args:
+        document_name: Name the document was uploaded under
         
     Returns:
-        dict with the answer
+        dict with the document name and the number of chunks removed
+        
+    Raises:
+        KeyError: if no such document is loaded
     """
-    global chat_history
+    global index_version
+    
+    warm_up()
+    with _document_lock(document_name):
+        if vector_store is None or document_name not in loaded_documents:
+            raise KeyError(document_name)
+        
+        chunk_ids = _document_chunk_ids(document_name)
+        _remove_chunks(chunk_ids)
+        if ivf_index is not None:
+            ivf_index.save()
+        
+        with _state_lock:
+            if document_name in loaded_documents:
+                loaded_documents.remove(document_name)
+            index_version += 1
+            answer_cache.clear()
+        sessions.remove_document(document_name)
     
-    if qa_chain is None:
+    return {"document": document_name, "chunks_removed": len(chunk_ids)}
+
+
+def _prepare_query(question, session_id):
+    """Resolve the session, its document scope and history for a question."""
+    warm_up()
+    if vector_store is None or not loaded_documents:
         raise RuntimeError("No documents loaded. Please upload a document first.")
     
-    # Get answer from chain
-    result = qa_chain.invoke({
-        "question": question,
-        "chat_history": chat_history
-    })
+    session = sessions.get(session_id)
+    scope = session.scope()
+    history = session.history()
+    return session, scope, history, _answer_cache_key(question, scope, history)
+
+
+def query(question, session_id=None):
+    """
+    Query the loaded documents.
+    
+    Args:
+        question: User's question
+        session_id: Client session (history and document scope)
+        
+    Returns:
+        dict with the answer and the context compression stats (None
+        when compression is disabled)
+    """
+    started = time.perf_counter()
+    session, scope, history, cache_key = _prepare_query(question, session_id)
+    cached = answer_cache.get(cache_key)
     
-    answer = result["result"]
+    if cached is not None:
+        answer = cached["answer"]
+        context = cached["context"]
+    else:
+        # Retrieve context, compress it and ask the LLM
+        with metrics.timed("query", "retrieve"):
+            documents = retrieve(question, scope)
+        documents, context = _compress(question, documents)
+        with metrics.timed("query", "llm"):
+            answer = llm_service.llm.invoke(_build_prompt(question, documents, history))
+        answer_cache.set(cache_key, {"answer": answer, "sources": _sources(documents), "context": context})
     
     # Update chat history
-    chat_history.append((question, answer))
+    session.add_turn(question, answer)
+    
+    metrics.observe("query", "total", time.perf_counter() - started)
+    return {"answer": answer, "context": context}
+
+
+def stream_query(question, session_id=None):
+    """
+    Query the loaded documents, streaming the answer as it is generated.
     
-    return {"answer": answer}
+    Args:
+        question: User's question
+        session_id: Client session (history and document scope)
+        
+    Yields:
+        (event, data) tuples: one "context" event with the retrieved
+        sources and compression stats, "token" events with generated text, then a "done" event
+        with the full answer and timings in milliseconds
+    """
+    started = time.perf_counter()
+    session, scope, history, cache_key = _prepare_query(question, session_id)
+    cached = answer_cache.get(cache_key)
+    
+    if cached is not None:
+        yield "context", {"sources": cached["sources"], "context": cached["context"], "cached": True}
+        first_token_at = time.perf_counter()
+        yield "token", {"text": cached["answer"]}
+        answer = cached["answer"]
+    else:
+        with metrics.timed("query", "retrieve"):
+            documents = retrieve(question, scope)
+        documents, context = _compress(question, documents)
+        sources = _sources(documents)
+        yield "context", {"sources": sources, "context": context, "cached": False}
+        
+        first_token_at = None
+        pieces = []
+        llm_started = time.perf_counter()
+        for token in llm_service.llm.stream(_build_prompt(question, documents, history)):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                metrics.observe("query", "llm_first_token", first_token_at - llm_started)
+            pieces.append(token)
+            yield "token", {"text": token}
+        metrics.observe("query", "llm", time.perf_counter() - llm_started)
+        
+        answer = "".join(pieces)
+        answer_cache.set(cache_key, {"answer": answer, "sources": sources, "context": context})
+    
+    session.add_turn(question, answer)
+    
+    finished = time.perf_counter()
+    metrics.observe("query", "total", finished - started)
+    yield "done", {
+        "answer": answer,
+        "ttft_ms": round(((first_token_at or finished) - started) * 1000, 1),
+        "total_ms": round((finished - started) * 1000, 1)
+    }
 
 
-def clear_history():
-    """Clear the chat history."""
-    global chat_history
-    chat_history = []
+def clear_history(session_id=None):
+    """Clear a session's chat history."""
+    sessions.get(session_id).clear_history()
 
 
-def get_status():
-    """Get current status of the RAG service."""
+def get_status(session_id=None):
+    """Get current status of the RAG service, as seen by a session."""
+    session = sessions.get(session_id)
     return {
-        "documents_loaded": loaded_documents,
-        "chat_history_length": len(chat_history),
-        "ready": qa_chain is not None
+        "documents_loaded": list(session.scope() or loaded_documents),
+        "chat_history_length": len(session.history()),
+        "active_sessions": len(sessions),
+        "ready": vector_store is not None and bool(loaded_documents),
+        "embedding_engine": llm_service.embedding_engine.stats() if llm_service.embedding_engine else None,
+        "llm_queue": llm_service.llm_queue.stats() if llm_service.llm_queue else None,
+        "index_version": index_version,
+        "vector_index": ivf_index.stats() if ivf_index is not None else None,
+        "cache": {
+            "query_embeddings": llm_service.query_embedding_cache.stats(),
+            "answers": answer_cache.stats()
+        }
     }
@@ -0,0 +1,101 @@
+"""Per-session chat history and document scope."""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class Session:
+    """Chat history, bounded by a token budget, and the documents a client uploaded."""
+
+    def __init__(self, session_id, max_history_tokens):
+        self.id = session_id
+        self.max_history_tokens = max_history_tokens
+        self.documents = set()
+        self.last_used = time.monotonic()
+        self._history = deque()
+        self._history_tokens = 0
+        self._lock = threading.Lock()
+
+    def add_turn(self, question, answer):
+        """Record a question/answer pair, dropping the oldest turns over budget."""
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        with self._lock:
+            self._history.append((question, answer, tokens))
+            self._history_tokens += tokens
+            while self._history_tokens > self.max_history_tokens and len(self._history) > 1:
+                _, _, dropped = self._history.popleft()
+                self._history_tokens -= dropped
+
+    def history(self):
+        """Get the retained (question, answer) pairs, oldest first."""
+        with self._lock:
+            return [(question, answer) for question, answer, _ in self._history]
+
+    def clear_history(self):
+        with self._lock:
+            self._history.clear()
+            self._history_tokens = 0
+
+    def add_document(self, name):
+        with self._lock:
+            self.documents.add(name)
+
+    def remove_document(self, name):
+        with self._lock:
+            self.documents.discard(name)
+
+    def scope(self):
+        """Get the documents this session is limited to (empty means all)."""
+        with self._lock:
+            return tuple(sorted(self.documents))
+
+
+class SessionStore:
+    """Thread-safe LRU store of sessions that expire after ttl_seconds of inactivity."""
+
+    def __init__(self, max_sessions, ttl_seconds, max_history_tokens):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_history_tokens = max_history_tokens
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Get a session, creating it if it doesn't exist or has expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, self.max_history_tokens)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def remove_document(self, name):
+        """Drop a deleted document from every session's scope."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session.remove_document(name)
+
+    def _expire(self, now):
+        """Drop idle sessions, oldest first (caller holds _lock)."""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
@@ -0,0 +1,526 @@
+"""Compact approximate nearest-neighbour index: int8 vectors in an IVF layout, reranked at full precision."""
+
+import json
+import math
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# Vectors sampled per list when training the coarse quantizer
+TRAIN_POINTS_PER_LIST = 64
+KMEANS_ITERATIONS = 15
+
+# Below this many vectors every search is an int8 scan; above it the
+# coarse quantizer is trained, and retrained whenever the index has
+# grown RETRAIN_GROWTH-fold since, so lists stay balanced
+MIN_TRAIN_SIZE = 16 * TRAIN_POINTS_PER_LIST
+RETRAIN_GROWTH = 4
+
+# Rows of removed chunks are compacted away once they make up this share
+# of an index of at least COMPACT_MIN_ROWS rows
+COMPACT_FRACTION = 0.25
+COMPACT_MIN_ROWS = 1024
+
+METADATA_FILE = "index.json"
+
+# Per-row arrays: name -> (shape per row, given the embedding size; dtype).
+# The arrays in DISK_ARRAYS are written and read with file I/O rather than
+# mapped, so only the page cache holds them, never the process's memory.
+DISK_ARRAYS = {"vectors"}
+ROW_ARRAYS = {
+    "codes": (lambda dim: (dim,), np.int8),
+    "vectors": (lambda dim: (dim,), np.float32),
+    "scales": (lambda dim: (), np.float32),
+    "alive": (lambda dim: (), np.bool_),
+    "documents": (lambda dim: (), np.int32),
+    "assignments": (lambda dim: (), np.int32),
+}
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _group(keys, rows):
+    """Map each key to the rows holding it, as lists."""
+    order = np.argsort(keys, kind="stable")
+    unique, starts = np.unique(keys[order], return_index=True)
+    groups = np.split(rows[order], starts[1:])
+    return {int(key): group.tolist() for key, group in zip(unique, groups)}
+
+
+class _Rows:
+    """Growable array of rows, memory-mapped from `path` when one is given."""
+
+    def __init__(self, path, shape, dtype, capacity=1024, load=False):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.array = None
+        if load:
+            row_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+            rows = max(1, os.path.getsize(path) // row_bytes)
+            self.array = np.memmap(path, self.dtype, "r+", shape=(rows,) + self.shape)
+        else:
+            if path is not None:
+                open(path, "wb").close()
+            self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        shape = (capacity,) + self.shape
+        if self.path is None:
+            array = np.zeros(shape, self.dtype)
+            if self.array is not None:
+                array[:len(self.array)] = self.array
+        else:
+            if self.array is not None:
+                self.array.flush()
+            with open(self.path, "r+b") as f:
+                f.truncate(int(np.prod(shape)) * self.dtype.itemsize)
+            array = np.memmap(self.path, self.dtype, "r+", shape=shape)
+        # Searches holding the previous array keep reading valid rows from it
+        self.array = array
+
+    def put(self, start, values):
+        end = start + len(values)
+        if end > len(self.array):
+            self._allocate(max(end, 2 * len(self.array)))
+        self.array[start:end] = values
+
+    def copy_rows(self, keep, path):
+        """New _Rows (at `path`) holding only the rows numbered in `keep`."""
+        rows = _Rows(path, self.shape, self.dtype, max(1024, len(keep)))
+        for start in range(0, len(keep), 16384):
+            block = keep[start:start + 16384]
+            rows.array[start:start + len(block)] = self.array[block]
+        return rows
+
+    def flush(self):
+        if self.path is not None:
+            self.array.flush()
+
+
+class _DiskRows:
+    """
+    Growable rows in a file (an anonymous temporary file without `path`),
+    accessed with pread/pwrite only: reading a few rows costs a syscall
+    each instead of mapping whole pages, and around them, into memory.
+    """
+
+    def __init__(self, path, shape, dtype, capacity=1024, load=False):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        if path is None:
+            self.file = tempfile.TemporaryFile()
+        else:
+            self.file = open(path, "r+b" if load else "w+b")
+        if load:
+            self.capacity = os.path.getsize(path) // self.row_bytes
+        else:
+            self.capacity = 0
+            self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        os.ftruncate(self.file.fileno(), capacity * self.row_bytes)
+        self.capacity = capacity
+
+    def put(self, start, values):
+        values = np.ascontiguousarray(values, self.dtype)
+        end = start + len(values)
+        if end > self.capacity:
+            self._allocate(max(end, 2 * self.capacity))
+        os.pwrite(self.file.fileno(), values.tobytes(), start * self.row_bytes)
+
+    def read(self, rows):
+        """The given rows, in order, as an array."""
+        out = np.empty((len(rows),) + self.shape, self.dtype)
+        buffer = out.reshape(len(rows), -1).view(np.uint8)
+        for i, row in enumerate(rows):
+            buffer[i] = np.frombuffer(os.pread(self.file.fileno(), self.row_bytes, int(row) * self.row_bytes),
+                                      np.uint8)
+        return out
+
+    def read_range(self, start, end):
+        """Rows start to end (exclusive) as an array, in one read."""
+        data = os.pread(self.file.fileno(), (end - start) * self.row_bytes, start * self.row_bytes)
+        return np.frombuffer(data, self.dtype).reshape((end - start,) + self.shape)
+
+    def copy_rows(self, keep, path):
+        """New _DiskRows (at `path`) holding only the rows numbered in `keep`."""
+        rows = _DiskRows(path, self.shape, self.dtype, max(1024, len(keep)))
+        for start in range(0, len(keep), 16384):
+            block = keep[start:start + 16384]
+            rows.put(start, self.read(block))
+        return rows
+
+    def flush(self):
+        if self.path is not None:
+            os.fsync(self.file.fileno())
+
+
+def _row_storage(name, path, shape, dtype, **kwargs):
+    """Row storage for one of the ROW_ARRAYS."""
+    storage = _DiskRows if name in DISK_ARRAYS else _Rows
+    return storage(path, shape, dtype, **kwargs)
+
+
+class QuantizedIVFIndex:
+    """
+    Approximate cosine-similarity index over chunk embeddings.
+
+    Each vector is stored twice: as int8 codes with a per-vector scale,
+    which are what searches scan, and at full precision in a file that
+    is read back with pread (for the best candidates' exact reranking, and
+    when training), so the float32 copy never takes up process memory.
+
+    Vectors are grouped into inverted lists around k-means centroids
+    (IVF); a search scans the lists of the n_probes nearest centroids.
+    A search scoped to some documents scans their rows directly when
+    that is no more work than probing, and otherwise probes more lists
+    until enough rows pass the scope filter.
+
+    Removed chunks are tombstoned and compacted away once they pass
+    COMPACT_FRACTION of the rows. With a directory, the row arrays are
+    memory-mapped files there and save() persists the rest, so a restart
+    reopens the index instead of re-quantizing and re-training; `fingerprint`
+    (the embedding model) guards against reopening an incompatible index.
+    The directory belongs to one server process.
+    """
+
+    def __init__(self, directory=None, n_lists=0, n_probes=8, rerank=64, fingerprint=""):
+        self.directory = Path(directory) if directory else None
+        self.n_lists = n_lists
+        self.n_probes = n_probes
+        self.rerank = rerank
+        self.fingerprint = fingerprint
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        """Forget every row (caller holds _lock, or is __init__)."""
+        self._dim = None
+        self._generation = 0
+        self._arrays = {}
+        self._count = 0
+        self._ids = []
+        self._rows = {}
+        self._document_codes = {}
+        self._document_rows = {}
+        self._document_row_arrays = {}
+        self._centroids = None
+        self._trained_count = 0
+        self._lists = []
+        self._list_arrays = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def chunk_ids(self):
+        """Ids of the indexed chunks."""
+        with self._lock:
+            return set(self._rows)
+
+    # Storage
+
+    def _path(self, name, generation=None):
+        if self.directory is None:
+            return None
+        return str(self.directory / f"{name}.{self._generation if generation is None else generation}.rows")
+
+    def _init_storage(self, dim):
+        """Create empty row arrays once the embedding size is known (caller holds _lock)."""
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for stale in self.directory.glob("*.rows"):
+                stale.unlink()
+            (self.directory / METADATA_FILE).unlink(missing_ok=True)
+        self._dim = dim
+        self._arrays = {
+            name: _row_storage(name, self._path(name), shape(dim), dtype)
+            for name, (shape, dtype) in ROW_ARRAYS.items()
+        }
+
+    def clear(self):
+        """Drop every chunk, e.g. before rebuilding from the vector store."""
+        with self._lock:
+            self._reset()
+            if self.directory is not None and self.directory.is_dir():
+                for stale in self.directory.glob("*.rows"):
+                    stale.unlink()
+                (self.directory / METADATA_FILE).unlink(missing_ok=True)
+
+    def save(self):
+        """Persist the index, so load() can reopen it after a restart."""
+        if self.directory is None or self._dim is None:
+            return
+        with self._lock:
+            for rows in self._arrays.values():
+                rows.flush()
+            metadata = {
+                "fingerprint": self.fingerprint,
+                "generation": self._generation,
+                "dim": self._dim,
+                "count": self._count,
+                "trained_count": self._trained_count,
+                "ids": self._ids,
+                "documents": sorted(self._document_codes, key=self._document_codes.get),
+                "centroids": self._centroids.tolist() if self._centroids is not None else None
+            }
+            path = self.directory / METADATA_FILE
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(metadata, f)
+            os.replace(f"{path}.tmp", path)
+
+    def load(self):
+        """
+        Reopen the index saved in the directory.
+
+        Returns:
+            True if an index built with the same fingerprint was loaded
+        """
+        path = self.directory / METADATA_FILE if self.directory is not None else None
+        if path is None or not path.is_file():
+            return False
+        with open(path) as f:
+            metadata = json.load(f)
+        if metadata["fingerprint"] != self.fingerprint:
+            return False
+
+        with self._lock:
+            self._reset()
+            self._dim = metadata["dim"]
+            self._generation = metadata["generation"]
+            self._arrays = {
+                name: _row_storage(name, self._path(name), shape(self._dim), dtype, load=True)
+                for name, (shape, dtype) in ROW_ARRAYS.items()
+            }
+            self._count = metadata["count"]
+            self._trained_count = metadata["trained_count"]
+            self._ids = metadata["ids"]
+            self._document_codes = {name: code for code, name in enumerate(metadata["documents"])}
+            if metadata["centroids"] is not None:
+                self._centroids = np.asarray(metadata["centroids"], dtype=np.float32)
+            alive = np.flatnonzero(self._arrays["alive"].array[:self._count])
+            self._rows = {self._ids[row]: int(row) for row in alive}
+            self._rebuild_lists()
+        return True
+
+    # Updates
+
+    def add(self, chunk_ids, vectors, document):
+        """Index chunk embeddings (re-indexing chunks already present)."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if not len(vectors):
+            return
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+
+        with self._lock:
+            if self._dim is None:
+                self._init_storage(vectors.shape[1])
+            self._tombstone(chunk_ids)
+            start = self._count
+            rows = list(range(start, start + len(vectors)))
+            document_code = self._document_codes.setdefault(document, len(self._document_codes))
+            self._arrays["codes"].put(start, codes)
+            self._arrays["vectors"].put(start, vectors)
+            self._arrays["scales"].put(start, scales)
+            self._arrays["alive"].put(start, np.ones(len(vectors), np.bool_))
+            self._arrays["documents"].put(start, np.full(len(vectors), document_code, np.int32))
+            self._arrays["assignments"].put(start, np.full(len(vectors), -1, np.int32))
+            for row, chunk_id in zip(rows, chunk_ids):
+                self._ids.append(chunk_id)
+                self._rows[chunk_id] = row
+            self._document_rows.setdefault(document_code, []).extend(rows)
+            self._document_row_arrays[document_code] = None
+            self._count += len(vectors)
+
+            if self._centroids is not None:
+                self._assign(start, vectors)
+            if len(self._rows) >= max(MIN_TRAIN_SIZE, RETRAIN_GROWTH * self._trained_count):
+                self._train()
+
+    def remove(self, chunk_ids):
+        """Drop chunks from the index."""
+        with self._lock:
+            self._tombstone(chunk_ids)
+            dead = self._count - len(self._rows)
+            if self._count >= COMPACT_MIN_ROWS and dead > COMPACT_FRACTION * self._count:
+                self._compact()
+
+    def _tombstone(self, chunk_ids):
+        """Mark chunks' rows as removed (caller holds _lock)."""
+        for chunk_id in chunk_ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is not None:
+                self._arrays["alive"].array[row] = False
+
+    def _compact(self):
+        """
+        Copy the live rows into a new generation of files and drop the old
+        ones (caller holds _lock). Searches already holding the old arrays
+        finish on them.
+        """
+        keep = np.sort(np.fromiter(self._rows.values(), np.int64, len(self._rows)))
+        old_paths = [rows.path for rows in self._arrays.values()]
+        generation = self._generation + 1
+        self._arrays = {
+            name: rows.copy_rows(keep, self._path(name, generation))
+            for name, rows in self._arrays.items()
+        }
+        self._generation = generation
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._count = len(keep)
+        self._rebuild_lists()
+        if self.directory is not None:
+            # The metadata must name the new generation before the old files go
+            self.save()
+            for path in old_paths:
+                os.remove(path)
+
+    def _rebuild_lists(self):
+        """Rebuild the per-document rows and inverted lists from the row arrays (caller holds _lock)."""
+        rows = np.arange(self._count)
+        self._document_rows = _group(self._arrays["documents"].array[:self._count], rows)
+        self._document_row_arrays = dict.fromkeys(self._document_rows)
+        if self._centroids is not None:
+            lists = _group(self._arrays["assignments"].array[:self._count], rows)
+            self._lists = [lists.get(list_no, []) for list_no in range(len(self._centroids))]
+            self._list_arrays = [None] * len(self._centroids)
+
+    def _assign(self, start, vectors):
+        """Add rows to the inverted list of their nearest centroid (caller holds _lock)."""
+        nearest = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+        self._arrays["assignments"].put(start, nearest)
+        for offset, list_no in enumerate(nearest):
+            self._lists[list_no].append(start + offset)
+            self._list_arrays[list_no] = None
+
+    def _train(self):
+        """Fit the centroids with spherical k-means and rebuild the inverted lists (caller holds _lock)."""
+        rows = np.fromiter(self._rows.values(), np.int64, len(self._rows))
+        n_lists = self.n_lists or max(16, int(math.sqrt(len(rows))))
+        n_lists = min(n_lists, len(rows))
+        rng = np.random.default_rng(0)
+        full = self._arrays["vectors"]
+        sample = full.read(np.sort(rng.choice(rows, min(len(rows), n_lists * TRAIN_POINTS_PER_LIST), replace=False)))
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            filled = np.bincount(nearest, minlength=n_lists) > 0
+            centroids[filled] = _normalize(sums[filled])
+
+        self._centroids = centroids
+        self._lists = [[] for _ in range(n_lists)]
+        self._list_arrays = [None] * n_lists
+        # Assign every row, dead ones included, so row numbers stay dense
+        for start in range(0, self._count, 16384):
+            end = min(start + 16384, self._count)
+            self._assign(start, full.read_range(start, end))
+        self._trained_count = len(rows)
+
+    # Search
+
+    def _probe(self, query, probes):
+        """Rows in the inverted lists of the `probes` centroids nearest the query (caller holds _lock)."""
+        probes = min(probes, len(self._centroids))
+        nearest = np.argpartition(-(self._centroids @ query), probes - 1)[:probes]
+        arrays = []
+        for list_no in nearest:
+            if self._list_arrays[list_no] is None:
+                self._list_arrays[list_no] = np.asarray(self._lists[list_no], np.int64)
+            arrays.append(self._list_arrays[list_no])
+        return np.concatenate(arrays)
+
+    def _scope_rows(self, scope_codes):
+        """Rows of the given documents (caller holds _lock)."""
+        arrays = []
+        for code in scope_codes:
+            if code not in self._document_rows:
+                continue
+            if self._document_row_arrays.get(code) is None:
+                self._document_row_arrays[code] = np.asarray(self._document_rows[code], np.int64)
+            arrays.append(self._document_row_arrays[code])
+        return np.concatenate(arrays) if arrays else np.zeros(0, np.int64)
+
+    def _candidates(self, query, k, scope):
+        """Live rows to score for a query (caller holds _lock)."""
+        alive = self._arrays["alive"].array
+        if scope:
+            codes = [self._document_codes[name] for name in scope if name in self._document_codes]
+            scoped = self._scope_rows(codes)
+            # Expected rows scanned by probing n_probes lists
+            probed = self._count * self.n_probes / len(self._centroids) if self._centroids is not None else 0
+            if len(scoped) <= probed or self._centroids is None:
+                return scoped[alive[scoped]]
+
+            # Scope larger than a probe: probe more lists until k rows pass the filter
+            documents = self._arrays["documents"].array
+            probes = self.n_probes
+            while True:
+                candidates = self._probe(query, probes)
+                candidates = candidates[alive[candidates] & np.isin(documents[candidates], codes)]
+                if len(candidates) >= k or probes >= len(self._centroids):
+                    return candidates
+                probes *= 2
+
+        candidates = np.arange(self._count) if self._centroids is None else self._probe(query, self.n_probes)
+        return candidates[alive[candidates]]
+
+    def search(self, vector, k, scope=()):
+        """
+        Find the chunks most similar to a query embedding.
+
+        Args:
+            vector: Query embedding
+            k: Number of results
+            scope: Document names to restrict results to (empty for all)
+
+        Returns:
+            (list of (chunk id, cosine similarity), best first; array of
+            the results' full-precision vectors)
+        """
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        with self._lock:
+            if not self._rows:
+                return [], np.zeros((0, self._dim or 0), np.float32)
+            candidates = self._candidates(query, k, scope)
+            codes, full = self._arrays["codes"].array, self._arrays["vectors"]
+            scales = self._arrays["scales"].array
+            ids = self._ids
+
+        if not len(candidates):
+            return [], np.zeros((0, self._dim), np.float32)
+
+        # Approximate scores from the int8 codes, then exact scores for the best few
+        approximate = (codes[candidates].astype(np.float32) @ query) * scales[candidates]
+        shortlist = max(k, self.rerank)
+        if len(candidates) > shortlist:
+            candidates = candidates[np.argpartition(-approximate, shortlist - 1)[:shortlist]]
+        vectors = full.read(candidates)
+        exact = vectors @ query
+        order = np.argsort(-exact)[:k]
+        return [(ids[candidates[i]], float(exact[i])) for i in order], vectors[order]
+
+    def stats(self):
+        """Get size and memory figures."""
+        with self._lock:
+            dim = self._dim or 0
+            return {
+                "chunks": len(self._rows),
+                "rows": self._count,
+                "lists": 0 if self._centroids is None else len(self._centroids),
+                "code_bytes": self._count * dim,
+                "full_precision_bytes": self._count * dim * 4,
+                "memory_mapped": self.directory is not None
+            }
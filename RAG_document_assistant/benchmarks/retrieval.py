@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compare the vector (MMR) and hybrid (MMR + BM25) retrievers on the
+persisted index.
+
+Usage:
+    python -m benchmarks.retrieval questions.jsonl [--k 6]
+
+Each line of the questions file is a JSON object with a "question" and
+an "expected" string; a question counts as recalled at k when one of the
+top-k chunks contains the expected string (case-insensitive), e.g.
+    {"question": "What does error E1042 mean?", "expected": "E1042"}
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from app.config import config
+from app.services import rag
+
+
+def run(questions, mode):
+    """Retrieve for every question, returning (recall@k, latencies in ms)."""
+    hits = 0
+    latencies = []
+    for item in questions:
+        started = time.perf_counter()
+        documents = rag.retrieve(item["question"], mode=mode)
+        latencies.append((time.perf_counter() - started) * 1000)
+        expected = item["expected"].lower()
+        if any(expected in doc.page_content.lower() for doc in documents):
+            hits += 1
+    return hits / len(questions), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("questions", help="JSONL file of {question, expected} objects")
+    parser.add_argument("--k", type=int, default=config.retriever_k, help="Chunks retrieved per question")
+    args = parser.parse_args()
+
+    config.retriever_k = args.k
+    with open(args.questions) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+
+    rag.warm_up()
+    if rag.vector_store is None:
+        raise SystemExit(f"No persisted index found in '{config.chroma_persist_dir}'.")
+
+    print(f"{len(questions)} questions, k={args.k}")
+    print(f"{'mode':<8} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in ("vector", "hybrid"):
+        recall, latencies = run(questions, mode)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"{mode:<8} {recall:>9.3f} {statistics.median(latencies):>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Compare the quantized IVF index against exact search (recall@k, latency, memory).
+
+Usage:
+    python -m benchmarks.vector_index [--chunks 100000] [--dim 384]
+        [--probes 1,4,8,16] [--k 10] [--queries 200]
+    python -m benchmarks.vector_index --from-index
+    python -m benchmarks.vector_index --embeddings vectors.npy
+
+By default the corpus is synthetic: normalized vectors drawn around
+random topic centres, which is roughly how chunk embeddings of a
+document collection cluster. --from-index uses the embeddings in the
+persisted Chroma index and --embeddings a saved (n, dim) NumPy array.
+Queries are stored vectors with a little noise added, and exact search
+is a full-precision dot product over every vector. Memory is reported as
+the growth of the whole process's resident set while the index is built
+and searched, not just the size of its arrays.
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.vector_index import QuantizedIVFIndex
+
+
+def synthetic_corpus(chunks, dim, topics, seed):
+    """Normalized vectors clustered around random topic centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(topics, dim))
+    vectors = centres[rng.integers(0, topics, chunks)] + rng.normal(scale=1.0, size=(chunks, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def stored_embeddings():
+    """Embeddings of every chunk in the persisted Chroma index."""
+    from app.config import config
+    from app.services import rag
+
+    rag.warm_up()
+    if rag.vector_store is None:
+        raise SystemExit(f"No persisted index found in '{config.chroma_persist_dir}'.")
+    stored = rag.vector_store.get(include=["embeddings"])
+    return np.asarray(stored["embeddings"], dtype=np.float32)
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 95) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic embedding size")
+    parser.add_argument("--topics", type=int, default=1000, help="Synthetic topic clusters")
+    parser.add_argument("--from-index", action="store_true", help="Use the persisted Chroma embeddings")
+    parser.add_argument("--embeddings", help="Use embeddings saved with numpy.save")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", default="1,4,8,16", help="Comma-separated IVF_PROBES values to try")
+    parser.add_argument("--lists", type=int, default=0, help="IVF_LISTS (0: about sqrt(chunks))")
+    parser.add_argument("--rerank", type=int, default=64, help="IVF_RERANK")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.from_index:
+        corpus = stored_embeddings()
+    elif args.embeddings:
+        corpus = np.load(args.embeddings).astype(np.float32)
+    else:
+        corpus = synthetic_corpus(args.chunks, args.dim, args.topics, args.seed)
+    corpus /= np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+    count, dim = corpus.shape
+
+    rng = np.random.default_rng(args.seed)
+    queries = corpus[rng.integers(0, count, args.queries)]
+    queries = queries + rng.normal(scale=0.3 / np.sqrt(dim), size=queries.shape).astype(np.float32)
+
+    # Exact search
+    truth = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        scores = corpus @ query
+        top = np.argpartition(-scores, args.k - 1)[:args.k]
+        latencies.append(time.perf_counter() - started)
+        truth.append(set(top.tolist()))
+    exact_p50, exact_p95 = percentiles(latencies)
+
+    with tempfile.TemporaryDirectory() as directory:
+        rss_before = rss_bytes()
+        index = QuantizedIVFIndex(directory, args.lists, rerank=args.rerank)
+        started = time.perf_counter()
+        for start in range(0, count, 10000):
+            rows = range(start, min(start + 10000, count))
+            index.add([str(row) for row in rows], corpus[rows.start:rows.stop], "corpus")
+        build_seconds = time.perf_counter() - started
+        rss_built = rss_bytes()
+        stats = index.stats()
+
+        print(f"{count} vectors of {dim} dims, k={args.k}, {stats['lists']} lists, "
+              f"rerank {args.rerank}, built in {build_seconds:.1f}s")
+        print(f"float32 vectors: {stats['full_precision_bytes'] / 2**20:.1f} MB (on disk); "
+              f"int8 codes scanned by the index: {stats['code_bytes'] / 2**20:.1f} MB (memory-mapped)")
+        print(f"{'search':<12} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        print(f"{'exact':<12} {1.0:>9.3f} {exact_p50:>8.2f} {exact_p95:>8.2f}")
+
+        for probes in (int(value) for value in args.probes.split(",")):
+            index.n_probes = probes
+            recalled = 0
+            latencies = []
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                hits, _ = index.search(query, args.k)
+                latencies.append(time.perf_counter() - started)
+                recalled += len(expected & {int(chunk_id) for chunk_id, _ in hits})
+            p50, p95 = percentiles(latencies)
+            print(f"{f'ivf/{probes}':<12} {recalled / (args.k * len(queries)):>9.3f} {p50:>8.2f} {p95:>8.2f}")
+
+        # The benchmark's own copy of the corpus is resident before the index is built
+        print(f"process RSS: {rss_before / 2**20:.1f} MB before the index, "
+              f"+{(rss_built - rss_before) / 2**20:.1f} MB after building it, "
+              f"+{(rss_bytes() - rss_before) / 2**20:.1f} MB after searching")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,24 @@ let documentLoaded = false;
 
 const baseUrl = window.location.origin;
 
+// Random 128-bit id; crypto.randomUUID() only exists in secure contexts
+// (HTTPS or localhost), so build it from getRandomValues() over plain HTTP
+function newSessionId() {
+    if (crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// Per-tab session id, so chat history and uploaded documents aren't shared between users
+let sessionId = sessionStorage.getItem('sessionId');
+if (!sessionId) {
+    sessionId = newSessionId();
+    sessionStorage.setItem('sessionId', sessionId);
+}
+const sessionHeaders = { 'X-Session-Id': sessionId };
+
 // DOM elements
 const messageList = document.getElementById('message-list');
 const messageInput = document.getElementById('message-input');
@@ -48,6 +66,34 @@ function addMessage(content, isUser, extraHtml = '') {
     `;
     messageList.appendChild(div);
     scrollToBottom();
+    return div.querySelector('.message-content');
+}
+
+// Parse Server-Sent Events from a fetch response, calling onEvent(event, data)
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            onEvent(event, JSON.parse(data));
+        }
+    }
 }
 
 // Upload UI HTML
@@ -94,6 +140,25 @@ function setupUpload() {
     }
 }
 
+// Poll a document processing job until it finishes
+async function waitForJob(jobId) {
+    const uploadButton = document.getElementById('upload-button');
+    
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch(`${baseUrl}/jobs/${jobId}`);
+        const job = await response.json();
+        
+        if (!response.ok || job.status === 'done' || job.status === 'failed') {
+            return { ok: response.ok && job.status === 'done', data: job };
+        }
+        
+        if (uploadButton && job.status === 'running') {
+            uploadButton.textContent = `Processing... ${job.pages_parsed} pages`;
+        }
+    }
+}
+
 // Handle file upload
 async function handleFileUpload(file) {
     if (!file.name.toLowerCase().endsWith('.pdf')) {
@@ -115,13 +180,19 @@ async function handleFileUpload(file) {
     try {
         const response = await fetch(`${baseUrl}/process-document`, {
             method: 'POST',
+            headers: sessionHeaders,
             body: formData
         });
-        const data = await response.json();
+        let data = await response.json();
+        let ok = response.ok;
+        
+        if (ok && data.jobId) {
+            ({ ok, data } = await waitForJob(data.jobId));
+        }
         
         hideLoading();
         
-        if (response.ok) {
+        if (ok) {
             documentLoaded = true;
             const uploadArea = document.getElementById('upload-area');
             if (uploadArea) uploadArea.remove();
@@ -150,15 +221,35 @@ async function sendMessage() {
     showLoading();
     
     try {
-        const response = await fetch(`${baseUrl}/process-message`, {
+        const response = await fetch(`${baseUrl}/process-message/stream`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', ...sessionHeaders },
             body: JSON.stringify({ userMessage: message })
         });
-        const data = await response.json();
         
+        if (!response.ok) {
+            const data = await response.json();
+            hideLoading();
+            addMessage(data.error, false);
+            return;
+        }
+        
+        // Render tokens as they arrive
+        let content = null;
+        await readEventStream(response, (event, data) => {
+            if (event === 'token') {
+                if (!content) {
+                    hideLoading();
+                    content = addMessage('', false);
+                }
+                content.textContent += data.text;
+                scrollToBottom();
+            } else if (event === 'error') {
+                hideLoading();
+                addMessage(data.message, false);
+            }
+        });
         hideLoading();
-        addMessage(data.botResponse || data.error, false);
     } catch (error) {
         hideLoading();
         addMessage('Error sending message. Please try again.', false);
@@ -172,7 +263,7 @@ async function resetChat() {
     documentLoaded = false;
     
     try {
-        await fetch(`${baseUrl}/clear-history`, { method: 'POST' });
+        await fetch(`${baseUrl}/clear-history`, { method: 'POST', headers: sessionHeaders });
     } catch (e) {
         // ignore
     }
@@ -0,0 +1,775 @@
+"""Unit tests for the RAG pipeline's self-contained services (no models needed)."""
+
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Keep the app from loading models in the background when the tests import it
+os.environ.setdefault("WARMUP_MODE", "lazy")
+
+from app.services import compression, ingest, jobs, rag
+from app.services.cache import QueryCachedEmbeddings, TTLCache
+from app.services.embedding_cache import BoundedFileStore
+from app.services.embedding_engine import BatchingEmbeddings
+from app.services.fakes import FakeEmbeddings, FakeLLM
+from app.services.lexical import InvertedIndex
+from app.services.llm_queue import QueuedLLM
+from app.services.sessions import SessionStore
+from app.services.vector_index import QuantizedIVFIndex
+
+
+def _vectors(count, dim, seed):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(count, dim)).astype(np.float32)
+
+
+class TestQuantizedIVFIndex(unittest.TestCase):
+    """Search, scoping, persistence and compaction of the int8 IVF index."""
+
+    def test_scoped_search_finds_small_document(self):
+        # A small document next to a large one must not be crowded out of the probed lists
+        index = QuantizedIVFIndex(n_probes=2)
+        large = _vectors(19990, 32, 0)
+        small = _vectors(10, 32, 1)
+        index.add([f"large-{i}" for i in range(len(large))], large, "large.pdf")
+        index.add([f"small-{i}" for i in range(len(small))], small, "small.pdf")
+        self.assertGreater(index.stats()["lists"], 0)
+
+        for query in _vectors(100, 32, 2):
+            hits, vectors = index.search(query, 4, scope=("small.pdf",))
+            self.assertEqual(len(hits), 4)
+            self.assertEqual(len(vectors), 4)
+            self.assertTrue(all(chunk_id.startswith("small-") for chunk_id, _ in hits))
+
+    def test_scoped_search_over_large_scope(self):
+        index = QuantizedIVFIndex(n_probes=1)
+        for document in range(4):
+            vectors = _vectors(2000, 16, document)
+            index.add([f"{document}-{i}" for i in range(len(vectors))], vectors, f"{document}.pdf")
+
+        hits, _ = index.search(_vectors(1, 16, 9)[0], 10, scope=("1.pdf", "2.pdf"))
+        self.assertEqual(len(hits), 10)
+        self.assertTrue(all(chunk_id[0] in "12" for chunk_id, _ in hits))
+
+    def test_search_ranks_exact_match_first(self):
+        index = QuantizedIVFIndex()
+        vectors = _vectors(3000, 16, 0)
+        index.add([str(i) for i in range(len(vectors))], vectors, "doc.pdf")
+        hits, _ = index.search(vectors[1234], 3)
+        self.assertEqual(hits[0][0], "1234")
+        self.assertAlmostEqual(hits[0][1], 1.0, places=4)
+
+    def test_save_and_load(self):
+        vectors = _vectors(2000, 16, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            index = QuantizedIVFIndex(directory, fingerprint="model-a")
+            index.add([str(i) for i in range(len(vectors))], vectors, "doc.pdf")
+            index.remove(["7"])
+            index.save()
+            expected, _ = index.search(vectors[42], 5)
+
+            reopened = QuantizedIVFIndex(directory, fingerprint="model-a")
+            self.assertTrue(reopened.load())
+            self.assertEqual(reopened.chunk_ids(), index.chunk_ids())
+            self.assertEqual(reopened.search(vectors[42], 5)[0], expected)
+            self.assertEqual(reopened.stats()["lists"], index.stats()["lists"])
+
+            # An index built with another embedding model is not reused
+            self.assertFalse(QuantizedIVFIndex(directory, fingerprint="model-b").load())
+
+    def test_removed_rows_are_compacted(self):
+        vectors = _vectors(2000, 16, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            index = QuantizedIVFIndex(directory)
+            index.add([str(i) for i in range(len(vectors))], vectors, "doc.pdf")
+            index.remove([str(i) for i in range(1000)])
+            self.assertEqual(index.stats()["rows"], 1000)
+            # Only the new generation's files are left
+            self.assertEqual(len(list(Path(directory).glob("*.rows"))), 6)
+
+            hits, _ = index.search(vectors[1500], 1)
+            self.assertEqual(hits[0][0], "1500")
+            hits, _ = index.search(vectors[10], 1, scope=("doc.pdf",))
+            self.assertNotEqual(hits[0][0], "10")
+
+            reopened = QuantizedIVFIndex(directory)
+            self.assertTrue(reopened.load())
+            self.assertEqual(reopened.search(vectors[1500], 1)[0][0][0], "1500")
+
+
+class TestCompression(unittest.TestCase):
+    """Sentence selection and overlap stripping of retrieved chunks."""
+
+    def setUp(self):
+        self.embeddings = FakeEmbeddings(batch_latency_ms=0, text_latency_ms=0)
+
+    def _compress(self, documents, budget=1000):
+        compressed, _ = compression.compress("backups", documents, self.embeddings, budget, 200)
+        return [doc.page_content for doc in compressed]
+
+    def test_short_coincidental_overlap_is_kept(self):
+        documents = [
+            Document(page_content="Nightly jobs are run by cron", metadata={"document": "a.pdf", "page": 0}),
+            Document(page_content="rsync copies the backups", metadata={"document": "a.pdf", "page": 3}),
+        ]
+        self.assertEqual(self._compress(documents), [doc.page_content for doc in documents])
+
+    def test_rsync_is_not_stripped_between_adjacent_chunks(self):
+        left = "Backups are taken by a nightly job that uses rsync"
+        right = "rsync copies the backups to the archive host."
+        documents = [
+            Document(page_content=left, metadata={"document": "a.pdf", "page": 0, "start_index": 0}),
+            Document(page_content=right, metadata={"document": "a.pdf", "page": 0, "start_index": 45}),
+        ]
+        self.assertEqual(self._compress(documents), [left, right])
+
+    def test_overlap_between_adjacent_chunks_is_stripped(self):
+        page = ("The archive host keeps thirty days of backups. "
+                "Older backups are moved to cold storage every week. "
+                "Restores are requested through the service desk.")
+        # The left chunk ends mid-sentence, so only stripping (not sentence dedupe) drops its tail
+        left, right = page[:86], page[47:]
+        documents = [
+            Document(page_content=right, metadata={"document": "a.pdf", "page": 0, "start_index": 47}),
+            Document(page_content=left, metadata={"document": "a.pdf", "page": 0, "start_index": 0}),
+        ]
+        self.assertEqual(self._compress(documents), [right, page[:47].strip()])
+
+    def test_chunks_of_other_pages_are_not_stripped(self):
+        text = "Backups older than thirty days are deleted."
+        documents = [
+            Document(page_content=text, metadata={"document": "a.pdf", "page": 0, "start_index": 0}),
+            Document(page_content=text + " Then the job exits.",
+                     metadata={"document": "a.pdf", "page": 1, "start_index": 0}),
+        ]
+        self.assertIn("Then the job exits.", self._compress(documents)[-1])
+
+    def test_budget_keeps_best_sentence(self):
+        documents = [Document(page_content="Cats sleep a lot. Backups run nightly.", metadata={"document": "a.pdf"})]
+        self.assertEqual(self._compress(documents, budget=1), ["Backups run nightly."])
+
+
+class TestBoundedFileStore(unittest.TestCase):
+    """The size-bounded embedding byte store."""
+
+    def test_mget_returns_one_value_per_key_when_evicted_concurrently(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = BoundedFileStore(directory, 1 << 20)
+            store.mset([("a", b"1"), ("b", b"2"), ("c", b"3")])
+
+            # "b" is evicted by another thread between being read and touched
+            utime = os.utime
+
+            def evicting_utime(path, *args, **kwargs):
+                if Path(path).name == "b":
+                    os.remove(path)
+                    raise FileNotFoundError(path)
+                return utime(path, *args, **kwargs)
+
+            with mock.patch("os.utime", evicting_utime):
+                self.assertEqual(store.mget(["a", "b", "missing", "c"]), [b"1", b"2", None, b"3"])
+            self.assertEqual(store.mget(["b", "c"]), [None, b"3"])
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = BoundedFileStore(directory, 300)
+            store.mset([("old", b"x" * 100), ("used", b"x" * 100)])
+            os.utime(Path(directory) / "old", (0, 0))
+            os.utime(Path(directory) / "used", (1, 1))
+            store.mget(["used"])
+            store.mset([("new", b"x" * 150)])
+            self.assertEqual(store.mget(["old", "used", "new"]), [None, b"x" * 100, b"x" * 150])
+
+
+class TestRetrievalKeys(unittest.TestCase):
+    """Keys that fuse vector hits with lexical hits in hybrid retrieval."""
+
+    def test_chunks_without_hash_get_distinct_keys(self):
+        # Stores built before chunks were content-addressed have no chunk_hash
+        first = Document(page_content="Reset the router.", metadata={"source": "uploads/a.pdf", "page": 0})
+        second = Document(page_content="Update the firmware.", metadata={"source": "uploads/a.pdf", "page": 0})
+        self.assertNotEqual(rag._document_key(first), rag._document_key(second))
+
+    def test_key_matches_stored_id(self):
+        chunk_hash = rag._hash_text("Reset the router.")
+        doc = Document(page_content="Reset the router.", metadata={"document": "a.pdf", "chunk_hash": chunk_hash})
+        self.assertEqual(rag._document_key(doc), rag._chunk_id("a.pdf", chunk_hash))
+        doc.id = "stored-id"
+        self.assertEqual(rag._document_key(doc), "stored-id")
+
+
+class TestSessionStore(unittest.TestCase):
+    """Per-session history, document scope and expiry."""
+
+    def test_history_is_kept_within_token_budget(self):
+        session = SessionStore(10, 3600, 25).get("a")
+        for turn in range(4):
+            session.add_turn(f"question {turn}", "x" * 32)
+        self.assertEqual(session.history(), [("question 2", "x" * 32), ("question 3", "x" * 32)])
+
+        session.clear_history()
+        session.add_turn("q", "a")
+        self.assertEqual(session.history(), [("q", "a")])
+
+    def test_idle_sessions_expire(self):
+        store = SessionStore(10, 60, 1000)
+        store.get("a").add_turn("q", "a")
+        with mock.patch("app.services.sessions.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertEqual(store.get("a").history(), [])
+        self.assertEqual(len(store), 1)
+
+    def test_least_recently_used_session_is_evicted(self):
+        store = SessionStore(2, 3600, 1000)
+        store.get("a").add_document("manual.pdf")
+        store.get("b")
+        store.get("a")
+        store.get("c")
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get("a").scope(), ("manual.pdf",))
+        self.assertEqual(store.get("b").scope(), ())
+
+    def test_remove_document_prunes_every_scope(self):
+        store = SessionStore(10, 3600, 1000)
+        store.get("a").add_document("manual.pdf")
+        store.get("a").add_document("notes.pdf")
+        store.get("b").add_document("manual.pdf")
+        store.remove_document("manual.pdf")
+        self.assertEqual(store.get("a").scope(), ("notes.pdf",))
+        self.assertEqual(store.get("b").scope(), ())
+
+
+def _wait_for_job(job_id, timeout=5):
+    """Poll a job until it has finished."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get_job(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+class TestJobs(unittest.TestCase):
+    """Background ingestion jobs and the upload route that queues them."""
+
+    def test_job_indexes_under_document_name_and_deletes_upload(self):
+        calls = []
+
+        def process_document(path, progress=None, session_id=None, document_name=None):
+            calls.append((Path(path).read_bytes(), document_name, session_id))
+            progress(2, 5)
+            return {"status": "success", "document": document_name, "pages": 2, "chunks": 5,
+                    "chunks_added": 5, "chunks_removed": 0}
+
+        with tempfile.TemporaryDirectory() as directory:
+            upload = Path(directory) / "tmp1234.pdf"
+            upload.write_bytes(b"%PDF v1")
+            with mock.patch.object(rag, "process_document", process_document):
+                job = _wait_for_job(jobs.submit(str(upload), "manual.pdf", session_id="s1"))
+            self.assertFalse(upload.exists())
+
+        self.assertEqual(calls, [(b"%PDF v1", "manual.pdf", "s1")])
+        self.assertEqual(job["status"], "done")
+        self.assertEqual((job["document"], job["pages_parsed"], job["chunks_embedded"]), ("manual.pdf", 2, 5))
+
+    def test_failed_job_reports_error_and_deletes_upload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            upload = Path(directory) / "tmp1234.pdf"
+            upload.write_bytes(b"not a pdf")
+            with mock.patch.object(rag, "process_document", side_effect=ValueError("bad PDF")):
+                job = _wait_for_job(jobs.submit(str(upload), "manual.pdf"))
+            self.assertFalse(upload.exists())
+        self.assertEqual((job["status"], job["error"]), ("failed", "bad PDF"))
+
+    def test_uploads_of_the_same_name_get_their_own_files(self):
+        from app.main import app
+
+        submitted = []
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("app.main.config.upload_folder", directory), \
+                    mock.patch.object(jobs, "submit", lambda path, name, session_id=None: submitted.append(
+                        (path, name)) or f"job-{len(submitted)}"):
+                client = app.test_client()
+                for content in (b"%PDF v1", b"%PDF v2"):
+                    response = client.post("/process-document",
+                                           data={"file": (io.BytesIO(content), "manual.pdf")})
+                    self.assertEqual(response.status_code, 202)
+            contents = [Path(path).read_bytes() for path, _ in submitted]
+
+        self.assertEqual([name for _, name in submitted], ["manual.pdf", "manual.pdf"])
+        self.assertNotEqual(submitted[0][0], submitted[1][0])
+        self.assertEqual(contents, [b"%PDF v1", b"%PDF v2"])
+
+
+class _FakeVectorStore:
+    """In-memory stand-in for the Chroma store, covering the calls rag makes."""
+
+    def __init__(self):
+        self.rows = {}
+        self.embedded = []
+        self._collection = self
+
+    def get(self, ids=None, where=None, include=(), limit=None, offset=0):
+        rows = [(chunk_id, row) for chunk_id, row in self.rows.items()
+                if (ids is None or chunk_id in ids)
+                and all(row[1].get(key) == value for key, value in (where or {}).items())]
+        rows = rows[offset or 0:][:limit]
+        result = {"ids": [chunk_id for chunk_id, _ in rows]}
+        if "documents" in include:
+            result["documents"] = [text for _, (text, _) in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [dict(metadata) for _, (_, metadata) in rows]
+        return result
+
+    def add_documents(self, documents, ids):
+        for chunk_id, doc in zip(ids, documents):
+            self.embedded.append(doc.page_content)
+            self.rows[chunk_id] = (doc.page_content, dict(doc.metadata))
+        return ids
+
+    def update(self, ids, metadatas):
+        # Chroma merges the given keys into the stored metadata
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.rows[chunk_id][1].update(metadata)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.rows.pop(chunk_id, None)
+
+    def count(self):
+        return len(self.rows)
+
+
+class _IndexTestCase(unittest.TestCase):
+    """Runs rag's document functions against a fake store, with PDFs given as lists of page texts."""
+
+    def setUp(self):
+        self.store = _FakeVectorStore()
+        self.pdfs = {}
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        for name, value in (("vector_store", self.store), ("loaded_documents", []),
+                            ("lexical_index", InvertedIndex()), ("ivf_index", None),
+                            ("sessions", SessionStore(10, 3600, 1000)), ("warm_up", lambda: 0)):
+            patcher = mock.patch.object(rag, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("app.services.ingest.iter_chunk_batches", self._chunk_batches)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _chunk_batches(self, document_path, batch_size=None):
+        # One batch per page; an exception in place of a page's text is raised when it is reached
+        for page, text in enumerate(self.pdfs[document_path]):
+            if isinstance(text, Exception):
+                raise text
+            yield page + 1, [Document(page_content=text,
+                                      metadata={"source": document_path, "page": page, "start_index": 0})]
+
+    def _upload(self, name, pages, session_id=None):
+        """Write a stand-in PDF whose chunks are the given page texts, and process it."""
+        path = self.directory / name
+        path.write_text("\n".join(map(str, pages)))
+        self.pdfs[str(path)] = pages
+        return rag.process_document(str(path), session_id=session_id)
+
+
+class TestDocumentUpdates(_IndexTestCase):
+    """Re-uploading and deleting documents."""
+
+    def test_reupload_embeds_only_changed_chunks(self):
+        self._upload("manual.pdf", ["Reset the router.", "Update the firmware."])
+        self.store.embedded.clear()
+
+        result = self._upload("manual.pdf", ["Read this first.", "Reset the router.", "Call support."])
+        self.assertEqual(result["status"], "updated")
+        self.assertEqual((result["chunks_added"], result["chunks_removed"]), (2, 1))
+        self.assertEqual(self.store.embedded, ["Read this first.", "Call support."])
+        pages = {text: metadata["page"] for text, metadata in self.store.rows.values()}
+        self.assertEqual(pages, {"Read this first.": 0, "Reset the router.": 1, "Call support.": 2})
+
+    def test_delete_removes_document_everywhere(self):
+        self._upload("manual.pdf", ["Reset the router."], session_id="a")
+        self._upload("notes.pdf", ["Call support."], session_id="a")
+
+        result = rag.delete_document("manual.pdf")
+        self.assertEqual(result, {"document": "manual.pdf", "chunks_removed": 1})
+        self.assertEqual(rag.loaded_documents, ["notes.pdf"])
+        self.assertEqual([text for text, _ in self.store.rows.values()], ["Call support."])
+        self.assertEqual(rag.lexical_index.search("router", 5), [])
+        self.assertEqual(rag.sessions.get("a").scope(), ("notes.pdf",))
+        with self.assertRaises(KeyError):
+            rag.delete_document("manual.pdf")
+
+    def test_delete_is_refused_while_document_is_processing(self):
+        from app.main import app
+
+        self._upload("manual.pdf", ["Reset the router."])
+        client = app.test_client()
+        with mock.patch.object(jobs, "is_active", lambda name: name == "manual.pdf"):
+            response = client.delete("/documents/manual.pdf")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(rag.loaded_documents, ["manual.pdf"])
+        self.assertEqual(client.delete("/documents/manual.pdf").status_code, 200)
+        self.assertEqual(client.delete("/documents/manual.pdf").status_code, 404)
+
+
+class TestDuplicateDetection(_IndexTestCase):
+    """Skipping files that are already indexed, and cleaning up after failed runs."""
+
+    def test_identical_file_is_not_reindexed(self):
+        self._upload("manual.pdf", ["Reset the router.", "Update the firmware."])
+        self.store.embedded.clear()
+
+        result = self._upload("copy-of-manual.pdf", ["Reset the router.", "Update the firmware."], session_id="a")
+        self.assertEqual(result, {"status": "duplicate", "document": "manual.pdf", "pages": 2, "chunks": 2})
+        self.assertEqual(self.store.embedded, [])
+        self.assertEqual(rag.sessions.get("a").scope(), ("manual.pdf",))
+
+    def test_failed_run_leaves_no_chunks_and_is_not_a_duplicate(self):
+        pages = ["Reset the router.", "Update the firmware.", RuntimeError("worker crashed")]
+        with self.assertRaises(RuntimeError):
+            self._upload("manual.pdf", pages)
+        self.assertEqual(self.store.rows, {})
+        self.assertEqual(rag.lexical_index.search("router", 5), [])
+        self.assertEqual(rag.loaded_documents, [])
+
+        # The same file uploaded again is indexed in full, and can then be deleted
+        self.pdfs[str(self.directory / "manual.pdf")] = pages[:2] + ["Call support."]
+        result = rag.process_document(str(self.directory / "manual.pdf"))
+        self.assertEqual((result["status"], result["chunks_added"]), ("success", 3))
+        self.assertEqual(rag.loaded_documents, ["manual.pdf"])
+        self.assertEqual(rag.delete_document("manual.pdf")["chunks_removed"], 3)
+
+    def test_failed_reupload_keeps_previous_version(self):
+        self._upload("manual.pdf", ["Reset the router."])
+        with self.assertRaises(RuntimeError):
+            self._upload("manual.pdf", ["Reset the router.", "Call support.", RuntimeError("worker crashed")])
+        self.assertEqual([text for text, _ in self.store.rows.values()], ["Reset the router."])
+        self.assertEqual(rag.loaded_documents, ["manual.pdf"])
+
+
+class TestStreaming(unittest.TestCase):
+    """Server-Sent Events from /process-message/stream."""
+
+    def _stream(self, stream_query):
+        from app.main import app
+
+        with mock.patch.object(rag, "stream_query", stream_query):
+            response = app.test_client().post("/process-message/stream", json={"userMessage": "How?"})
+            body = response.get_data(as_text=True)
+        events = [block.split("\n") for block in body.strip().split("\n\n")]
+        return response, [(event[len("event: "):], json.loads(data[len("data: "):])) for event, data in events]
+
+    def test_answer_is_streamed_as_events(self):
+        def stream_query(question, session_id=None):
+            yield "context", {"sources": [], "context": None, "cached": False}
+            yield "token", {"text": "Run "}
+            yield "token", {"text": "make."}
+            yield "done", {"answer": "Run make.", "ttft_ms": 1.0, "total_ms": 2.0}
+
+        response, events = self._stream(stream_query)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertEqual([event for event, _ in events], ["context", "token", "token", "done"])
+        self.assertEqual("".join(data["text"] for event, data in events if event == "token"), "Run make.")
+
+    def test_errors_end_the_stream_with_an_error_event(self):
+        def stream_query(question, session_id=None):
+            yield "context", {"sources": [], "context": None, "cached": False}
+            raise RuntimeError("No documents loaded.")
+
+        _, events = self._stream(stream_query)
+        self.assertEqual(events[-1], ("error", {"message": "No documents loaded."}))
+
+    def test_empty_message_is_rejected(self):
+        from app.main import app
+
+        response = app.test_client().post("/process-message/stream", json={"userMessage": "  "})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestQueuedLLM(unittest.TestCase):
+    """Bounded concurrency of LLM calls."""
+
+    def setUp(self):
+        self.llm = FakeLLM(tokens=3, token_latency_ms=0, first_token_latency_ms=0)
+
+    def test_stream_holds_its_slot_until_exhausted(self):
+        queued = QueuedLLM(self.llm, max_concurrency=1, max_queued=0)
+        stream = queued.stream("install the package")
+        next(stream)
+        self.assertEqual(queued.stats()["running"], 1)
+        with self.assertRaisesRegex(RuntimeError, "busy"):
+            queued.invoke("another question")
+
+        list(stream)
+        self.assertEqual(queued.invoke("another question"), "another question another ")
+        self.assertEqual(queued.stats(), {"max_concurrency": 1, "running": 0, "queued": 0,
+                                          "completed": 2, "rejected": 1})
+
+    def test_queued_call_waits_for_a_slot(self):
+        queued = QueuedLLM(self.llm, max_concurrency=1, max_queued=1, timeout=5)
+        stream = queued.stream("first")
+        next(stream)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(queued.invoke("second")))
+        waiter.start()
+        deadline = time.monotonic() + 5
+        while queued.stats()["queued"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(queued.stats()["queued"], 1)
+
+        stream.close()
+        waiter.join(5)
+        self.assertEqual(results, ["second second second "])
+        self.assertEqual(queued.stats()["rejected"], 0)
+
+    def test_waiting_call_times_out(self):
+        queued = QueuedLLM(self.llm, max_concurrency=1, max_queued=1, timeout=0.05)
+        stream = queued.stream("first")
+        next(stream)
+        with self.assertRaisesRegex(RuntimeError, "busy"):
+            queued.invoke("second")
+        stream.close()
+        self.assertEqual(queued.stats()["rejected"], 1)
+
+
+class TestCaches(unittest.TestCase):
+    """Query embedding and answer caches."""
+
+    def test_entries_expire(self):
+        cache = TTLCache(10, 60)
+        cache.set("key", 1)
+        with mock.patch("app.services.cache.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(2, 60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+        self.assertEqual(cache.stats(), {"size": 2, "hits": 3, "misses": 1, "hit_rate": 0.75})
+
+    def test_query_embeddings_are_cached_by_normalized_text(self):
+        embeddings = mock.Mock(wraps=FakeEmbeddings(batch_latency_ms=0, text_latency_ms=0))
+        cached = QueryCachedEmbeddings(embeddings, TTLCache(10, 60))
+        first = cached.embed_query("How do I install it?")
+        self.assertEqual(cached.embed_query("  how do I   INSTALL it? "), first)
+        self.assertEqual(embeddings.embed_query.call_count, 1)
+
+
+class TestAnswerCache(_IndexTestCase):
+    """Answers are reused until the index changes."""
+
+    def setUp(self):
+        super().setUp()
+        self.llm = mock.Mock()
+        self.llm.invoke.side_effect = lambda prompt: f"answer {self.llm.invoke.call_count}"
+        for target, name, value in ((rag, "answer_cache", TTLCache(10, 60)), (rag.llm_service, "llm", self.llm),
+                                    (rag, "retrieve", lambda question, scope=(): [])):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_repeated_question_is_answered_from_cache(self):
+        self._upload("manual.pdf", ["Install with make."])
+        self.assertEqual(rag.query("How to install?", session_id="a")["answer"], "answer 1")
+        self.assertEqual(rag.query("how to  install?", session_id="b")["answer"], "answer 1")
+        self.assertEqual(self.llm.invoke.call_count, 1)
+
+    def test_index_change_invalidates_answers(self):
+        self._upload("manual.pdf", ["Install with make."])
+        rag.query("How to install?", session_id="a")
+        self._upload("notes.pdf", ["Install with pip."])
+        self.assertEqual(rag.query("How to install?", session_id="b")["answer"], "answer 2")
+
+
+class TestBatchingEmbeddings(unittest.TestCase):
+    """Coalescing of concurrent embedding calls."""
+
+    def _concurrently(self, function, arguments):
+        results = [None] * len(arguments)
+
+        def call(i):
+            try:
+                results[i] = function(arguments[i])
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(arguments))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_concurrent_queries_share_batches(self):
+        model = FakeEmbeddings(batch_latency_ms=0, text_latency_ms=0)
+        batching = BatchingEmbeddings(model, max_batch_size=32, max_wait_ms=200)
+        questions = [f"question {i}" for i in range(8)]
+        self.assertEqual(self._concurrently(batching.embed_query, questions),
+                         [model.embed_query(question) for question in questions])
+        stats = batching.stats()
+        self.assertEqual(stats["texts"], 8)
+        self.assertLess(stats["batches"], 8)
+
+    def test_documents_are_split_into_batches_in_order(self):
+        model = FakeEmbeddings(batch_latency_ms=0, text_latency_ms=0)
+        batching = BatchingEmbeddings(model, max_batch_size=4, max_wait_ms=0)
+        texts = [f"chunk {i}" for i in range(10)]
+        self.assertEqual(batching.embed_documents(texts), model.embed_documents(texts))
+        self.assertEqual(batching.stats()["batches"], 3)
+
+    def test_errors_reach_every_caller_of_the_batch(self):
+        model = mock.Mock(spec=["embed_documents"])
+        model.embed_documents.side_effect = ValueError("model failed")
+        batching = BatchingEmbeddings(model, max_wait_ms=200)
+        results = self._concurrently(batching.embed_documents, [["a"], ["b"], ["c"]])
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(batching.embed_documents([]), [])
+
+
+class TestWarmUp(unittest.TestCase):
+    """Model warm-up and the readiness check."""
+
+    def setUp(self):
+        from app.main import app
+
+        self.client = app.test_client()
+        self.embeddings = mock.Mock()
+        for target, name, value in ((rag, "_warmed_up", False), (rag, "warm_up_error", None),
+                                    (rag, "load_index", mock.Mock(return_value=12)),
+                                    (rag.llm_service, "init_models", mock.Mock()),
+                                    (rag.llm_service, "embeddings", self.embeddings)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_not_ready_until_warmed_up(self):
+        response = self.client.get("/health/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()["status"], "warming_up")
+        self.assertEqual(self.client.get("/health").status_code, 200)
+
+        self.assertEqual(rag.warm_up(), 12)
+        self.assertEqual(rag.warm_up(), 0)
+        self.assertEqual(rag.load_index.call_count, 1)
+        self.embeddings.embed_query.assert_called_once()
+        self.assertEqual(self.client.get("/health/ready").status_code, 200)
+
+    def test_failed_warm_up_is_reported_and_retried(self):
+        rag.load_index.side_effect = [OSError("index unreadable"), 3]
+        with self.assertRaises(OSError):
+            rag.warm_up()
+        response = self.client.get("/health/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json(), {"status": "failed", "error": "index unreadable"})
+
+        self.assertEqual(rag.warm_up(), 3)
+        self.assertTrue(rag.is_ready())
+
+
+class TestLoadIndex(_IndexTestCase):
+    """Reopening a persisted index at startup."""
+
+    def test_restores_documents_and_lexical_index(self):
+        self._upload("manual.pdf", ["Install with make.", "Error E1234 means the disk is full."])
+        self._upload("notes.pdf", ["Release notes."])
+
+        with mock.patch.object(rag, "loaded_documents", []), \
+                mock.patch.object(rag, "vector_store", None), \
+                mock.patch.object(rag, "lexical_index", InvertedIndex()), \
+                mock.patch.object(rag, "LOAD_PAGE_SIZE", 2), \
+                mock.patch.object(rag.config, "chroma_persist_dir", str(self.directory)), \
+                mock.patch.object(rag, "_open_vector_store", return_value=self.store), \
+                mock.patch.object(rag.llm_service, "init_models"):
+            self.assertEqual(rag.load_index(), 3)
+            self.assertIs(rag.vector_store, self.store)
+            self.assertEqual(rag.loaded_documents, ["manual.pdf", "notes.pdf"])
+            hits = rag.lexical_index.search("E1234", 1)
+            self.assertEqual(self.store.rows[hits[0][0]][0], "Error E1234 means the disk is full.")
+
+    def test_without_persist_dir_nothing_is_opened(self):
+        with mock.patch.object(rag.config, "chroma_persist_dir", ""), \
+                mock.patch.object(rag, "_open_vector_store") as open_vector_store:
+            self.assertEqual(rag.load_index(), 0)
+        open_vector_store.assert_not_called()
+
+
+def _write_pdf(path, pages):
+    """Write a minimal PDF with one line of Helvetica text per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("latin-1")
+
+    body = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, content in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, content)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    Path(path).write_bytes(bytes(body))
+
+
+class TestIngest(unittest.TestCase):
+    """Streaming PDF parsing."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / "manual.pdf")
+        self.pages = [f"Page {page} explains step {page}." for page in range(7)]
+        _write_pdf(self.path, self.pages)
+        self.addCleanup(self._shut_down_pool)
+
+    def _shut_down_pool(self):
+        if ingest._executor is not None:
+            ingest._executor.shutdown()
+            ingest._executor = None
+
+    def _batches(self, workers):
+        with mock.patch.object(ingest.config, "ingest_workers", workers), \
+                mock.patch.object(ingest.config, "ingest_pages_per_task", 2):
+            return list(ingest.iter_chunk_batches(self.path, batch_size=3))
+
+    def test_chunks_come_out_in_page_order(self):
+        self.assertEqual(ingest.count_pages(self.path), 7)
+        for workers in (1, 2):
+            batches = self._batches(workers)
+            chunks = [chunk for _, batch in batches for chunk in batch]
+            self.assertEqual([chunk.page_content for chunk in chunks], self.pages)
+            self.assertEqual([chunk.metadata["page"] for chunk in chunks], list(range(7)))
+            self.assertEqual([len(batch) for _, batch in batches], [3, 3, 1])
+            self.assertEqual([pages for pages, _ in batches], [4, 6, 7])
+
+    def test_final_page_count_is_reported_without_text(self):
+        _write_pdf(self.path, ["", ""])
+        self.assertEqual(self._batches(1), [(2, [])])
+
+
+if __name__ == '__main__':
+    unittest.main()
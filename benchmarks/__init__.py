@@ -0,0 +1 @@
+"""Load tests for the three apps, run against local stand-ins for their upstreams."""
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Watson EmotionPredict and SentimentPredict endpoints.
+
+Responds with fixed, well-formed predictions after a configurable delay,
+and fails a configurable share of requests with 503s, so the analyzer
+apps can be load tested without network access. Latency and failures
+are drawn from a seeded generator, so a run is reproducible for a given
+request order.
+
+Usage:
+    python -m benchmarks.fake_watson [--port 9000] [--latency-ms 50]
+        [--jitter-ms 10] [--error-rate 0.01] [--seed 1]
+
+Point the apps at it with
+    EMOTION_API_URL=http://127.0.0.1:9000/EmotionPredict
+    WATSON_API_URL=http://127.0.0.1:9000/SentimentPredict
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMOTION_PREDICTION = {
+    'emotionPredictions': [{
+        'emotion': {'anger': 0.01, 'disgust': 0.01, 'fear': 0.02, 'joy': 0.9, 'sadness': 0.06}
+    }]
+}
+SENTIMENT_PREDICTION = {'documentSentiment': {'label': 'SENT_POSITIVE', 'score': 0.98}}
+
+
+@dataclass
+class Profile:
+    """Latency and error behaviour of the fake upstream."""
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    seed: int = 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):  # pylint: disable=invalid-name,missing-function-docstring
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            text = json.loads(self.rfile.read(length))['raw_document']['text']
+        except (ValueError, KeyError, TypeError):
+            text = ''
+
+        delay, fail = self.server.draw()
+        time.sleep(delay)
+
+        # Watson answers blank text with 400 (emotion) or 500 (sentiment)
+        if self.path.endswith('EmotionPredict'):
+            status, body = (400, {}) if not text.strip() else (200, EMOTION_PREDICTION)
+        elif self.path.endswith('SentimentPredict'):
+            status, body = (500, {}) if not text.strip() else (200, SENTIMENT_PREDICTION)
+        else:
+            status, body = 404, {}
+        if fail and status == 200:
+            status, body = 503, {'error': 'injected failure'}
+
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class FakeWatsonServer(ThreadingHTTPServer):
+    """Threaded HTTP server drawing latency and failures from a seeded generator."""
+    daemon_threads = True
+
+    def __init__(self, address, profile):
+        super().__init__(address, _Handler)
+        self.profile = profile
+        self._random = random.Random(profile.seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Return (delay in seconds, whether to fail) for the next request."""
+        with self._lock:
+            delay = self._random.gauss(self.profile.latency_ms, self.profile.jitter_ms)
+            fail = self._random.random() < self.profile.error_rate
+        return max(0.0, delay) / 1000, fail
+
+    @property
+    def base_url(self):
+        """URL prefix for the endpoints, e.g. http://127.0.0.1:9000"""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start(profile=None, host='127.0.0.1', port=0):
+    """Serve the fake upstream on a background thread; returns the server."""
+    server = FakeWatsonServer((host, port), profile or Profile())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    """Run the fake upstream in the foreground."""
+    parser = argparse.ArgumentParser(description='Local stand-in for the Watson NLP endpoints.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Mean response delay')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Standard deviation of the delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    profile = Profile(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    server = FakeWatsonServer((args.host, args.port), profile)
+    print(f'Fake Watson listening on {server.base_url} ({profile})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Closed-loop load test for the three apps against local upstream stand-ins.
+
+Each scenario starts its app in a fresh subprocess, pointed at the fake
+Watson server (benchmarks.fake_watson) or at the RAG app's fake LLM and
+embeddings (LLM_BACKEND=fake), warms it up, then keeps --concurrency
+requests in flight until --requests have completed. Latency percentiles,
+throughput, errors and the app's peak RSS are reported per scenario.
+
+Usage:
+    python -m benchmarks.load [emotion sentiment rag-document rag-message]
+        [--requests 500] [--concurrency 16] [--latency-ms 50]
+        [--output results.json] [--compare baseline.json]
+
+Inputs and upstream latency are seeded, and the JSON output records the
+git commit and every setting, so runs on different commits can be
+compared with --compare.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+from benchmarks import fake_watson
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# cwd, module exposing `app`, readiness path
+APPS = {
+    'emotion': ('Emotion_detection', 'server', '/'),
+    'sentiment': ('NLP_sentiment_analysis', 'flask_server', '/'),
+    'rag': ('RAG_document_assistant', 'app.main', '/health/ready'),
+}
+
+WORDS = ('the service returned error code timeout while the network cable was unplugged and '
+         'our team felt happy sad angry afraid about the quarterly results release notes '
+         'configure install restart database cache queue worker memory disk latency').split()
+
+# Metrics compared by --compare, with whether lower is better
+COMPARED = (('rps', False), ('p50_ms', True), ('p95_ms', True), ('p99_ms', True),
+            ('error_rate', True), ('peak_rss_mb', True))
+
+
+def make_texts(count, seed, words=12):
+    """Deterministic, distinct request texts."""
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(WORDS) for _ in range(words)) + f' #{i}' for i in range(count)]
+
+
+def make_pdf(pages):
+    """Build a minimal single-font PDF with one line of text per page."""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode())
+    font = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R '
+                       f'/Resources << /Font << /F1 {font} 0 R >> >> >>'.encode())
+        stream = f'BT /F1 10 Tf 36 720 Td ({text}) Tj ET'.encode()
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+    objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    out += f'trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF'.encode()
+    return out
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class AppProcess:
+    """One of the apps running in a subprocess on a free port."""
+
+    def __init__(self, name, env, workdir):
+        self.cwd, self.module, self.ready_path = APPS[name]
+        self.port = _free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self.log_path = Path(workdir) / f'{name}-{self.port}.log'
+        code = (f'from {self.module} import app; '
+                f'app.run(host="127.0.0.1", port={self.port}, threaded=True)')
+        with open(self.log_path, 'wb') as log:
+            self.process = subprocess.Popen(  # pylint: disable=consider-using-with
+                [sys.executable, '-c', code], cwd=ROOT / self.cwd,
+                env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+            )
+
+    def wait_ready(self, timeout):
+        """Poll the readiness path until it returns 200."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(self.base_url + self.ready_path, timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+        tail = self.log_path.read_text(errors='replace')[-2000:]
+        self.stop()
+        raise SystemExit(f'{self.module} did not become ready; log tail:\n{tail}')
+
+    def peak_rss_mb(self):
+        """High-water resident set size, from /proc (None where unavailable)."""
+        try:
+            with open(f'/proc/{self.process.pid}/status', encoding='ascii') as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        """Terminate the app."""
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def drive(send, count, concurrency):
+    """
+    Run send(session, index) for indices 0..count-1 from `concurrency`
+    threads, each starting its next request as soon as the last returns.
+    """
+    indices = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def worker():
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    index = next(indices)
+                if index >= count:
+                    return
+                started = time.perf_counter()
+                try:
+                    ok = send(session, index)
+                except (requests.RequestException, ValueError):
+                    ok = False
+                latencies.append((time.perf_counter() - started) * 1000)
+                if not ok:
+                    errors.append(index)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': count,
+        'errors': len(errors),
+        'error_rate': round(len(errors) / count, 4) if count else 0.0,
+        'seconds': round(elapsed, 3),
+        'rps': round(count / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(latencies[-1], 2),
+    }
+
+
+# Scenarios: each returns (app name, app env, setup(base_url) or None, send factory)
+
+def _emotion(args, upstream):
+    texts = make_texts(args.requests + args.warmup, args.seed)
+    env = {'EMOTION_API_URL': upstream + '/EmotionPredict', 'EMOTION_ENGINE': 'remote'}
+
+    def factory(base_url, offset):
+        def send(session, index):
+            response = session.get(base_url + '/emotionDetector',
+                                   params={'textToAnalyze': texts[(offset + index) % args.distinct]},
+                                   timeout=args.timeout)
+            return response.status_code == 200 and not response.json().get('error')
+        return send
+    return 'emotion', env, None, factory
+
+
+def _sentiment(args, upstream):
+    texts = make_texts(args.requests + args.warmup, args.seed)
+    env = {'WATSON_API_URL': upstream + '/SentimentPredict', 'WATSON_API_KEY': 'benchmark',
+           'SENTIMENT_BACKEND': 'watson'}
+
+    def factory(base_url, offset):
+        def send(session, index):
+            response = session.get(base_url + '/sentimentAnalyzer',
+                                   params={'textToAnalyze': texts[(offset + index) % args.distinct],
+                                           'format': 'json'},
+                                   timeout=args.timeout)
+            return response.status_code == 200
+        return send
+    return 'sentiment', env, None, factory
+
+
+def _rag_env(args):
+    return {'LLM_BACKEND': 'fake', 'CHROMA_PERSIST_DIR': '', 'WARMUP_MODE': 'background',
+            'UPLOAD_FOLDER': str(Path(args.workdir) / 'uploads'),
+            'EMBEDDING_CACHE_DIR': str(Path(args.workdir) / 'embedding_cache'),
+            'INGEST_QUEUE_SIZE': str(max(16, 2 * args.concurrency)),
+            'FAKE_LLM_TOKENS': str(args.llm_tokens), 'FAKE_LLM_TOKEN_MS': str(args.llm_token_ms)}
+
+
+def _upload(session, base_url, index, pages, timeout):
+    """Upload a generated document and wait for its job; True if it was indexed."""
+    rng = random.Random(index)
+    content = make_pdf([f'Document {index} page {page}: error code E{index:04d}{page:03d} '
+                        + ' '.join(rng.choice(WORDS) for _ in range(40)) for page in range(pages)])
+    response = session.post(base_url + '/process-document', timeout=timeout,
+                            files={'file': (f'bench-{index}.pdf', content, 'application/pdf')})
+    if response.status_code != 202:
+        return False
+    job_url = f"{base_url}/jobs/{response.json()['jobId']}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = session.get(job_url, timeout=timeout).json()
+        if job['status'] in ('done', 'failed'):
+            return job['status'] == 'done'
+        time.sleep(0.02)
+    return False
+
+
+def _rag_document(args, _upstream):
+    def factory(base_url, offset):
+        def send(session, index):
+            return _upload(session, base_url, offset + index, args.pages, args.timeout)
+        return send
+    return 'rag', _rag_env(args), None, factory
+
+
+# Document numbers used by rag-message, clear of those uploaded by rag-document
+DOCUMENT_BASE = 100000
+
+
+def _rag_message(args, _upstream):
+    def setup(base_url):
+        with requests.Session() as session:
+            for index in range(args.documents):
+                if not _upload(session, base_url, DOCUMENT_BASE + index, args.pages, args.timeout):
+                    raise SystemExit('Could not index the documents for rag-message')
+
+    def factory(base_url, offset):
+        def send(session, index):
+            number = (offset + index) % args.distinct
+            code = f'E{DOCUMENT_BASE + number % args.documents:04d}{number % args.pages:03d}'
+            response = session.post(base_url + '/process-message', timeout=args.timeout,
+                                    json={'userMessage': f'What does error code {code} mean? ({number})'})
+            return response.status_code == 200 and 'botResponse' in response.json()
+        return send
+    return 'rag', _rag_env(args), setup, factory
+
+
+SCENARIOS = {
+    'emotion': _emotion,
+    'sentiment': _sentiment,
+    'rag-document': _rag_document,
+    'rag-message': _rag_message,
+}
+
+
+def run_scenario(name, args, upstream):
+    """Start the scenario's app, warm it up, drive it and collect its stats."""
+    app_name, env, setup, factory = SCENARIOS[name](args, upstream)
+    env.update(args.env)
+    app = AppProcess(app_name, env, args.workdir)
+    try:
+        app.wait_ready(args.startup_timeout)
+        if setup:
+            setup(app.base_url)
+        if args.warmup:
+            drive(factory(app.base_url, args.requests), args.warmup, min(args.concurrency, args.warmup))
+        stats = drive(factory(app.base_url, 0), args.requests, args.concurrency)
+        stats['peak_rss_mb'] = app.peak_rss_mb()
+        return stats
+    finally:
+        app.stop()
+
+
+def _git(*command):
+    try:
+        return subprocess.run(['git', *command], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Describe the code and machine a run was made on."""
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def print_table(results):
+    """Print one row per scenario."""
+    print(f"{'scenario':<14} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'rss MB':>8}")
+    for name, stats in results.items():
+        rss = stats['peak_rss_mb'] if stats['peak_rss_mb'] is not None else float('nan')
+        print(f"{name:<14} {stats['rps']:>9.1f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['errors']:>7} {rss:>8.1f}")
+
+
+def print_comparison(baseline, results):
+    """Print the change in each metric against a previous run."""
+    print(f"\nvs {baseline['environment'].get('commit') or 'baseline'}")
+    if baseline.get('settings') != results.get('settings'):
+        print('warning: settings differ from the baseline run')
+    for name, stats in results['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if not old:
+            continue
+        changes = []
+        for metric, lower_is_better in COMPARED:
+            before, after = old.get(metric), stats.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            better = (change < 0) == lower_is_better
+            changes.append(f"{metric} {before:g} -> {after:g} ({change:+.1f}%{'' if better else ' worse'})")
+        print(f'{name:<14} ' + '; '.join(changes))
+
+
+def _key_value(text):
+    key, _, value = text.partition('=')
+    if not key:
+        raise argparse.ArgumentTypeError('expected KEY=VALUE')
+    return key, value
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--requests', type=int, default=500, help='Measured requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requests kept in flight')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests sent first')
+    parser.add_argument('--distinct', type=int, default=0,
+                        help='Distinct inputs to cycle through (default: one per request, i.e. no cache hits)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Fake Watson mean latency')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Fake Watson latency deviation')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fake Watson 503 rate')
+    parser.add_argument('--llm-tokens', type=int, default=50, help='Tokens per fake LLM answer')
+    parser.add_argument('--llm-token-ms', type=float, default=20.0, help='Fake LLM time per token')
+    parser.add_argument('--pages', type=int, default=4, help='Pages per generated RAG document')
+    parser.add_argument('--documents', type=int, default=8, help='Documents indexed before rag-message')
+    parser.add_argument('--env', type=_key_value, action='append', default=[],
+                        help='Extra KEY=VALUE setting for the apps (repeatable)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Results JSON of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = sorted(set(names) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    args.distinct = args.distinct or args.requests + args.warmup
+    args.env = dict(args.env)
+    profile = fake_watson.Profile(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ('scenarios', 'output', 'compare')}
+    settings['upstream'] = asdict(profile)
+
+    args.workdir = tempfile.mkdtemp(prefix='bench-')
+    upstream = fake_watson.start(profile)
+    results = {'environment': environment(), 'settings': settings, 'scenarios': {}}
+    try:
+        for name in names:
+            print(f'running {name} ...', file=sys.stderr)
+            results['scenarios'][name] = run_scenario(name, args, upstream.base_url)
+    finally:
+        upstream.shutdown()
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+    print_table(results['scenarios'])
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""Shared HTTP client layer for the Watson NLP analyzers."""
+from .aio import post_async
+from .cache import cache_stats, get_cache
+from .resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    breaker_stats,
+    call,
+    call_async,
+    get_breaker,
+    install_request_deadlines
+)
+from .session import get_session, post
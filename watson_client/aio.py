@@ -0,0 +1,75 @@
+"""
+Async HTTP client for the Watson NLP endpoints.
+
+All async calls run on one background event loop that owns a single
+httpx.AsyncClient, so the connection pool is shared no matter which
+event loop the caller is on. Callers often run a short-lived loop per
+call (asyncio.run), so a client per caller loop would open a new pool
+each time; the hop to the shared loop is the price of reusing
+connections.
+
+This is for asyncio callers, which can run many upstream calls
+concurrently (asyncio.gather) over one bounded pool. The Flask apps keep
+sync views: under WSGI an async view still holds its worker thread until
+it returns, so it would only add an event loop per request. Holding
+thousands of in-flight requests per process would need the routes
+served from an event loop by an ASGI framework such as Quart.
+"""
+import asyncio
+import os
+import threading
+
+import httpx
+
+from .session import MAX_RETRIES, POOL_MAXSIZE
+
+# Maximum concurrent upstream connections for async calls
+ASYNC_MAX_CONNECTIONS = int(os.getenv('WATSON_ASYNC_MAX_CONNECTIONS', '1000'))
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+
+
+def _get_loop():
+    """Get the shared event loop, starting its thread on first use."""
+    global _loop  # pylint: disable=global-statement
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name='watson-aio', daemon=True
+            ).start()
+    return _loop
+
+
+async def _post(url, kwargs):
+    """POST with the shared client (runs on the shared loop)."""
+    global _client  # pylint: disable=global-statement
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAXSIZE
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=MAX_RETRIES)
+        )
+    return await _client.post(url, **kwargs)
+
+
+async def post_async(url, **kwargs):
+    """
+    POST through the shared async connection pool.
+
+    Args:
+        url: Endpoint URL
+        **kwargs: Passed to httpx.AsyncClient.post (json, headers, timeout, ...)
+
+    Returns:
+        httpx.Response
+    """
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await _post(url, kwargs)
+    future = asyncio.run_coroutine_threadsafe(_post(url, kwargs), loop)
+    return await asyncio.wrap_future(future)
@@ -0,0 +1,343 @@
+"""
+Streaming bulk scoring of JSONL/CSV files.
+
+Records are read one at a time from a file or stdin, scored on a bounded
+thread pool and written to JSONL in input order as they complete. At most
+2 x concurrency records (or batches, with a batch scorer) are held at
+once, so memory stays constant and a slow upstream pauses reading
+instead of piling up work.
+
+Progress can be checkpointed: the checkpoint file holds the input byte
+offset after the last written record and the output file's size and
+identity at that point. A rerun with the same checkpoint seeks (or, on
+stdin, skips) past the scored input and truncates the output back to
+match, so every record is written exactly once. Runs are not resumed
+into stdout or into an output file that is not the one checkpointed.
+
+Each analyzer project wraps this in a bulk_score.py entry point.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+READ_CHUNK = 1 << 20
+
+
+class _LineReader:
+    """Reads lines from a binary stream, tracking the byte offset consumed."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+
+    def lines(self):
+        """Yield decoded lines, advancing position as each one is consumed."""
+        for line in iter(self.stream.readline, b''):
+            self.position += len(line)
+            yield line.decode('utf-8')
+
+    def skip_to(self, offset):
+        """Move forward to a byte offset, seeking if the stream allows it."""
+        if offset <= self.position:
+            return
+        if self.stream.seekable():
+            self.stream.seek(offset)
+        else:
+            remaining = offset - self.position
+            while remaining > 0:
+                chunk = self.stream.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        self.position = offset
+
+
+def iter_records(stream, fmt, text_field, offset=0):
+    """
+    Stream records from a JSONL or CSV byte stream.
+
+    Args:
+        stream: Binary file object
+        fmt: 'jsonl' or 'csv' (CSV needs a header row)
+        text_field: Field holding the text to score
+        offset: Byte offset to resume from
+
+    Yields:
+        (record dict, text or None, byte offset just past the record)
+    """
+    reader = _LineReader(stream)
+    lines = reader.lines()
+    if fmt == 'csv':
+        rows = csv.reader(lines)
+        header = next(rows, None)
+        if header is None:
+            return
+        reader.skip_to(offset)
+        for row in rows:
+            record = dict(zip(header, row))
+            yield record, record.get(text_field), reader.position
+        return
+
+    reader.skip_to(offset)
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield {'error': f'Invalid JSON: {error}'}, None, reader.position
+            continue
+        text = record.get(text_field) if isinstance(record, dict) else None
+        yield record if isinstance(record, dict) else {'value': record}, text, reader.position
+
+
+def _score(score, text, text_field):
+    """Score one text, turning failures into an error dict."""
+    if text is None:
+        return {'error': f"Missing '{text_field}' field"}
+    try:
+        return score(text)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return {'error': str(error)}
+
+
+def _score_batch(score_batch, texts, text_field):
+    """Score a batch of texts in one call, turning failures into error dicts."""
+    results = [{'error': f"Missing '{text_field}' field"} if text is None else None for text in texts]
+    indexes = [i for i, text in enumerate(texts) if text is not None]
+    if indexes:
+        try:
+            scored = score_batch([texts[i] for i in indexes])
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            scored = [{'error': str(error)} for _ in indexes]
+        for i, result in zip(indexes, scored):
+            results[i] = result
+    return results
+
+
+def _load_checkpoint(path):
+    """Read a checkpoint file, or start from scratch if there is none."""
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)
+    return {'input_offset': 0, 'output_offset': 0, 'records': 0}
+
+
+def _check_resume(state, output_path):
+    """
+    Make sure a checkpointed run can continue writing to output_path.
+
+    Raises:
+        ValueError: If resuming would duplicate output (stdout cannot be
+            truncated back to the checkpoint) or pad it with NULs (the file
+            is missing, shorter than checkpointed, or a different file)
+    """
+    if not state['records']:
+        return
+    if output_path == '-':
+        raise ValueError('Cannot resume a checkpointed run into stdout; write to a file with --output')
+    try:
+        stat = os.stat(output_path)
+    except FileNotFoundError:
+        raise ValueError(f'{output_path} does not exist; it cannot continue the checkpointed run') from None
+    # output_id is None for a run that wrote to stdout
+    if state.get('output_id', [stat.st_dev, stat.st_ino]) != [stat.st_dev, stat.st_ino]:
+        raise ValueError(f'{output_path} is not the output the checkpointed run was writing')
+    if stat.st_size < state['output_offset']:
+        raise ValueError(f'{output_path} is shorter ({stat.st_size} bytes) than the checkpoint '
+                         f"records ({state['output_offset']} bytes)")
+
+
+def _save_checkpoint(path, state):
+    """Atomically write a checkpoint file."""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(temporary, path)
+
+
+def _detect_format(path, fmt):
+    """Use the explicit format, or infer it from the file extension."""
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def run(score, input_path, output_path='-', fmt=None, text_field='text', result_field='result',
+        concurrency=8, checkpoint_path=None, checkpoint_every=1000, progress_every=5.0,
+        limit=None, log=sys.stderr, score_batch=None, batch_size=32):
+    """
+    Score a file of records, writing JSONL results incrementally.
+
+    Args:
+        score: Function taking a text and returning a result dict
+        input_path: JSONL/CSV file, or '-' for stdin
+        output_path: JSONL file, or '-' for stdout
+        fmt: 'jsonl' or 'csv'; inferred from input_path when None
+        text_field: Input field holding the text
+        result_field: Output field the result is stored under
+        concurrency: Maximum concurrent score() calls
+        checkpoint_path: File to resume from and record progress in
+        checkpoint_every: Records between checkpoints
+        progress_every: Seconds between progress reports
+        limit: Stop after this many records (in this run)
+        log: Stream for progress reports
+        score_batch: Optional function taking a list of texts and returning
+            one result dict per text; when given, records are scored
+            batch_size at a time with it instead of one by one with score
+        batch_size: Records per score_batch call
+
+    Returns:
+        dict with records, errors, seconds and records_per_second for this run
+
+    Raises:
+        ValueError: If the checkpoint cannot be resumed into output_path
+    """
+    state = _load_checkpoint(checkpoint_path)
+    _check_resume(state, output_path)
+    fmt = _detect_format(input_path, fmt)
+
+    source = sys.stdin.buffer if input_path == '-' else open(input_path, 'rb')
+    if output_path == '-':
+        sink = sys.stdout.buffer
+    else:
+        sink = open(output_path, 'a+b')
+        # Drop results written after the last checkpoint; they are rescored
+        sink.truncate(state['output_offset'] if checkpoint_path else 0)
+
+    records = errors = 0
+    started = last_report = time.monotonic()
+
+    def report(final=False):
+        elapsed = time.monotonic() - started
+        rate = records / elapsed if elapsed > 0 else 0.0
+        prefix = 'Done' if final else 'Progress'
+        print(f'{prefix}: {state["records"]} records total, {records} this run, '
+              f'{rate:.1f} records/s, {errors} errors', file=log, flush=True)
+        return rate
+
+    def checkpoint():
+        sink.flush()
+        if checkpoint_path:
+            if output_path == '-':
+                state['output_id'] = None
+            else:
+                stat = os.fstat(sink.fileno())
+                state['output_id'] = [stat.st_dev, stat.st_ino]
+                state['output_offset'] = sink.tell()
+            _save_checkpoint(checkpoint_path, state)
+
+    # (future returning a list of results, [(record, end offset), ...]) per submitted batch
+    window = deque()
+
+    def write_oldest():
+        nonlocal records, errors, last_report
+        future, batch = window.popleft()
+        for (record, end), result in zip(batch, future.result()):
+            errors += 'error' in result
+            sink.write((json.dumps(dict(record, **{result_field: result})) + '\n').encode('utf-8'))
+            records += 1
+            state['records'] += 1
+            state['input_offset'] = end
+            if records % checkpoint_every == 0:
+                checkpoint()
+            if time.monotonic() - last_report >= progress_every:
+                last_report = time.monotonic()
+                report()
+
+    if score_batch is None:
+        batch_size = 1
+
+        def score_texts(texts):
+            return [_score(score, texts[0], text_field)]
+    else:
+        def score_texts(texts):
+            return _score_batch(score_batch, texts, text_field)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk') as executor:
+            batch, texts = [], []
+
+            def submit():
+                if len(window) >= 2 * concurrency:
+                    write_oldest()
+                window.append((executor.submit(score_texts, texts), batch))
+
+            for read, (record, text, end) in enumerate(
+                    iter_records(source, fmt, text_field, state['input_offset'])):
+                if limit is not None and read >= limit:
+                    break
+                batch.append((record, end))
+                texts.append(text)
+                if len(batch) >= batch_size:
+                    submit()
+                    batch, texts = [], []
+            if batch:
+                submit()
+            while window:
+                write_oldest()
+    finally:
+        checkpoint()
+        if source is not sys.stdin.buffer:
+            source.close()
+        if sink is not sys.stdout.buffer:
+            sink.close()
+
+    elapsed = time.monotonic() - started
+    return {
+        'records': records,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'records_per_second': round(report(final=True), 1)
+    }
+
+
+def main(score, result_field, argv=None, score_batch=None):
+    """
+    Command-line entry point.
+
+    Args:
+        score: Function taking a text and returning a result dict
+        result_field: Output field the result is stored under
+        argv: Arguments (defaults to sys.argv[1:])
+        score_batch: Optional batch scorer (see run()); enables --batch-size
+    """
+    parser = argparse.ArgumentParser(
+        description=f'Stream JSONL/CSV records through the {result_field} analyzer.'
+    )
+    parser.add_argument('input', help="JSONL or CSV file, or '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file (default: stdout)")
+    parser.add_argument('--format', choices=('jsonl', 'csv'),
+                        help='Input format (default: from the file extension, else jsonl)')
+    parser.add_argument('--text-field', default='text', help='Field holding the text (default: text)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Maximum concurrent analyzer calls (default: 8)')
+    parser.add_argument('--checkpoint', help='Checkpoint file for resuming an interrupted run')
+    parser.add_argument('--checkpoint-every', type=int, default=1000,
+                        help='Records between checkpoints (default: 1000)')
+    parser.add_argument('--progress-every', type=float, default=5.0,
+                        help='Seconds between progress reports (default: 5)')
+    parser.add_argument('--limit', type=int, help='Stop after this many records')
+    if score_batch is not None:
+        parser.add_argument('--batch-size', type=int, default=32,
+                            help='Records per analyzer call (default: 32)')
+    args = parser.parse_args(argv)
+
+    try:
+        run(score, args.input, args.output, fmt=args.format, text_field=args.text_field,
+            result_field=result_field, concurrency=args.concurrency,
+            checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every,
+            progress_every=args.progress_every, limit=args.limit,
+            score_batch=score_batch, batch_size=getattr(args, 'batch_size', 1))
+    except KeyboardInterrupt:
+        print('Interrupted; rerun with the same --checkpoint to resume.', file=sys.stderr)
+        return 130
+    except ValueError as error:
+        print(f'Error: {error}', file=sys.stderr)
+        return 2
+    return 0
@@ -0,0 +1,210 @@
+"""
+Result cache for Watson NLP predictions.
+
+Results are keyed by (model id, hash of the whitespace-normalized text).
+An in-process LRU with a TTL answers most repeats; an optional SQLite
+tier (WATSON_CACHE_DB) lets several server processes share hits.
+"Invalid input" outcomes are cached too, with a shorter TTL.
+
+Every WATSON_CACHE_DB_PURGE_EVERY writes, a process deletes the expired
+SQLite rows and, past WATSON_CACHE_DB_MAX_ROWS, the rows closest to
+expiring, so the file stops growing.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_ENABLED = os.getenv('WATSON_CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_SIZE = int(os.getenv('WATSON_CACHE_SIZE', '10000'))
+CACHE_TTL = float(os.getenv('WATSON_CACHE_TTL', '3600'))
+CACHE_NEGATIVE_TTL = float(os.getenv('WATSON_CACHE_NEGATIVE_TTL', '300'))
+# Path of a SQLite file shared between processes (empty disables the tier)
+CACHE_DB = os.getenv('WATSON_CACHE_DB', '')
+CACHE_DB_PURGE_EVERY = int(os.getenv('WATSON_CACHE_DB_PURGE_EVERY', '1000'))
+# 0 means no row limit (expired rows are still purged)
+CACHE_DB_MAX_ROWS = int(os.getenv('WATSON_CACHE_DB_MAX_ROWS', '100000'))
+
+
+def cache_key(model_id, text):
+    """Hash a model id and normalized text into a cache key."""
+    normalized = ' '.join((text or '').split())
+    return hashlib.sha256(f'{model_id}\0{normalized}'.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional SQLite) TTL cache of prediction results."""
+
+    def __init__(self, max_size, ttl, negative_ttl, db_path='',
+                 purge_every=CACHE_DB_PURGE_EVERY, max_rows=CACHE_DB_MAX_ROWS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.db_path = db_path
+        self.purge_every = purge_every
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self._counts = {'memory_hits': 0, 'disk_hits': 0, 'negative_hits': 0, 'misses': 0,
+                        'rows_purged': 0}
+        if db_path:
+            self._db().execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, negative INTEGER NOT NULL, '
+                'expires REAL NOT NULL)'
+            )
+            self._db().execute('CREATE INDEX IF NOT EXISTS results_expires ON results (expires)')
+
+    def _db(self):
+        """Get this thread's SQLite connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, model_id, text):
+        """
+        Look up a cached result.
+
+        Returns:
+            A copy of the cached result dictionary, or None on a miss
+        """
+        key = cache_key(model_id, text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counts['memory_hits'] += 1
+                if entry[2]:
+                    self._counts['negative_hits'] += 1
+                return dict(entry[1])
+
+        if self.db_path:
+            row = self._db().execute(
+                'SELECT value, negative, expires FROM results WHERE key = ? AND expires > ?',
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                value, negative, expires = json.loads(row[0]), bool(row[1]), row[2]
+                self._remember(key, value, negative, expires)
+                self._count('disk_hits')
+                if negative:
+                    self._count('negative_hits')
+                return dict(value)
+
+        self._count('misses')
+        return None
+
+    def set(self, model_id, text, result, negative=False):
+        """
+        Cache a result.
+
+        Args:
+            model_id: Watson model id
+            text: Analyzed text
+            result: Result dictionary
+            negative: True for "invalid input" outcomes (cached for negative_ttl)
+        """
+        key = cache_key(model_id, text)
+        expires = time.time() + (self.negative_ttl if negative else self.ttl)
+        self._remember(key, dict(result), negative, expires)
+        if self.db_path:
+            self._db().execute(
+                'INSERT OR REPLACE INTO results (key, value, negative, expires) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(result), int(negative), expires)
+            )
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % self.purge_every == 0
+            if purge:
+                self.purge()
+
+    def purge(self):
+        """
+        Delete expired SQLite rows, then the rows closest to expiring while
+        there are more than max_rows.
+
+        Returns:
+            Number of rows deleted
+        """
+        if not self.db_path:
+            return 0
+        db = self._db()
+        deleted = db.execute('DELETE FROM results WHERE expires <= ?', (time.time(),)).rowcount
+        if self.max_rows:
+            excess = db.execute('SELECT COUNT(*) FROM results').fetchone()[0] - self.max_rows
+            if excess > 0:
+                deleted += db.execute(
+                    'DELETE FROM results WHERE key IN '
+                    '(SELECT key FROM results ORDER BY expires LIMIT ?)',
+                    (excess,)
+                ).rowcount
+        with self._lock:
+            self._counts['rows_purged'] += deleted
+        return deleted
+
+    def _remember(self, key, value, negative, expires):
+        """Store an entry in the memory tier, evicting the least recently used."""
+        with self._lock:
+            self._entries[key] = (expires, value, negative)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            self._db().execute('DELETE FROM results')
+
+    def stats(self):
+        """Get entry count, hit/miss counters and hit rate."""
+        with self._lock:
+            counts = dict(self._counts)
+            counts['size'] = len(self._entries)
+        lookups = counts['memory_hits'] + counts['disk_hits'] + counts['misses']
+        hits = counts['memory_hits'] + counts['disk_hits']
+        counts['hit_rate'] = round(hits / lookups, 3) if lookups else 0.0
+        return counts
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Get the process-wide result cache.
+
+    Returns:
+        ResultCache, or None if WATSON_CACHE_ENABLED is false
+    """
+    global _cache  # pylint: disable=global-statement
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(CACHE_SIZE, CACHE_TTL, CACHE_NEGATIVE_TTL, CACHE_DB)
+    return _cache
+
+
+def cache_stats():
+    """Get the result cache counters (empty if caching is disabled)."""
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
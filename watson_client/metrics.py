@@ -0,0 +1,139 @@
+"""
+Prometheus metrics for the Watson analyzer apps.
+
+init_app() adds per-route request latency and status counts and a
+/metrics endpoint to a Flask app. Upstream calls made through
+resilience.call() are timed per endpoint and outcome. Cache, circuit
+breaker and connection pool figures are read from their existing stats
+only when /metrics is scraped, so the hot path pays for nothing but a
+histogram observation per request.
+"""
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, ProcessCollector, generate_latest
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Not prometheus_client's global REGISTRY, which rejects a second registration of
+# the same name (the RAG app's metrics can be imported in the same process)
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['method', 'route'], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route and status',
+    ['method', 'route', 'status'], registry=REGISTRY
+)
+UPSTREAM_LATENCY = Histogram(
+    'watson_upstream_request_duration_seconds', 'Watson call latency by endpoint and outcome',
+    ['endpoint', 'outcome'], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+
+BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+def observe_upstream(endpoint, outcome, seconds):
+    """Record one upstream call ('success', 'error' or 'rejected')."""
+    UPSTREAM_LATENCY.labels(endpoint, outcome).observe(seconds)
+
+
+def _pool_stats():
+    """Yield (host, connections checked out, idle open connections) per shared pool."""
+    from .session import open_sessions  # pylint: disable=import-outside-toplevel
+
+    adapters = {id(adapter): adapter for session in open_sessions() for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            # The queue holds idle connections plus None placeholders for unopened slots
+            idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+            yield pool.host, pool.pool.maxsize - pool.pool.qsize(), idle
+
+
+class _StatsCollector:
+    """Exposes cache, breaker and pool stats as gauges at scrape time."""
+
+    def collect(self):  # pylint: disable=missing-function-docstring
+        from .cache import cache_stats  # pylint: disable=import-outside-toplevel
+        from .resilience import breaker_stats  # pylint: disable=import-outside-toplevel
+
+        stats = cache_stats()
+        if stats:
+            lookups = CounterMetricFamily('watson_cache_lookups', 'Result cache lookups by outcome',
+                                          labels=['outcome'])
+            for outcome in ('memory_hits', 'disk_hits', 'negative_hits', 'misses'):
+                lookups.add_metric([outcome], stats[outcome])
+            yield lookups
+            yield GaugeMetricFamily('watson_cache_entries', 'Entries in the memory cache tier',
+                                    value=stats['size'])
+
+        state = GaugeMetricFamily('watson_breaker_state', 'Breaker state (0 closed, 1 half open, 2 open)',
+                                  labels=['endpoint'])
+        error_rate = GaugeMetricFamily('watson_breaker_error_rate', 'Rolling error rate',
+                                       labels=['endpoint'])
+        hedges = CounterMetricFamily('watson_hedged_requests', 'Hedged duplicate requests sent',
+                                     labels=['endpoint'])
+        for endpoint, breaker in breaker_stats().items():
+            state.add_metric([endpoint], BREAKER_STATES[breaker['state']])
+            error_rate.add_metric([endpoint], breaker['window']['error_rate'])
+            hedges.add_metric([endpoint], breaker['hedged'])
+        yield state
+        yield error_rate
+        yield hedges
+
+        connections = GaugeMetricFamily('watson_pool_connections', 'Pooled connections by host',
+                                        labels=['host', 'state'])
+        totals = {}
+        for host, in_use, idle in _pool_stats():
+            counts = totals.setdefault(host, [0, 0])
+            counts[0] += in_use
+            counts[1] += idle
+        for host, (in_use, idle) in totals.items():
+            connections.add_metric([host, 'idle'], idle)
+            connections.add_metric([host, 'in_use'], in_use)
+        yield connections
+
+
+_collector = None
+
+
+def init_app(app):
+    """
+    Instrument a Flask app and add a /metrics endpoint.
+
+    Args:
+        app: Flask application
+    """
+    global _collector  # pylint: disable=global-statement
+    from flask import Response, g, request  # pylint: disable=import-outside-toplevel
+
+    if _collector is None:
+        _collector = _StatsCollector()
+        REGISTRY.register(_collector)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+            REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Serve metrics in the Prometheus text format."""
+        return Response(generate_latest(REGISTRY), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,510 @@
+"""
+Resilience layer for the Watson NLP endpoints.
+
+Every call made through call()/call_async() is guarded per endpoint:
+
+- Circuit breaker: rolling latency and error rate are kept over the last
+  WATSON_WINDOW_SECONDS. The breaker opens after WATSON_BREAKER_FAILURES
+  consecutive failures, or once the error rate over at least
+  WATSON_BREAKER_MIN_CALLS calls reaches WATSON_BREAKER_ERROR_RATE. While
+  open, calls fail fast with CircuitOpenError. After WATSON_BREAKER_RESET
+  seconds one probe call is let through; its outcome closes the breaker
+  again or re-opens it.
+- Hedging: if a call is still running after the endpoint's rolling p95
+  latency, a duplicate request is sent and whichever answers first wins.
+  Hedges are capped at WATSON_HEDGE_MAX_RATIO of recent calls, and sync
+  calls are not hedged while the hedging thread pool is busy.
+- Deadlines: a deadline set for the current request (for example from the
+  client's X-Request-Timeout-Ms header) caps every upstream timeout, so
+  we never wait longer than the client will, including time spent queued
+  for a hedging thread. Sync calls under a deadline are not retried.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from .aio import post_async
+from .metrics import observe_upstream
+from .session import POOL_MAXSIZE, post
+
+BREAKER_FAILURES = int(os.getenv('WATSON_BREAKER_FAILURES', '5'))
+BREAKER_RESET = float(os.getenv('WATSON_BREAKER_RESET', '30'))
+BREAKER_ERROR_RATE = float(os.getenv('WATSON_BREAKER_ERROR_RATE', '0.5'))
+BREAKER_MIN_CALLS = int(os.getenv('WATSON_BREAKER_MIN_CALLS', '20'))
+# Rolling window for latency and error-rate statistics
+WINDOW_SECONDS = float(os.getenv('WATSON_WINDOW_SECONDS', '60'))
+WINDOW_SIZE = int(os.getenv('WATSON_WINDOW_SIZE', '500'))
+
+HEDGE_ENABLED = os.getenv('WATSON_HEDGE_ENABLED', 'true').lower() == 'true'
+# Successful calls needed in the window before the p95 is trusted for hedging
+HEDGE_MIN_SAMPLES = int(os.getenv('WATSON_HEDGE_MIN_SAMPLES', '20'))
+HEDGE_MIN_DELAY = float(os.getenv('WATSON_HEDGE_MIN_DELAY', '0.05'))
+HEDGE_MAX_RATIO = float(os.getenv('WATSON_HEDGE_MAX_RATIO', '0.1'))
+
+DEADLINE_HEADER = os.getenv('WATSON_DEADLINE_HEADER', 'X-Request-Timeout-Ms')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the endpoint's breaker is open."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request's deadline, or a call's timeout, passes before an answer."""
+
+
+class CircuitBreaker:
+    """Circuit breaker with rolling latency/error statistics and a hedging budget."""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET,
+                 error_rate=BREAKER_ERROR_RATE, min_calls=BREAKER_MIN_CALLS,
+                 window_seconds=WINDOW_SECONDS, window_size=WINDOW_SIZE):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        # (time, latency seconds, succeeded) per call, and times of hedges sent
+        self._samples = deque(maxlen=window_size)
+        self._hedges = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._counts = {
+            'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0,
+            'hedged': 0, 'hedge_wins': 0
+        }
+
+    @property
+    def state(self):
+        """Current state: 'closed', 'open' or 'half_open'."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def _trim(self, now):
+        """Drop samples older than the window (caller holds _lock)."""
+        horizon = now - self.window_seconds
+        while self._samples and self._samples[0][0] < horizon:
+            self._samples.popleft()
+        while self._hedges and self._hedges[0] < horizon:
+            self._hedges.popleft()
+
+    def allow(self):
+        """
+        Check whether a call may go ahead.
+
+        Returns:
+            True if the call should be made; the caller must then report
+            its outcome with record_success() or record_failure()
+        """
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._counts['rejected'] += 1
+            return False
+
+    def record_success(self, latency=None):
+        """Report a successful call and its latency in seconds."""
+        now = time.monotonic()
+        with self._lock:
+            self._counts['successes'] += 1
+            self._failures = 0
+            if self._state != CLOSED:
+                # Recovered: failures from before the outage no longer count
+                self._samples.clear()
+            self._state = CLOSED
+            self._probing = False
+            if latency is not None:
+                self._samples.append((now, latency, True))
+
+    def record_failure(self, latency=None):
+        """Report a failed call, opening the breaker if the thresholds are crossed."""
+        now = time.monotonic()
+        with self._lock:
+            self._counts['failures'] += 1
+            self._failures += 1
+            self._samples.append((now, latency, False))
+            self._trim(now)
+            errors = sum(1 for sample in self._samples if not sample[2])
+            too_many_errors = (len(self._samples) >= self.min_calls
+                               and errors / len(self._samples) >= self.error_rate)
+            if (self._state == HALF_OPEN or self._failures >= self.failure_threshold
+                    or too_many_errors):
+                if self._state != OPEN:
+                    self._counts['opened'] += 1
+                self._state = OPEN
+                self._opened_at = now
+                self._probing = False
+
+    def _latencies(self):
+        """Sorted latencies of successful calls in the window (caller holds _lock)."""
+        self._trim(time.monotonic())
+        return sorted(sample[1] for sample in self._samples if sample[2])
+
+    def hedge_delay(self):
+        """
+        Get how long to wait before hedging a call.
+
+        Returns:
+            The rolling p95 latency in seconds, or None if hedging is off or
+            there are too few samples to estimate it
+        """
+        if not HEDGE_ENABLED:
+            return None
+        with self._lock:
+            latencies = self._latencies()
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, latencies[int(0.95 * (len(latencies) - 1))])
+
+    def try_hedge(self):
+        """Reserve a hedge from the budget, returning False if it is spent."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._hedges) >= HEDGE_MAX_RATIO * len(self._samples):
+                return False
+            self._hedges.append(now)
+            self._counts['hedged'] += 1
+            return True
+
+    def record_hedge_win(self):
+        """Report that a hedged duplicate answered before the original request."""
+        with self._lock:
+            self._counts['hedge_wins'] += 1
+
+    def stats(self):
+        """Get the breaker state, call counters and rolling window figures."""
+        state = self.state
+        with self._lock:
+            latencies = self._latencies()
+            calls = len(self._samples)
+            errors = sum(1 for sample in self._samples if not sample[2])
+            stats = dict(self._counts, state=state, consecutive_failures=self._failures)
+
+        def percentile_ms(q):
+            return round(latencies[int(q * (len(latencies) - 1))] * 1000, 1) if latencies else None
+
+        stats['window'] = {
+            'calls': calls,
+            'error_rate': round(errors / calls, 3) if calls else 0.0,
+            'p50_ms': percentile_ms(0.5),
+            'p95_ms': percentile_ms(0.95)
+        }
+        return stats
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Get the process-wide breaker for an endpoint, creating it on first use."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_stats():
+    """Get stats for every breaker, keyed by endpoint name."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+_deadline = contextvars.ContextVar('watson_deadline', default=None)
+
+
+def set_deadline(seconds):
+    """
+    Set a deadline for the current context, `seconds` from now.
+
+    An earlier deadline that is already set is kept.
+
+    Returns:
+        Token for reset_deadline()
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None and current < deadline:
+        deadline = current
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token):
+    """Restore the deadline that was in place before set_deadline()."""
+    _deadline.reset(token)
+
+
+def remaining():
+    """Get the seconds left until the current deadline, or None if none is set."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def bounded_timeout(timeout):
+    """
+    Cap a timeout at the time left until the current deadline.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded('Request deadline exceeded before calling upstream')
+    return min(timeout, left)
+
+
+def install_request_deadlines(app, header=DEADLINE_HEADER):
+    """
+    Take each Flask request's deadline from a header holding milliseconds.
+
+    Args:
+        app: Flask application
+        header: Request header with the client's remaining timeout in ms
+    """
+    from flask import g, request  # pylint: disable=import-outside-toplevel
+
+    @app.before_request
+    def _start_deadline():
+        try:
+            milliseconds = float(request.headers[header])
+        except (KeyError, ValueError):
+            return
+        g.watson_deadline_token = set_deadline(milliseconds / 1000)
+
+    @app.teardown_request
+    def _end_deadline(_error):
+        token = g.pop('watson_deadline_token', None)
+        if token is not None:
+            reset_deadline(token)
+
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+# Sync calls running or queued on the hedge executor
+_hedge_in_flight = 0
+HEDGE_WORKERS = 2 * POOL_MAXSIZE
+
+
+def _get_hedge_executor():
+    """Get the thread pool that runs hedgeable sync calls and their duplicates."""
+    global _hedge_executor  # pylint: disable=global-statement
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=HEDGE_WORKERS,
+                thread_name_prefix='watson-hedge'
+            )
+    return _hedge_executor
+
+
+def _reserve_hedge_thread():
+    """Reserve a hedge executor thread, returning False if all are busy."""
+    global _hedge_in_flight  # pylint: disable=global-statement
+    with _hedge_executor_lock:
+        if _hedge_in_flight >= HEDGE_WORKERS:
+            return False
+        _hedge_in_flight += 1
+        return True
+
+
+def _release_hedge_thread(_future):
+    """Release a thread reserved with _reserve_hedge_thread()."""
+    global _hedge_in_flight  # pylint: disable=global-statement
+    with _hedge_executor_lock:
+        _hedge_in_flight -= 1
+
+
+def _submit_post(url, timeout, kwargs):
+    """Run post() on the hedge executor (a thread must have been reserved)."""
+    future = _get_hedge_executor().submit(post, url, timeout=timeout, **kwargs)
+    future.add_done_callback(_release_hedge_thread)
+    return future
+
+
+def _await_post(future, expires, timeout):
+    """Wait for a submitted post() until `expires` (monotonic time)."""
+    try:
+        return future.result(timeout=max(0.0, expires - time.monotonic()))
+    except FutureTimeoutError:
+        future.cancel()
+        raise DeadlineExceeded(f'No answer within {timeout:.2f}s') from None
+
+
+def _failed(response, ok_statuses):
+    """Check whether a response is a 5xx that the endpoint does not use as an answer."""
+    return response.status_code >= 500 and response.status_code not in ok_statuses
+
+
+def _succeeded(future, ok_statuses):
+    """Check whether a finished call returned a response that is not a failure."""
+    return future.exception() is None and not _failed(future.result(), ok_statuses)
+
+
+def _record(breaker, response, started, ok_statuses):
+    """Feed a call's outcome to its breaker and metrics."""
+    latency = time.monotonic() - started
+    if _failed(response, ok_statuses):
+        breaker.record_failure(latency)
+        observe_upstream(breaker.name, 'error', latency)
+    else:
+        breaker.record_success(latency)
+        observe_upstream(breaker.name, 'success', latency)
+
+
+def _record_error(breaker, started):
+    """Feed a call that raised to its breaker and metrics."""
+    latency = time.monotonic() - started
+    breaker.record_failure(latency)
+    observe_upstream(breaker.name, 'error', latency)
+
+
+def _hedged_post(breaker, url, timeout, kwargs, ok_statuses):
+    """
+    POST, sending a duplicate if the first attempt outlives the p95 latency.
+
+    Every wait is bounded by `timeout` (already capped by the request
+    deadline). When the hedging pool is busy the call runs in the caller's
+    thread without a hedge rather than queueing for a worker. Under a
+    deadline each request is a single attempt, since the adapter's
+    retries and backoff would run past it.
+    """
+    kwargs = dict(kwargs, retries=remaining() is None)
+    delay = breaker.hedge_delay()
+    if delay is None or delay >= timeout or not _reserve_hedge_thread():
+        return post(url, timeout=timeout, **kwargs)
+
+    expires = time.monotonic() + timeout
+    primary = _submit_post(url, timeout, kwargs)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+    if not _reserve_hedge_thread():
+        return _await_post(primary, expires, timeout)
+    if not breaker.try_hedge():
+        _release_hedge_thread(None)
+        return _await_post(primary, expires, timeout)
+
+    hedge = _submit_post(url, expires - time.monotonic(), kwargs)
+    pending = {primary, hedge}
+    while True:
+        done, pending = wait(pending, timeout=max(0.0, expires - time.monotonic()),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            for future in pending:
+                future.cancel()
+            raise DeadlineExceeded(f'No answer within {timeout:.2f}s')
+        for future in done:
+            if _succeeded(future, ok_statuses) or not pending:
+                if future is hedge and _succeeded(future, ok_statuses):
+                    breaker.record_hedge_win()
+                return future.result()
+
+
+async def _hedged_post_async(breaker, url, timeout, kwargs, ok_statuses):
+    """Async _hedged_post; the losing request is cancelled."""
+    delay = breaker.hedge_delay()
+    if delay is None or delay >= timeout:
+        return await post_async(url, timeout=timeout, **kwargs)
+
+    started = time.monotonic()
+    primary = asyncio.ensure_future(post_async(url, timeout=timeout, **kwargs))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done or not breaker.try_hedge():
+        return await primary
+
+    hedge = asyncio.ensure_future(
+        post_async(url, timeout=timeout - (time.monotonic() - started), **kwargs)
+    )
+    pending = {primary, hedge}
+    try:
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if _succeeded(future, ok_statuses) or not pending:
+                    if future is hedge and _succeeded(future, ok_statuses):
+                        breaker.record_hedge_win()
+                    return future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def call(endpoint, url, timeout, ok_statuses=(), **kwargs):
+    """
+    POST to a Watson endpoint with circuit breaking, hedging and deadlines.
+
+    Args:
+        endpoint: Name the breaker and statistics are kept under
+        url: Endpoint URL
+        timeout: Timeout in seconds, capped by the current deadline
+        ok_statuses: 5xx statuses the endpoint answers with for bad input,
+            which do not count as breaker failures
+        **kwargs: Passed to requests.Session.post (json, headers, ...)
+
+    Returns:
+        requests.Response
+
+    Raises:
+        CircuitOpenError: If the endpoint's breaker is open
+        DeadlineExceeded: If the current deadline has passed
+    """
+    breaker = get_breaker(endpoint)
+    timeout = bounded_timeout(timeout)
+    if not breaker.allow():
+        observe_upstream(endpoint, 'rejected', 0.0)
+        raise CircuitOpenError(f"Circuit for '{endpoint}' is open")
+    started = time.monotonic()
+    try:
+        response = _hedged_post(breaker, url, timeout, kwargs, ok_statuses)
+    except Exception:
+        _record_error(breaker, started)
+        raise
+    _record(breaker, response, started, ok_statuses)
+    return response
+
+
+async def call_async(endpoint, url, timeout, ok_statuses=(), **kwargs):
+    """
+    Async variant of call() using the shared async connection pool.
+
+    Returns:
+        httpx.Response
+    """
+    breaker = get_breaker(endpoint)
+    timeout = bounded_timeout(timeout)
+    if not breaker.allow():
+        observe_upstream(endpoint, 'rejected', 0.0)
+        raise CircuitOpenError(f"Circuit for '{endpoint}' is open")
+    started = time.monotonic()
+    try:
+        response = await _hedged_post_async(breaker, url, timeout, kwargs, ok_statuses)
+    except Exception:
+        _record_error(breaker, started)
+        raise
+    _record(breaker, response, started, ok_statuses)
+    return response
@@ -0,0 +1,88 @@
+"""
+Pooled keep-alive HTTP session for calls to the Watson NLP endpoints.
+
+Reusing one requests.Session keeps TCP+TLS connections open between
+predictions instead of handshaking on every call.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Number of hosts to keep connection pools for
+POOL_CONNECTIONS = int(os.getenv('WATSON_POOL_CONNECTIONS', '4'))
+# Maximum open connections per host
+POOL_MAXSIZE = int(os.getenv('WATSON_POOL_MAXSIZE', '20'))
+# Wait for a free connection instead of opening extra ones past POOL_MAXSIZE
+POOL_BLOCK = os.getenv('WATSON_POOL_BLOCK', 'true').lower() == 'true'
+# Retries on connection errors and 502/503/504, with exponential backoff
+MAX_RETRIES = int(os.getenv('WATSON_MAX_RETRIES', '2'))
+BACKOFF_FACTOR = float(os.getenv('WATSON_BACKOFF_FACTOR', '0.3'))
+
+# Sessions by whether their adapter retries
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _build_session(retries):
+    """Create a session with a pooled adapter, retrying if `retries` is set."""
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'POST'}),
+        raise_on_status=False
+    ) if retries else 0
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=POOL_BLOCK,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(retries=True):
+    """
+    Get a process-wide session, creating it on first use.
+
+    Args:
+        retries: False for a session that makes one attempt per call, for
+            callers with a deadline that backoff and retries could overrun
+
+    Returns:
+        requests.Session shared by all analyzers and threads
+    """
+    session = _sessions.get(retries)
+    if session is None:
+        with _lock:
+            session = _sessions.get(retries)
+            if session is None:
+                session = _sessions[retries] = _build_session(retries)
+    return session
+
+
+def open_sessions():
+    """Get the sessions created so far."""
+    with _lock:
+        return list(_sessions.values())
+
+
+def post(url, retries=True, **kwargs):
+    """
+    POST through a shared session.
+
+    Args:
+        url: Endpoint URL
+        retries: Retry connection errors and 502/503/504 with backoff
+        **kwargs: Passed to requests.Session.post (json, headers, timeout, ...)
+
+    Returns:
+        requests.Response
+    """
+    return get_session(retries).post(url, **kwargs)
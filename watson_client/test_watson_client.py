@@ -0,0 +1,390 @@
+"""Unit tests for the shared Watson client layer (run against a local server)."""
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import watson_client
+from watson_client import bulk, resilience, session
+from watson_client.cache import ResultCache
+from watson_client.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Echo handler recording which client connections were used."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Record the client address and echo the request body."""
+        self.server.clients.add(self.client_address)
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/slow-first':
+            with self.server.lock:
+                self.server.slow_first_calls += 1
+                first = self.server.slow_first_calls == 1
+            if first:
+                time.sleep(1)
+        if self.path == '/unavailable':
+            with self.server.lock:
+                self.server.unavailable_calls += 1
+        status = {'/error': 500, '/unavailable': 503}.get(self.path, 200)
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client cancelled this request (a losing hedge)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keep test output quiet."""
+
+
+class TestSession(unittest.TestCase):
+    """Test cases for the pooled session."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        cls.server.clients = set()
+        cls.server.lock = threading.Lock()
+        cls.server.slow_first_calls = 0
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/predict'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_session_is_shared(self):
+        """Test that every call gets the same session."""
+        self.assertIs(session.get_session(), session.get_session())
+
+    def test_connections_are_reused(self):
+        """Test that sequential posts reuse one keep-alive connection."""
+        self.server.clients.clear()
+        for i in range(5):
+            response = watson_client.post(self.url, json={'n': i}, timeout=5)
+            self.assertEqual(json.loads(response.text), {'n': i})
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_async_pool_shared_across_event_loops(self):
+        """Test that async posts from separate event loops share one pool."""
+        self.server.clients.clear()
+        for i in range(3):
+            response = asyncio.run(watson_client.post_async(self.url, json={'n': i}, timeout=5))
+            self.assertEqual(response.json(), {'n': i})
+        self.assertEqual(len(self.server.clients), 1)
+
+
+class TestResultCache(unittest.TestCase):
+    """Test cases for the prediction result cache."""
+
+    def test_hit_after_set_with_normalized_text(self):
+        """Test that whitespace differences share an entry."""
+        cache = ResultCache(10, 60, 60)
+        cache.set('model', 'I  love this ', {'label': 'SENT_POSITIVE'})
+        self.assertEqual(cache.get('model', 'I love this'), {'label': 'SENT_POSITIVE'})
+        self.assertIsNone(cache.get('other-model', 'I love this'))
+        self.assertEqual(cache.stats()['memory_hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_negative_entries_expire_sooner(self):
+        """Test that negative results use the negative TTL."""
+        cache = ResultCache(10, 60, 0.01)
+        cache.set('model', '', {'label': None}, negative=True)
+        self.assertEqual(cache.get('model', ''), {'label': None})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('model', ''))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        cache = ResultCache(2, 60, 60)
+        cache.set('model', 'a', {'n': 1})
+        cache.set('model', 'b', {'n': 2})
+        cache.get('model', 'a')
+        cache.set('model', 'c', {'n': 3})
+        self.assertIsNone(cache.get('model', 'b'))
+        self.assertEqual(cache.get('model', 'a'), {'n': 1})
+
+    def test_sqlite_tier_is_shared(self):
+        """Test that a second cache instance sees entries through SQLite."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.db')
+            ResultCache(10, 60, 60, path).set('model', 'text', {'label': 'SENT_NEUTRAL'})
+            other = ResultCache(10, 60, 60, path)
+            self.assertEqual(other.get('model', 'text'), {'label': 'SENT_NEUTRAL'})
+            self.assertEqual(other.stats()['disk_hits'], 1)
+
+    def test_sqlite_tier_is_purged(self):
+        """Test that expired rows are deleted and the row count stays capped."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.db')
+            cache = ResultCache(10, 60, 0.01, path, purge_every=4, max_rows=2)
+            cache.set('model', '', {'label': None}, negative=True)
+            time.sleep(0.02)
+            for text in ('a', 'b', 'c'):
+                cache.set('model', text, {'label': text})
+
+            rows = sqlite3.connect(path).execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            self.assertEqual(rows, 2)
+            self.assertEqual(cache.stats()['rows_purged'], 2)
+            self.assertIsNone(ResultCache(10, 60, 60, path).get('model', 'a'))
+            self.assertEqual(ResultCache(10, 60, 60, path).get('model', 'c'), {'label': 'c'})
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the circuit breaker."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker refuses calls once the threshold is reached."""
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=60)
+        for _ in range(2):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure(0.01)
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+    def test_half_open_probe_closes_breaker(self):
+        """Test that one successful probe after the reset timeout closes the breaker."""
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure(0.01)
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+
+class TestResilience(unittest.TestCase):
+    """Test cases for hedged calls and deadlines (run against a local server)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        cls.server.clients = set()
+        cls.server.lock = threading.Lock()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.slow_first_calls = 0
+        self.server.unavailable_calls = 0
+
+    def _warm_breaker(self, name):
+        """Give a breaker enough fast samples for a p95-based hedge delay."""
+        breaker = resilience.get_breaker(name)
+        for _ in range(resilience.HEDGE_MIN_SAMPLES * 10):
+            breaker.record_success(0.01)
+        return breaker
+
+    def test_slow_call_is_hedged(self):
+        """Test that a duplicate request answers when the first one stalls."""
+        breaker = self._warm_breaker('hedge-sync')
+        started = time.monotonic()
+        response = watson_client.call('hedge-sync', self.base_url + '/slow-first',
+                                      json={'n': 1}, timeout=5)
+        self.assertEqual(json.loads(response.text), {'n': 1})
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(breaker.stats()['hedge_wins'], 1)
+
+    def test_slow_async_call_is_hedged(self):
+        """Test that async calls are hedged the same way."""
+        breaker = self._warm_breaker('hedge-async')
+        started = time.monotonic()
+        response = asyncio.run(watson_client.call_async(
+            'hedge-async', self.base_url + '/slow-first', json={'n': 2}, timeout=5
+        ))
+        self.assertEqual(response.json(), {'n': 2})
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(breaker.stats()['hedge_wins'], 1)
+
+    def test_deadline_caps_timeout(self):
+        """Test that the current deadline bounds timeouts and fails expired calls fast."""
+        token = resilience.set_deadline(0.5)
+        try:
+            self.assertLessEqual(resilience.bounded_timeout(30), 0.5)
+        finally:
+            resilience.reset_deadline(token)
+        self.assertEqual(resilience.bounded_timeout(30), 30)
+
+        token = resilience.set_deadline(-1)
+        try:
+            with self.assertRaises(DeadlineExceeded):
+                watson_client.call('deadline', self.base_url + '/predict', json={}, timeout=5)
+        finally:
+            resilience.reset_deadline(token)
+
+    def test_deadline_disables_retries(self):
+        """Test that calls under a deadline make one attempt instead of backing off past it."""
+        token = resilience.set_deadline(0.5)
+        try:
+            started = time.monotonic()
+            response = watson_client.call('no-retry', self.base_url + '/unavailable', json={}, timeout=5)
+            elapsed = time.monotonic() - started
+        finally:
+            resilience.reset_deadline(token)
+        self.assertEqual(response.status_code, 503)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(self.server.unavailable_calls, 1)
+
+        watson_client.call('no-retry', self.base_url + '/unavailable', json={}, timeout=5)
+        self.assertEqual(self.server.unavailable_calls, 2 + session.MAX_RETRIES)
+
+    def test_server_errors_open_breaker(self):
+        """Test that calls answered with 5xx open the endpoint's breaker and then fail fast."""
+        for _ in range(resilience.BREAKER_FAILURES):
+            response = watson_client.call('errors', self.base_url + '/error', json={}, timeout=5)
+            self.assertEqual(response.status_code, 500)
+        with self.assertRaises(CircuitOpenError):
+            watson_client.call('errors', self.base_url + '/error', json={}, timeout=5)
+
+    def test_invalid_input_statuses_keep_breaker_closed(self):
+        """Test that 5xx answers an endpoint uses for invalid input do not open its breaker."""
+        for _ in range(resilience.BREAKER_FAILURES * 2):
+            response = watson_client.call('invalid-input', self.base_url + '/error', json={'text': ' '},
+                                          timeout=5, ok_statuses=(500,))
+            self.assertEqual(response.status_code, 500)
+        breaker = resilience.get_breaker('invalid-input')
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(breaker.stats()['failures'], 0)
+
+    def test_busy_pool_skips_hedging(self):
+        """Test that calls are not hedged while every hedge thread is in use."""
+        breaker = self._warm_breaker('hedge-busy')
+        with mock.patch.object(resilience, '_hedge_in_flight', resilience.HEDGE_WORKERS):
+            response = watson_client.call('hedge-busy', self.base_url + '/slow-first',
+                                          json={'n': 3}, timeout=5)
+        self.assertEqual(json.loads(response.text), {'n': 3})
+        self.assertEqual(breaker.stats()['hedged'], 0)
+
+    def test_queued_call_respects_timeout(self):
+        """Test that time spent waiting for a hedge thread counts against the timeout."""
+        self._warm_breaker('hedge-queued')
+        blocked = ThreadPoolExecutor(max_workers=1)
+        release = threading.Event()
+        blocked.submit(release.wait)
+        try:
+            with mock.patch.object(resilience, '_get_hedge_executor', return_value=blocked):
+                started = time.monotonic()
+                with self.assertRaises(DeadlineExceeded):
+                    watson_client.call('hedge-queued', self.base_url + '/predict', json={}, timeout=0.3)
+                self.assertLess(time.monotonic() - started, 0.6)
+        finally:
+            release.set()
+            blocked.shutdown()
+
+    def test_error_rate_opens_breaker(self):
+        """Test that a high rolling error rate opens the breaker without consecutive failures."""
+        breaker = CircuitBreaker('test', failure_threshold=100, reset_timeout=60,
+                                 error_rate=0.5, min_calls=4)
+        for _ in range(2):
+            breaker.record_success(0.01)
+            breaker.record_failure(0.01)
+        self.assertEqual(breaker.state, 'open')
+
+
+class TestBulk(unittest.TestCase):
+    """Test cases for streaming bulk scoring."""
+
+    @staticmethod
+    def _score(text):
+        return {'length': len(text)}
+
+    def test_resume_writes_each_record_once(self):
+        """Test that a run resumed from its checkpoint completes the output without duplicates."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'in.csv')
+            output = os.path.join(directory, 'out.jsonl')
+            checkpoint = os.path.join(directory, 'checkpoint.json')
+            with open(source, 'w', encoding='utf-8') as file:
+                file.write('id,text\n1,a\n2,"b\nb"\n3,ccc\n4,\n')
+            log = open(os.devnull, 'w', encoding='utf-8')
+            self.addCleanup(log.close)
+
+            first = bulk.run(self._score, source, output, checkpoint_path=checkpoint,
+                             checkpoint_every=1, limit=2, log=log)
+            second = bulk.run(self._score, source, output, checkpoint_path=checkpoint, log=log)
+
+            with open(output, encoding='utf-8') as file:
+                rows = [json.loads(line) for line in file]
+        self.assertEqual((first['records'], second['records']), (2, 2))
+        self.assertEqual([row['id'] for row in rows], ['1', '2', '3', '4'])
+        self.assertEqual([row['result']['length'] for row in rows], [1, 3, 3, 0])
+
+    def test_resume_refuses_mismatched_output(self):
+        """Test that a checkpoint is not resumed into stdout, a missing or short file, or another file."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'in.jsonl')
+            output = os.path.join(directory, 'out.jsonl')
+            checkpoint = os.path.join(directory, 'checkpoint.json')
+            with open(source, 'w', encoding='utf-8') as file:
+                for i in range(4):
+                    file.write(json.dumps({'id': i, 'text': 'x' * i}) + '\n')
+            log = open(os.devnull, 'w', encoding='utf-8')
+            self.addCleanup(log.close)
+            bulk.run(self._score, source, output, checkpoint_path=checkpoint, limit=2, log=log)
+            with open(output, 'rb') as file:
+                written = file.read()
+
+            with self.assertRaises(ValueError):
+                bulk.run(self._score, source, '-', checkpoint_path=checkpoint, log=log)
+            with self.assertRaises(ValueError):
+                bulk.run(self._score, source, output + '.new', checkpoint_path=checkpoint, log=log)
+            with open(output, 'r+b') as file:
+                file.truncate(len(written) // 2)
+            with self.assertRaises(ValueError):
+                bulk.run(self._score, source, output, checkpoint_path=checkpoint, log=log)
+            # A different file of at least the checkpointed size is refused too
+            with open(output + '.copy', 'wb') as file:
+                file.write(written)
+            os.replace(output + '.copy', output)
+            with self.assertRaises(ValueError):
+                bulk.run(self._score, source, output, checkpoint_path=checkpoint, log=log)
+            self.assertFalse(os.path.exists(output + '.new'))
+
+    def test_batch_scorer_is_called_per_batch(self):
+        """Test that a batch scorer gets batch_size texts per call and results keep input order."""
+        batches = []
+
+        def score_batch(texts):
+            batches.append(list(texts))
+            return [self._score(text) for text in texts]
+
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'in.jsonl')
+            output = os.path.join(directory, 'out.jsonl')
+            with open(source, 'w', encoding='utf-8') as file:
+                for i in range(5):
+                    file.write(json.dumps({'id': i, 'text': 'x' * i}) + '\n')
+                file.write(json.dumps({'id': 5}) + '\n')
+            log = open(os.devnull, 'w', encoding='utf-8')
+            self.addCleanup(log.close)
+
+            summary = bulk.run(self._score, source, output, score_batch=score_batch,
+                               batch_size=2, concurrency=1, log=log)
+            with open(output, encoding='utf-8') as file:
+                rows = [json.loads(line) for line in file]
+        self.assertEqual(summary['records'], 6)
+        self.assertEqual(batches, [['', 'x'], ['xx', 'xxx'], ['xxxx']])
+        self.assertEqual([row['result'].get('length') for row in rows], [0, 1, 2, 3, 4, None])
+        self.assertIn('error', rows[5]['result'])
+
+
+if __name__ == '__main__':
+    unittest.main()